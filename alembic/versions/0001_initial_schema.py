@@ -0,0 +1,56 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-01-28 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+EVENT_STATUS = sa.Enum(
+    "SCHEDULED", "ONGOING", "COMPLETED", "CANCELED", name="eventstatus"
+)
+
+
+def upgrade():
+    op.create_table(
+        "events",
+        sa.Column("event_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("description", sa.String(length=255), nullable=True),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+        sa.Column("end_time", sa.DateTime(), nullable=False),
+        sa.Column("location", sa.String(length=255), nullable=False),
+        sa.Column("max_attendees", sa.Integer(), nullable=False),
+        sa.Column("status", EVENT_STATUS, nullable=False),
+        sa.PrimaryKeyConstraint("event_id"),
+    )
+    op.create_index("ix_events_event_id", "events", ["event_id"])
+
+    op.create_table(
+        "attendees",
+        sa.Column("attendee_id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(length=255), nullable=False),
+        sa.Column("last_name", sa.String(length=255), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("phone_number", sa.String(length=255), nullable=True),
+        sa.Column("event_id", sa.Integer(), nullable=False),
+        sa.Column("check_in_status", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["event_id"], ["events.event_id"]),
+        sa.PrimaryKeyConstraint("attendee_id"),
+        sa.UniqueConstraint("email"),
+    )
+    op.create_index("ix_attendees_attendee_id", "attendees", ["attendee_id"])
+
+
+def downgrade():
+    op.drop_index("ix_attendees_attendee_id", table_name="attendees")
+    op.drop_table("attendees")
+    op.drop_index("ix_events_event_id", table_name="events")
+    op.drop_table("events")
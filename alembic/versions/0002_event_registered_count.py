@@ -0,0 +1,33 @@
+"""track registrations per event in events.registered_count
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "events",
+        sa.Column(
+            "registered_count", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+    # Backfill from the attendees already registered
+    op.execute(
+        "UPDATE events SET registered_count = ("
+        "SELECT COUNT(*) FROM attendees"
+        " WHERE attendees.event_id = events.event_id)"
+    )
+
+
+def downgrade():
+    op.drop_column("events", "registered_count")
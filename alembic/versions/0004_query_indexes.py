@@ -0,0 +1,33 @@
+"""secondary indexes for the router and sweeper access paths
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_events_status_start_time", "events", ["status", "start_time"])
+    op.create_index("ix_events_status_end_time", "events", ["status", "end_time"])
+    op.create_index("ix_events_start_time", "events", ["start_time"])
+    op.create_index("ix_attendees_event_id", "attendees", ["event_id"])
+    op.create_index(
+        "ix_attendees_event_id_check_in_status",
+        "attendees",
+        ["event_id", "check_in_status"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_attendees_event_id_check_in_status", table_name="attendees")
+    op.drop_index("ix_attendees_event_id", table_name="attendees")
+    op.drop_index("ix_events_start_time", table_name="events")
+    op.drop_index("ix_events_status_end_time", table_name="events")
+    op.drop_index("ix_events_status_start_time", table_name="events")
@@ -0,0 +1,30 @@
+"""location indexes for prefix and full-text event search
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_events_location", "events", ["location"])
+    if op.get_bind().dialect.name == "mysql":
+        op.create_index(
+            "ix_events_location_fulltext",
+            "events",
+            ["location"],
+            mysql_prefix="FULLTEXT",
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "mysql":
+        op.drop_index("ix_events_location_fulltext", table_name="events")
+    op.drop_index("ix_events_location", table_name="events")
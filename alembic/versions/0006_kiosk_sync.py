@@ -0,0 +1,47 @@
+"""attendee change tracking and kiosk check-in idempotency keys
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+PreciseDateTime = sa.DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+
+def upgrade():
+    # Batch mode rebuilds the table on SQLite, which cannot alter columns
+    with op.batch_alter_table("attendees") as batch:
+        batch.add_column(sa.Column("check_in_updated_at", PreciseDateTime))
+        batch.add_column(sa.Column("updated_at", PreciseDateTime))
+    op.execute("UPDATE attendees SET updated_at = CURRENT_TIMESTAMP")
+    with op.batch_alter_table("attendees") as batch:
+        batch.alter_column("updated_at", existing_type=PreciseDateTime, nullable=False)
+    op.create_index(
+        "ix_attendees_event_id_updated_at", "attendees", ["event_id", "updated_at"]
+    )
+
+    op.create_table(
+        "kiosk_check_ins",
+        sa.Column("idempotency_key", sa.String(length=64), nullable=False),
+        sa.Column("attendee_id", sa.Integer(), nullable=False),
+        sa.Column("outcome", sa.String(length=32), nullable=False),
+        sa.Column("received_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("idempotency_key"),
+    )
+
+
+def downgrade():
+    op.drop_table("kiosk_check_ins")
+    op.drop_index("ix_attendees_event_id_updated_at", table_name="attendees")
+    with op.batch_alter_table("attendees") as batch:
+        batch.drop_column("updated_at")
+        batch.drop_column("check_in_updated_at")
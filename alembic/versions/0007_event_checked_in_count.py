@@ -0,0 +1,32 @@
+"""track check-ins per event in events.checked_in_count
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "events",
+        sa.Column("checked_in_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    # Backfill from the attendees already checked in
+    op.execute(
+        "UPDATE events SET checked_in_count = ("
+        "SELECT COUNT(*) FROM attendees"
+        " WHERE attendees.event_id = events.event_id"
+        " AND attendees.check_in_status = 1)"
+    )
+
+
+def downgrade():
+    op.drop_column("events", "checked_in_count")
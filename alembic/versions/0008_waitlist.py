@@ -0,0 +1,56 @@
+"""waitlist entries and per-event waitlist tickets
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "events",
+        sa.Column("waitlist_tickets", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_table(
+        "waitlist_entries",
+        sa.Column("entry_id", sa.Integer(), nullable=False),
+        sa.Column("event_id", sa.Integer(), nullable=False),
+        sa.Column("ticket", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(length=255), nullable=False),
+        sa.Column("last_name", sa.String(length=255), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("phone_number", sa.String(length=255), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum("WAITING", "PROMOTED", "SKIPPED", name="waitliststatus"),
+            nullable=False,
+        ),
+        sa.Column("attendee_id", sa.Integer(), nullable=True),
+        sa.Column("joined_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["event_id"], ["events.event_id"]),
+        sa.ForeignKeyConstraint(["attendee_id"], ["attendees.attendee_id"]),
+        sa.PrimaryKeyConstraint("entry_id"),
+        sa.UniqueConstraint("event_id", "ticket", name="uq_waitlist_entries_ticket"),
+        sa.UniqueConstraint("event_id", "email", name="uq_waitlist_entries_email"),
+    )
+    op.create_index(
+        "ix_waitlist_entries_event_id_status_ticket",
+        "waitlist_entries",
+        ["event_id", "status", "ticket"],
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_waitlist_entries_event_id_status_ticket", table_name="waitlist_entries"
+    )
+    op.drop_table("waitlist_entries")
+    op.drop_column("events", "waitlist_tickets")
@@ -0,0 +1,31 @@
+"""invalidations table shared by the worker processes
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "invalidations",
+        sa.Column("invalidation_id", sa.Integer(), nullable=False),
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("origin", sa.String(length=128), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("invalidation_id"),
+    )
+    op.create_index("ix_invalidations_created_at", "invalidations", ["created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_invalidations_created_at", table_name="invalidations")
+    op.drop_table("invalidations")
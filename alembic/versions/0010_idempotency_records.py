@@ -0,0 +1,32 @@
+"""idempotency_records table shared by the worker processes
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "idempotency_records",
+        sa.Column("key_hash", sa.String(length=64), nullable=False),
+        sa.Column("value", sa.Text(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("key_hash"),
+    )
+    op.create_index(
+        "ix_idempotency_records_expires_at", "idempotency_records", ["expires_at"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_idempotency_records_expires_at", table_name="idempotency_records")
+    op.drop_table("idempotency_records")
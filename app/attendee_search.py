@@ -0,0 +1,309 @@
+import asyncio
+import heapq
+import os
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.kiosk_sync import after_cursor, feed_order, settle_horizon, settled_cursor
+from app.models import Attendee
+
+# Events whose search index is kept in memory, least recently searched first out
+MAX_INDEXED_EVENTS = int(os.getenv("SEARCH_INDEX_MAX_EVENTS", "20"))
+
+MAX_SEARCH_RESULTS = 50
+
+# Rank of a matched query word, best first; fuzzy matches add their distance
+EXACT, PREFIX, FUZZY = 0, 1, 2
+
+WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Lower-cased, without accents, so "José" is found as "jose"."""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def attendee_tokens(first_name: str, last_name: str, email: str) -> Set[str]:
+    """
+    The words an attendee can be found by: every word of their names, the
+    whole email and the words of its local part ("jane.doe@x.org" is found
+    as "jane.doe@...", "jane" and "doe", but not as "x").
+    """
+    email = normalize(email)
+    local_part = email.split("@", 1)[0]
+    return {
+        *WORD.findall(normalize(first_name)),
+        *WORD.findall(normalize(last_name)),
+        *WORD.findall(local_part),
+        email,
+    }
+
+
+def max_typos(word: str) -> int:
+    """Edits tolerated in a query word: none for short words, then 1 per 4 letters."""
+    return 0 if len(word) < 4 else min(len(word) // 4, 2)
+
+
+def after_prefix(prefix: str) -> str:
+    """The first string sorting after every string that starts with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class EventSearchIndex:
+    """
+    Attendee lookup for one event by name and email words.
+
+    Each attendee is indexed under their tokens (see `attendee_tokens`). The
+    distinct tokens are kept sorted, so the tokens starting with a query word
+    are one binary search away, and typo-tolerant matching can walk them as a
+    trie. After the initial load, attendees are indexed one at a time as they
+    register or change.
+    """
+
+    def __init__(self):
+        self.tokens_of: Dict[int, Set[str]] = {}
+        self.attendees_of: Dict[str, Set[int]] = {}
+        self.sorted_tokens: List[str] = []
+        self.loaded = False
+        # Change feed cursor of the newest settled change indexed (see
+        # app.kiosk_sync); later changes are read, and upserted, again
+        self.cursor: Optional[str] = None
+        self.lock = asyncio.Lock()
+
+    def load(self, attendees: Iterable[Tuple[int, str, str, str]]):
+        """
+        Indexes many new attendees at once, sorting the new tokens in once
+        rather than inserting them one by one.
+        """
+        new_tokens = []
+        for attendee_id, first_name, last_name, email in attendees:
+            tokens = self.tokens_of[attendee_id] = attendee_tokens(
+                first_name, last_name, email
+            )
+            for token in tokens:
+                attendee_ids = self.attendees_of.get(token)
+                if attendee_ids is None:
+                    attendee_ids = self.attendees_of[token] = set()
+                    new_tokens.append(token)
+                attendee_ids.add(attendee_id)
+        self.sorted_tokens = sorted(self.sorted_tokens + new_tokens)
+
+    def upsert(self, attendee_id: int, first_name: str, last_name: str, email: str):
+        tokens = attendee_tokens(first_name, last_name, email)
+        previous = self.tokens_of.get(attendee_id, set())
+        for token in previous - tokens:
+            self._unlink(attendee_id, token)
+        for token in tokens - previous:
+            self._link(attendee_id, token)
+        self.tokens_of[attendee_id] = tokens
+
+    def _link(self, attendee_id: int, token: str):
+        attendees = self.attendees_of.get(token)
+        if attendees is None:
+            attendees = self.attendees_of[token] = set()
+            insort(self.sorted_tokens, token)
+        attendees.add(attendee_id)
+
+    def _unlink(self, attendee_id: int, token: str):
+        attendees = self.attendees_of[token]
+        attendees.discard(attendee_id)
+        if attendees:
+            return
+        del self.attendees_of[token]
+        del self.sorted_tokens[bisect_left(self.sorted_tokens, token)]
+
+    def _prefixed(self, word: str) -> Iterable[str]:
+        for position in range(
+            bisect_left(self.sorted_tokens, word), len(self.sorted_tokens)
+        ):
+            token = self.sorted_tokens[position]
+            if not token.startswith(word):
+                return
+            yield token
+
+    def _similar(self, word: str, typos: int) -> Iterable[Tuple[str, int]]:
+        """
+        The tokens with a prefix at most `typos` edits (Levenshtein) from
+        `word`, with the fewest edits. The first letter must match: typos
+        there are rare, and it leaves only the tokens starting with that
+        letter to compare.
+
+        These tokens are walked as a trie: tokens sharing a prefix share
+        the rows of the edit distance table computed for it, and once every
+        entry of a row exceeds `typos` the tokens under that prefix are
+        settled together, with one binary search.
+        """
+        tokens = self.sorted_tokens
+        # Letters beyond these can only add edits
+        depth = len(word) + typos
+        too_far = typos + 1
+        rows = [[min(i, too_far) for i in range(len(word) + 1)]]
+        # closest[d]: edits from the word to the closest prefix of path[:d]
+        closest = [len(word)]
+        path = ""  # the prefix rows[1:] were computed for
+        position = bisect_left(tokens, word[0])
+        last = bisect_left(tokens, after_prefix(word[0]), position)
+        while position < last:
+            stem = tokens[position][:depth]
+            common = 0
+            while common < min(len(path), len(stem)) and path[common] == stem[common]:
+                common += 1
+            del rows[common + 1 :]
+            del closest[common + 1 :]
+            path = stem[:common]
+            for char in stem[common:]:
+                above = rows[-1]
+                # Only entries within `typos` of the diagonal can stay within
+                # `typos`; the others are capped there
+                row = [too_far] * len(above)
+                row[0] = min(above[0] + 1, too_far)
+                for i in range(
+                    max(len(rows) - typos, 1), min(len(rows) + typos, len(word)) + 1
+                ):
+                    row[i] = min(
+                        above[i] + 1,
+                        row[i - 1] + 1,
+                        above[i - 1] + (word[i - 1] != char),
+                    )
+                rows.append(row)
+                closest.append(min(closest[-1], row[-1]))
+                path += char
+                if min(row) > typos:
+                    break
+            distance = closest[-1]
+            end = position + 1
+            if len(path) == depth or min(rows[-1]) > typos:
+                # Longer prefixes can't get closer, so every token under this
+                # one is as far from the word as this prefix
+                end = bisect_left(tokens, after_prefix(path), end)
+            if distance <= typos:
+                for token in tokens[position:end]:
+                    yield token, distance
+            position = end
+
+    def _match_word(self, word: str, fuzzy: bool) -> Dict[int, int]:
+        """attendee_id -> best rank of `word` among the attendee's tokens."""
+        ranks: Dict[int, int] = {}
+
+        def found(token: str, rank: int):
+            for attendee_id in self.attendees_of[token]:
+                if rank < ranks.get(attendee_id, rank + 1):
+                    ranks[attendee_id] = rank
+
+        for token in self._prefixed(word):
+            found(token, EXACT if token == word else PREFIX)
+        typos = max_typos(word) if fuzzy else 0
+        if typos:
+            for token, distance in self._similar(word, typos):
+                if distance:
+                    found(token, FUZZY + distance)
+        return ranks
+
+    def _scores(self, words: List[str], fuzzy: bool) -> Dict[int, int]:
+        scores: Optional[Dict[int, int]] = None
+        for word in words:
+            ranks = self._match_word(word, fuzzy)
+            if scores is None:
+                scores = ranks
+            else:
+                scores = {
+                    attendee_id: score + ranks[attendee_id]
+                    for attendee_id, score in scores.items()
+                    if attendee_id in ranks
+                }
+            if not scores:
+                return {}
+        return scores
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """
+        IDs of the best `limit` attendees matching every word of the query,
+        ranked by how closely the words matched (exact, prefix, then by the
+        number of typos), then by attendee_id.
+        """
+        query = normalize(query).strip()
+        # An email is matched whole, as typed or scanned so far, without typos
+        email = "@" in query
+        words = [query] if email else WORD.findall(query)
+        if not words:
+            return []
+        scores = self._scores(words, fuzzy=False)
+        # Any attendee matched through a typo scores at least FUZZY + 1, so
+        # when enough attendees score less without typos, the slower
+        # typo-tolerant pass can't change the result
+        if not email and sum(score <= FUZZY for score in scores.values()) < limit:
+            scores = self._scores(words, fuzzy=True)
+        return heapq.nsmallest(
+            limit, scores, key=lambda attendee_id: (scores[attendee_id], attendee_id)
+        )
+
+
+class AttendeeSearch:
+    """
+    In-memory search indexes of the most recently searched events.
+
+    An event is indexed from the attendees table on its first search, in a
+    worker thread. Every later search first catches up on the attendees
+    registered or changed since, by reading the kiosk change feed (one range
+    of the (event_id, updated_at) index), so changes made by any worker are
+    found, including those that commit after a later-stamped change.
+    """
+
+    def __init__(self, max_events: int):
+        self.max_events = max_events
+        self._indexes: "OrderedDict[int, EventSearchIndex]" = OrderedDict()
+
+    def _index(self, event_id: int) -> EventSearchIndex:
+        index = self._indexes.get(event_id)
+        if index is None:
+            index = self._indexes[event_id] = EventSearchIndex()
+            while len(self._indexes) > self.max_events:
+                self._indexes.popitem(last=False)
+        self._indexes.move_to_end(event_id)
+        return index
+
+    async def _catch_up(self, db: AsyncSession, event_id: int, index: EventSearchIndex):
+        query = (
+            select(
+                Attendee.attendee_id,
+                Attendee.first_name,
+                Attendee.last_name,
+                Attendee.email,
+                Attendee.updated_at,
+            )
+            .where(Attendee.event_id == event_id)
+            .order_by(*feed_order())
+        )
+        horizon = settle_horizon()
+        if index.cursor is not None:
+            query = query.where(after_cursor(index.cursor))
+        rows = (await db.execute(query)).all()
+        if not index.loaded:
+            # Seconds of work on a large event: built off the event loop. No
+            # search reads the index before it is loaded.
+            await asyncio.to_thread(index.load, [row[:4] for row in rows])
+            index.loaded = True
+        else:
+            for row in rows:
+                index.upsert(*row[:4])
+        index.cursor = settled_cursor(rows, horizon, index.cursor)
+
+    async def search(
+        self, db: AsyncSession, event_id: int, query: str, limit: int
+    ) -> List[int]:
+        index = self._index(event_id)
+        async with index.lock:
+            await self._catch_up(db, event_id, index)
+        return index.search(query, limit)
+
+
+attendee_search = AttendeeSearch(MAX_INDEXED_EVENTS)
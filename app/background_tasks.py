@@ -1,22 +1,77 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
 from app.database import SessionLocal
+from app.job_locks import acquire_job_lock
 from app.models import Event, EventStatus
-from datetime import datetime
 
+# Run the status sweep inside the API process; with several workers the job
+# lock lets only one of them sweep per tick
+ENABLE_SCHEDULER = os.getenv("ENABLE_SCHEDULER", "false").lower() == "true"
+
+STATUS_SWEEP_INTERVAL = timedelta(
+    seconds=int(os.getenv("STATUS_SWEEP_INTERVAL_SECONDS", "60"))
+)
 
-def update_event_statuses():
+
+def update_event_statuses(now: datetime = None):
+    """
+    Persists the derived event status (see Event.status) into the stored
+    column for consumers reading the table directly, with two set-based
+    UPDATEs: SCHEDULED events become ONGOING once they start, and SCHEDULED or
+    ONGOING events become COMPLETED once they end. CANCELED events are left
+    alone. The API itself never depends on this sweep.
+    Only the process holding the "event_status_sweep" lock runs each tick.
+    """
     db = SessionLocal()
-    events = (
-        db.query(Event)
-        .filter(Event.end_time < datetime.now(), Event.status != EventStatus.COMPLETED)
-        .all()
-    )
-    for event in events:
-        event.status = EventStatus.COMPLETED
+    try:
+        if not acquire_job_lock(db, "event_status_sweep", STATUS_SWEEP_INTERVAL):
+            return
+
+        now = now or datetime.now()
+        db.execute(
+            update(Event)
+            .where(
+                Event.stored_status == EventStatus.SCHEDULED,
+                Event.start_time <= now,
+                Event.end_time >= now,
+            )
+            .values({Event.stored_status: EventStatus.ONGOING})
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(Event)
+            .where(
+                Event.stored_status.in_([EventStatus.SCHEDULED, EventStatus.ONGOING]),
+                Event.end_time < now,
+            )
+            .values({Event.stored_status: EventStatus.COMPLETED})
+            .execution_options(synchronize_session=False)
+        )
         db.commit()
-    db.close()
+    finally:
+        db.close()
+
+
+def build_scheduler(blocking: bool = False):
+    # Imported here: APScheduler (and pkg_resources with it) is slow to import
+    # and only needed in the process that runs the sweep
+    if blocking:
+        from apscheduler.schedulers.blocking import BlockingScheduler as Scheduler
+    else:
+        from apscheduler.schedulers.background import BackgroundScheduler as Scheduler
+
+    scheduler = Scheduler()
+    scheduler.add_job(
+        update_event_statuses,
+        "interval",
+        seconds=STATUS_SWEEP_INTERVAL.total_seconds(),
+    )
+    return scheduler
 
 
-scheduler = BackgroundScheduler()
-scheduler.add_job(update_event_statuses, "interval", minutes=2)
-scheduler.start()
+if __name__ == "__main__":
+    # Runs the sweep in its own process: python -m app.background_tasks
+    build_scheduler(blocking=True).start()
@@ -0,0 +1,153 @@
+import codecs
+import csv
+from datetime import datetime
+from typing import AsyncIterable, BinaryIO, Dict, Iterator, List, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Attendee
+from app.stats import recount_checked_in
+
+# Number of distinct emails resolved per `IN (...)` lookup and UPDATE
+BATCH_SIZE = 1000
+
+CHECKED_IN = "checked_in"
+ALREADY_CHECKED_IN = "already_checked_in"
+UNKNOWN_EMAIL = "unknown_email"
+
+
+class MissingEmailColumn(ValueError):
+    pass
+
+
+def iter_csv_emails(file: BinaryIO) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (row_number, email) pairs from an uploaded CSV, counting data rows
+    from 1.
+    The file is decoded incrementally, so the upload is never held in memory
+    as a single string. Rows without an email are skipped.
+    """
+    reader = csv.DictReader(codecs.getreader("utf-8-sig")(file))
+    if not reader.fieldnames or "email" not in reader.fieldnames:
+        raise MissingEmailColumn("CSV must contain an 'email' column.")
+
+    for row_number, row in enumerate(reader, start=1):
+        email = (row.get("email") or "").strip()
+        if email:
+            yield row_number, email
+
+
+async def _check_in_batch(
+    db: AsyncSession, emails: List[str]
+) -> Tuple[Dict[str, str], Dict[int, int]]:
+    """
+    Resolves a batch of distinct emails with one SELECT and checks in the
+    matching attendees with one UPDATE.
+    The rows are locked where the database supports it, and the UPDATE only
+    changes attendees that are still not checked in. Where the database can
+    return the rows it changed, an attendee checked in by a concurrent
+    request in between is reported as already checked in.
+    Returns the outcome per email and the event id of every attendee checked
+    in, keyed by attendee id.
+    """
+    outcome = dict.fromkeys(emails, UNKNOWN_EMAIL)
+    pending = {}
+    email_of = {}
+
+    rows = await db.execute(
+        select(
+            Attendee.attendee_id,
+            Attendee.email,
+            Attendee.check_in_status,
+            Attendee.event_id,
+        )
+        .where(Attendee.email.in_(emails))
+        .with_for_update()
+    )
+    for attendee_id, email, check_in_status, event_id in rows:
+        if check_in_status:
+            outcome[email] = ALREADY_CHECKED_IN
+        else:
+            pending[attendee_id] = event_id
+            email_of[attendee_id] = email
+
+    if pending:
+        statement = (
+            update(Attendee)
+            .where(
+                Attendee.attendee_id.in_(pending),
+                Attendee.check_in_status.is_not(True),
+            )
+            .values(check_in_status=True, check_in_updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        if db.bind.dialect.update_returning:
+            changed = set(await db.scalars(statement.returning(Attendee.attendee_id)))
+            pending = {
+                attendee_id: event_id
+                for attendee_id, event_id in pending.items()
+                if attendee_id in changed
+            }
+        else:
+            # The rows were locked by the SELECT, so the UPDATE changed them all
+            await db.execute(statement)
+        for attendee_id, email in email_of.items():
+            outcome[email] = (
+                CHECKED_IN if attendee_id in pending else ALREADY_CHECKED_IN
+            )
+        if pending:
+            await recount_checked_in(db, set(pending.values()))
+    return outcome, pending
+
+
+async def bulk_check_in_emails(
+    db: AsyncSession,
+    rows: AsyncIterable[Tuple[int, str]],
+    batch_size: int = BATCH_SIZE,
+) -> Tuple[dict, Dict[int, int]]:
+    """
+    Checks in attendees for a stream of (row_number, email) pairs.
+    Returns a summary with totals per outcome plus the outcome of every row, in
+    upload order, and the event id of every attendee checked in, keyed by
+    attendee id.
+    Repeated emails are reported as already checked in (or unknown) after
+    their first occurrence.
+    """
+    outcome: Dict[str, str] = {}
+    reported = set()
+    results = []
+    totals = {CHECKED_IN: 0, ALREADY_CHECKED_IN: 0, UNKNOWN_EMAIL: 0}
+    checked_in = {}
+
+    rows = aiter(rows)
+    while True:
+        batch = []
+        new_emails = {}
+        # Pull rows until the batch holds `batch_size` emails not seen before
+        async for row in rows:
+            batch.append(row)
+            email = row[1]
+            if email not in outcome and email not in new_emails:
+                new_emails[email] = None
+                if len(new_emails) >= batch_size:
+                    break
+        if not batch:
+            break
+
+        if new_emails:
+            batch_outcome, batch_checked_in = await _check_in_batch(
+                db, list(new_emails)
+            )
+            outcome.update(batch_outcome)
+            checked_in.update(batch_checked_in)
+
+        for row_number, email in batch:
+            status = outcome[email]
+            if email in reported and status == CHECKED_IN:
+                status = ALREADY_CHECKED_IN
+            reported.add(email)
+            totals[status] += 1
+            results.append({"row": row_number, "email": email, "status": status})
+
+    return {**totals, "results": results}, checked_in
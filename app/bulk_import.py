@@ -0,0 +1,251 @@
+import codecs
+import csv
+import json
+from collections import Counter, defaultdict
+from typing import (
+    AsyncIterable,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Tuple,
+)
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.live_counters import live_counters
+from app.models import Attendee, Event
+from app.schemas import AttendeeCreate
+
+# Valid rows inserted per transaction
+BATCH_SIZE = 1000
+
+# Upload file extensions and the parser each one selects
+IMPORT_FORMATS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".json": "json",
+}
+
+
+class InvalidImportFile(ValueError):
+    pass
+
+
+class InvalidRow(NamedTuple):
+    """Stands in for a row that could not be parsed, e.g. a malformed NDJSON line."""
+
+    error: str
+
+
+def iter_import_rows(file: BinaryIO, file_format: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Yields (row_number, fields) pairs from an uploaded CSV, NDJSON or JSON file,
+    counting rows from 1. CSV and NDJSON are decoded incrementally; a JSON
+    array has to be parsed in one piece.
+    """
+    text = codecs.getreader("utf-8-sig")(file)
+    if file_format == "csv":
+        reader = csv.DictReader(text)
+        if not reader.fieldnames:
+            raise InvalidImportFile("CSV file is empty.")
+        for row_number, row in enumerate(reader, start=1):
+            # DictReader keeps the surplus cells of a row under the key None
+            if None in row:
+                yield row_number, InvalidRow("Row has more fields than the header.")
+                continue
+            # Empty CSV cells mean "not provided"
+            yield row_number, {key: value for key, value in row.items() if value}
+    elif file_format == "ndjson":
+        row_number = 0
+        for line in text:
+            if line.strip():
+                row_number += 1
+                try:
+                    yield row_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield row_number, InvalidRow(f"Invalid JSON: {e}")
+    else:
+        try:
+            rows = json.load(text)
+        except json.JSONDecodeError as e:
+            raise InvalidImportFile(f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise InvalidImportFile("JSON upload must be an array of attendees.")
+        yield from enumerate(rows, start=1)
+
+
+def _validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in error.errors()
+    )
+
+
+async def _import_batch(
+    db: AsyncSession, batch: List[Tuple[int, AttendeeCreate]]
+) -> Tuple[List[AttendeeCreate], List[dict]]:
+    """
+    Imports one batch of validated rows in the caller's transaction.
+    Email uniqueness and event capacity are checked for the whole batch with
+    one query each; accepted rows take their seats (and move the events'
+    check-in counts) with one executemany UPDATE and are inserted with one
+    multi-row INSERT.
+    Returns the accepted attendees and the errors of the rejected rows.
+    """
+    errors = []
+
+    emails = [attendee.email for _, attendee in batch]
+    taken = set(
+        await db.scalars(select(Attendee.email).where(Attendee.email.in_(emails)))
+    )
+
+    event_ids = {attendee.event_id for _, attendee in batch}
+    capacity = {
+        event_id: max_attendees - registered_count
+        for event_id, max_attendees, registered_count in await db.execute(
+            select(Event.event_id, Event.max_attendees, Event.registered_count)
+            .where(Event.event_id.in_(event_ids))
+            .with_for_update()
+        )
+    }
+
+    accepted = []
+    seats: Dict[int, int] = defaultdict(int)
+    checked_in: Dict[int, int] = defaultdict(int)
+    for row_number, attendee in batch:
+        if attendee.email in taken:
+            error = f"Attendee with email '{attendee.email}' already exists."
+        elif attendee.event_id not in capacity:
+            error = "Event not found"
+        elif seats[attendee.event_id] >= capacity[attendee.event_id]:
+            error = "The event has reached its maximum attendee limit."
+        else:
+            seats[attendee.event_id] += 1
+            checked_in[attendee.event_id] += int(bool(attendee.check_in_status))
+            accepted.append(attendee)
+            continue
+        errors.append({"row": row_number, "email": attendee.email, "error": error})
+
+    if accepted:
+        await db.execute(
+            update(Event.__table__)
+            .where(Event.__table__.c.event_id == bindparam("seat_event_id"))
+            .values(
+                registered_count=Event.__table__.c.registered_count
+                + bindparam("seats"),
+                checked_in_count=Event.__table__.c.checked_in_count
+                + bindparam("checked_in"),
+            ),
+            [
+                {
+                    "seat_event_id": event_id,
+                    "seats": count,
+                    "checked_in": checked_in[event_id],
+                }
+                for event_id, count in seats.items()
+            ],
+        )
+        await db.execute(
+            insert(Attendee),
+            [
+                {
+                    "first_name": attendee.first_name,
+                    "last_name": attendee.last_name,
+                    "email": attendee.email,
+                    "phone_number": attendee.phone_number,
+                    "event_id": attendee.event_id,
+                    "check_in_status": attendee.check_in_status or False,
+                }
+                for attendee in accepted
+            ],
+        )
+    return accepted, errors
+
+
+async def _commit_batch(
+    db: AsyncSession, batch: List[Tuple[int, AttendeeCreate]]
+) -> Tuple[int, List[dict]]:
+    try:
+        accepted, errors = await _import_batch(db, batch)
+        await db.commit()
+    except IntegrityError:
+        # An email was registered concurrently; the retry sees it as taken
+        await db.rollback()
+        accepted, errors = await _import_batch(db, batch)
+        await db.commit()
+
+    registered = Counter(attendee.event_id for attendee in accepted)
+    checked_in = Counter(
+        attendee.event_id for attendee in accepted if attendee.check_in_status
+    )
+    for event_id, count in registered.items():
+        live_counters.add(event_id, registered=count, checked_in=checked_in[event_id])
+    return len(accepted), errors
+
+
+async def import_attendees(
+    db: AsyncSession,
+    rows: AsyncIterable[Tuple[int, dict]],
+    batch_size: int = BATCH_SIZE,
+) -> dict:
+    """
+    Validates each row with AttendeeCreate and imports the valid ones in
+    batches of `batch_size`, one transaction per batch.
+    Returns the number of attendees imported and an error for every rejected
+    row, in upload order.
+    """
+    imported = 0
+    errors = []
+    seen = set()
+    batch = []
+
+    async for row_number, fields in rows:
+        if isinstance(fields, InvalidRow):
+            errors.append({"row": row_number, "email": None, "error": fields.error})
+            continue
+        if not isinstance(fields, dict):
+            errors.append(
+                {"row": row_number, "email": None, "error": "Expected an object."}
+            )
+            continue
+        try:
+            attendee = AttendeeCreate(**fields)
+        except ValidationError as e:
+            errors.append(
+                {
+                    "row": row_number,
+                    "email": fields.get("email"),
+                    "error": _validation_error(e),
+                }
+            )
+            continue
+        if attendee.email in seen:
+            errors.append(
+                {
+                    "row": row_number,
+                    "email": attendee.email,
+                    "error": "Duplicate email in upload.",
+                }
+            )
+            continue
+        seen.add(attendee.email)
+
+        batch.append((row_number, attendee))
+        if len(batch) >= batch_size:
+            count, batch_errors = await _commit_batch(db, batch)
+            imported += count
+            errors.extend(batch_errors)
+            batch = []
+
+    if batch:
+        count, batch_errors = await _commit_batch(db, batch)
+        imported += count
+        errors.extend(batch_errors)
+
+    errors.sort(key=lambda error: error["row"])
+    return {"imported": imported, "failed": len(errors), "errors": errors}
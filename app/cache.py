@@ -0,0 +1,230 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional, Set
+
+from app.invalidations import InvalidationChannel, invalidations
+
+# Left in place of deleted keys for `tombstone_ttl`, and read as a miss
+DELETED = {"__deleted__": True}
+
+
+class Cache(ABC):
+    """
+    Read-through cache for API responses.
+    Values are JSON-compatible dicts (see fastapi.encoders.jsonable_encoder),
+    so every backend can store them. Hit and miss counters are per process.
+
+    Readers fill the cache with `add`, which leaves a key alone if it holds
+    anything. With a `tombstone_ttl`, `delete` leaves a tombstone behind for
+    that long, so a reader that loaded a row before an update deleted it
+    can't cache the old row afterwards.
+    """
+
+    def __init__(self, ttl: float, tombstone_ttl: float = 0):
+        self.ttl = ttl
+        self.tombstone_ttl = tombstone_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any):
+        pass
+
+    @abstractmethod
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Stores `value` (for `ttl`, or the cache's TTL) only if `key` is absent."""
+
+    @abstractmethod
+    async def delete(self, *keys: str):
+        pass
+
+    def _record(self, value: Optional[Any]) -> Optional[Any]:
+        if value == DELETED:
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class NullCache(Cache):
+    """Caching disabled: every lookup is a miss."""
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._record(None)
+
+    async def set(self, key: str, value: Any):
+        pass
+
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return True
+
+    async def delete(self, *keys: str):
+        pass
+
+
+class MemoryCache(Cache):
+    """
+    In-process cache with a TTL per entry and least-recently-used eviction.
+    With a `channel`, keys deleted here are also dropped by the other worker
+    processes, and keys deleted there are dropped here.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        channel: Optional[InvalidationChannel] = None,
+        tombstone_ttl: float = 0,
+    ):
+        super().__init__(ttl, tombstone_ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.channel = channel
+        if channel is not None:
+            channel.subscribe(self._drop)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._record(None)
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return self._record(None)
+        self._entries.move_to_end(key)
+        return self._record(value)
+
+    async def set(self, key: str, value: Any):
+        self._store(key, value, self.ttl)
+
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return False
+        self._store(key, value, self.ttl if ttl is None else ttl)
+        return True
+
+    def _store(self, key: str, value: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        await self._drop(set(keys))
+        if self.channel is not None:
+            self.channel.publish(*keys)
+
+    async def _drop(self, keys: Set[str]):
+        for key in keys:
+            if self.tombstone_ttl:
+                self._store(key, DELETED, self.tombstone_ttl)
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "entries": len(self._entries)}
+
+
+class RedisCache(Cache):
+    """Cache shared by every worker, backed by any Redis-compatible server."""
+
+    def __init__(
+        self,
+        url: str,
+        ttl: float,
+        prefix: str = "event_management:",
+        tombstone_ttl: float = 0,
+    ):
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "CACHE_BACKEND=redis requires the 'redis' package to be installed"
+            ) from e
+        super().__init__(ttl, tombstone_ttl)
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._redis.get(self.prefix + key)
+        return self._record(None if raw is None else json.loads(raw))
+
+    async def set(self, key: str, value: Any):
+        await self._redis.set(
+            self.prefix + key, json.dumps(value), px=int(self.ttl * 1000)
+        )
+
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        added = await self._redis.set(
+            self.prefix + key,
+            json.dumps(value),
+            px=int((self.ttl if ttl is None else ttl) * 1000),
+            nx=True,
+        )
+        return bool(added)
+
+    async def delete(self, *keys: str):
+        if not keys:
+            return
+        if not self.tombstone_ttl:
+            await self._redis.delete(*(self.prefix + key for key in keys))
+            return
+        async with self._redis.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.set(
+                    self.prefix + key,
+                    json.dumps(DELETED),
+                    px=int(self.tombstone_ttl * 1000),
+                )
+            await pipeline.execute()
+
+
+def build_cache() -> Cache:
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    ttl = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+    # Longer than any read that fills the cache takes
+    tombstone_ttl = float(os.getenv("CACHE_TOMBSTONE_SECONDS", "5"))
+    if backend == "memory":
+        return MemoryCache(
+            ttl,
+            int(os.getenv("CACHE_MAX_ENTRIES", "10000")),
+            invalidations,
+            tombstone_ttl,
+        )
+    if backend == "redis":
+        return RedisCache(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            ttl,
+            tombstone_ttl=tombstone_ttl,
+        )
+    if backend == "none":
+        return NullCache(ttl)
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}'")
+
+
+cache = build_cache()
+
+
+def event_key(event_id: int) -> str:
+    return f"event:{event_id}"
+
+
+def attendee_key(attendee_id: int) -> str:
+    return f"attendee:{attendee_id}"
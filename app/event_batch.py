@@ -0,0 +1,270 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Event, EventStatus
+from app.schemas import EventBatchUpdateItem, EventCreate
+from app.waitlist import promote_waitlist
+
+
+def event_error(
+    start_time: datetime, end_time: datetime, max_attendees: Optional[int]
+) -> Optional[str]:
+    """The reason an event's times or capacity are invalid, or None."""
+    if start_time >= end_time:
+        return "Start time must be before end time"
+    if max_attendees is not None and max_attendees <= 0:
+        return f"Maximum attendees can't be {max_attendees}"
+    return None
+
+
+# Rows per multi-row INSERT where the new IDs can't be returned (MySQL)
+INSERT_CHUNK_SIZE = 1000
+
+
+def build_event(event: EventCreate) -> Event:
+    return Event(
+        name=event.name,
+        description=event.description,
+        start_time=event.start_time,
+        end_time=event.end_time,
+        location=event.location,
+        max_attendees=event.max_attendees,
+        status=event.status or EventStatus.SCHEDULED,
+    )
+
+
+def event_row(event: EventCreate) -> dict:
+    """The events table row of a new event, for Core inserts."""
+    return {
+        "name": event.name,
+        "description": event.description,
+        "start_time": event.start_time,
+        "end_time": event.end_time,
+        "location": event.location,
+        "max_attendees": event.max_attendees,
+        "status": event.status or EventStatus.SCHEDULED,
+    }
+
+
+def null_error(values: dict) -> Optional[str]:
+    """The first change that sets a NOT NULL column of events to null, or None."""
+    columns = Event.__table__.c
+    for column, value in values.items():
+        if value is None and not columns[column].nullable:
+            return f"{column} can't be null"
+    return None
+
+
+def update_error(values: dict, start_time: datetime, end_time: datetime):
+    """
+    The reason the changes in `values` can't be applied to an event that now
+    runs from `start_time` to `end_time`, or None.
+    """
+    return null_error(values) or event_error(
+        values.get("start_time", start_time),
+        values.get("end_time", end_time),
+        values.get("max_attendees"),
+    )
+
+
+def _result(index: int, event_id: Optional[int], error: Optional[str] = None):
+    return {"index": index, "event_id": event_id, "error": error}
+
+
+def _report(results: List[dict], done: str) -> dict:
+    failed = sum(result["error"] is not None for result in results)
+    return {done: len(results) - failed, "failed": failed, "results": results}
+
+
+async def _insert_events(db: AsyncSession, rows: List[dict]) -> List[int]:
+    """
+    Inserts the rows with multi-row INSERTs and returns their new event_ids,
+    in order. Each INSERT numbers its rows in VALUES order, so sorted IDs
+    line up with the rows. Where the database can return them (SQLite,
+    MariaDB, PostgreSQL), INSERT ... RETURNING does; MySQL's are counted from
+    the first ID of each statement and read back with one SELECT. Either way
+    the names and locations are checked against the rows.
+    """
+    events = Event.__table__
+    if db.bind.dialect.insert_executemany_returning:
+        inserted = sorted(
+            await db.execute(
+                insert(events).returning(
+                    events.c.event_id, events.c.name, events.c.location
+                ),
+                rows,
+            )
+        )
+    else:
+        event_ids: List[int] = []
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            chunk = rows[start : start + INSERT_CHUNK_SIZE]
+            first = (await db.execute(insert(events).values(chunk))).lastrowid
+            event_ids.extend(range(first, first + len(chunk)))
+        inserted = sorted(
+            await db.execute(
+                select(events.c.event_id, events.c.name, events.c.location).where(
+                    events.c.event_id.in_(event_ids)
+                )
+            )
+        )
+    if [(name, location) for _, name, location in inserted] != [
+        (row["name"], row["location"]) for row in rows
+    ]:
+        raise RuntimeError("Inserted events could not be matched to their IDs")
+    return [event_id for event_id, _, _ in inserted]
+
+
+async def create_events(db: AsyncSession, events: List[EventCreate]) -> dict:
+    """
+    Creates the valid events within the caller's transaction, with multi-row
+    INSERTs (see _insert_events). Returns the new event_id or the error of
+    every item, in request order.
+    """
+    results = []
+    created: List[Tuple[int, dict]] = []
+    for index, event in enumerate(events):
+        error = event_error(event.start_time, event.end_time, event.max_attendees)
+        if error:
+            results.append(_result(index, None, error))
+            continue
+        created.append((index, event_row(event)))
+        results.append(None)
+
+    if created:
+        event_ids = await _insert_events(db, [row for _, row in created])
+        for (index, _), event_id in zip(created, event_ids):
+            results[index] = _result(index, event_id)
+    return _report(results, "created")
+
+
+async def _apply_changes(db: AsyncSession, changes: Dict[int, dict]):
+    """
+    Applies per-event changes with as few statements as possible: events
+    given the same changes share one UPDATE ... WHERE event_id IN (...), the
+    rest are grouped by the columns they change into one executemany each.
+    """
+    by_columns: Dict[Tuple[str, ...], Dict[int, dict]] = defaultdict(dict)
+    for event_id, values in changes.items():
+        if values:
+            by_columns[tuple(sorted(values))][event_id] = values
+
+    events = Event.__table__
+    for columns, group in by_columns.items():
+        distinct = {
+            tuple(values[column] for column in columns) for values in group.values()
+        }
+        if len(distinct) == 1:
+            await db.execute(
+                update(events)
+                .where(events.c.event_id.in_(group))
+                .values(next(iter(group.values())))
+            )
+            continue
+        await db.execute(
+            update(events)
+            .where(events.c.event_id == bindparam("changed_event_id"))
+            .values({column: bindparam(f"new_{column}") for column in columns}),
+            [
+                {
+                    "changed_event_id": event_id,
+                    **{f"new_{column}": values[column] for column in columns},
+                }
+                for event_id, values in group.items()
+            ],
+        )
+
+
+async def update_events(
+    db: AsyncSession, items: List[EventBatchUpdateItem]
+) -> Tuple[dict, Set[int], Set[int]]:
+    """
+    Validates each update against the event's current times and applies the
+    valid ones within the caller's transaction. The events are read and
+    locked with one query. Events whose capacity changed fill their new
+    seats from the waitlist, as a single update does.
+    Returns the per-item report, the events whose capacity changed and the
+    events that promoted waitlist entries.
+    """
+    current = {
+        row.event_id: row
+        for row in await db.execute(
+            select(Event.event_id, Event.start_time, Event.end_time)
+            .where(Event.event_id.in_({item.event_id for item in items}))
+            .with_for_update()
+        )
+    }
+
+    results = []
+    changes: Dict[int, dict] = {}
+    for index, item in enumerate(items):
+        values = item.dict(exclude_unset=True)
+        event_id = values.pop("event_id")
+        if event_id not in current:
+            error = "Event not found"
+        elif event_id in changes:
+            error = "Duplicate event_id in batch."
+        else:
+            error = update_error(
+                values, current[event_id].start_time, current[event_id].end_time
+            )
+        results.append(_result(index, event_id, error))
+        if error is None:
+            changes[event_id] = values
+
+    await _apply_changes(db, changes)
+    resized = {
+        event_id for event_id, values in changes.items() if "max_attendees" in values
+    }
+    promoted = {
+        event_id for event_id in sorted(resized) if await promote_waitlist(db, event_id)
+    }
+    return _report(results, "updated"), resized, promoted
+
+
+def shifted(column, minutes: int, dialect: str):
+    """`column` moved by `minutes`, computed by the database."""
+    if dialect == "sqlite":
+        # Stored as "YYYY-MM-DD HH:MM:SS.ffffff"; whole minutes leave the
+        # fraction as it is
+        return func.strftime(
+            "%Y-%m-%d %H:%M:%S", column, f"{minutes:+d} minutes"
+        ).concat(func.substr(column, 20))
+    if dialect == "mysql":
+        return func.timestampadd(text("MINUTE"), minutes, column)
+    return column + timedelta(minutes=minutes)
+
+
+async def shift_events(db: AsyncSession, event_ids: List[int], minutes: int) -> dict:
+    """
+    Moves the start and end of every listed event by `minutes` within the
+    caller's transaction, with a single UPDATE. Returns a per-item report;
+    unknown event IDs are reported as errors.
+    """
+    found = set(
+        await db.scalars(
+            select(Event.event_id)
+            .where(Event.event_id.in_(set(event_ids)))
+            .with_for_update()
+        )
+    )
+    if found:
+        dialect = db.bind.dialect.name
+        await db.execute(
+            update(Event)
+            .where(Event.event_id.in_(found))
+            .values(
+                start_time=shifted(Event.start_time, minutes, dialect),
+                end_time=shifted(Event.end_time, minutes, dialect),
+            )
+            .execution_options(synchronize_session=False)
+        )
+    results = [
+        _result(index, event_id, None if event_id in found else "Event not found")
+        for index, event_id in enumerate(event_ids)
+    ]
+    return _report(results, "shifted")
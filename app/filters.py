@@ -0,0 +1,64 @@
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Union
+
+from sqlalchemy import and_, true
+
+# Query parameters accept either a day ("2030-01-01") or a datetime, which is
+# truncated to its day
+Day = Union[date, datetime]
+
+LOCATION_MATCH_MODES = "^(contains|prefix|fulltext)$"
+
+
+def day_start(day: Day) -> datetime:
+    if isinstance(day, datetime):
+        day = day.date()
+    return datetime.combine(day, time.min)
+
+
+def start_time_between(
+    column, first_day: Optional[Day] = None, last_day: Optional[Day] = None
+):
+    """
+    Half-open range covering whole days, first_day through last_day inclusive:
+    column >= first_day 00:00 AND column < (last_day + 1) 00:00.
+    Unlike DATE(column) = ?, this can use an index on the column.
+    """
+    clauses = []
+    if first_day is not None:
+        clauses.append(column >= day_start(first_day))
+    if last_day is not None:
+        clauses.append(column < day_start(last_day) + timedelta(days=1))
+    return and_(true(), *clauses)
+
+
+def escape_like(value: str, escape: str = "\\") -> str:
+    return (
+        value.replace(escape, escape * 2)
+        .replace("%", escape + "%")
+        .replace("_", escape + "_")
+    )
+
+
+def fulltext_terms(value: str) -> str:
+    """
+    Turns free text into a MySQL boolean-mode query requiring every word as a
+    prefix ("main hall" -> "+main* +hall*"), dropping boolean operators.
+    """
+    words = re.findall(r"\w+", value)
+    return " ".join(f"+{word}*" for word in words)
+
+
+def location_filter(column, value: str, mode: str, dialect: str):
+    """
+    contains: case-insensitive substring match; always scans the table.
+    prefix:   LIKE 'value%', which MySQL serves from ix_events_location.
+    fulltext: MATCH ... AGAINST on MySQL's FULLTEXT index; other databases
+              have no such index and fall back to contains.
+    """
+    if mode == "prefix":
+        return column.like(escape_like(value) + "%", escape="\\")
+    if mode == "fulltext" and dialect == "mysql" and fulltext_terms(value):
+        return column.match(fulltext_terms(value))
+    return column.ilike(f"%{escape_like(value)}%", escape="\\")
@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Type
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from app.cache import Cache, MemoryCache, RedisCache
+from app.database import AsyncSessionLocal
+from app.job_locks import acquire_job_lock
+from app.models import IdempotencyRecord
+
+# Header set on responses replayed from the store instead of being recomputed
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+MAX_KEY_LENGTH = 255
+
+# How long a request may hold its key before another worker may run it again
+CLAIM_TIMEOUT = float(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS", "30"))
+# How often a retry waiting on a request running in another worker looks for
+# its outcome
+CLAIM_POLL_INTERVAL = 0.05
+
+# Stored under the key while its first request runs
+IN_PROGRESS = {"in_progress": True}
+
+PRUNE_INTERVAL = timedelta(seconds=60)
+
+
+class DatabaseStore(Cache):
+    """
+    Idempotency records in the idempotency_records table, shared by every
+    worker process of a deployment. Keys are stored as their SHA-256; the
+    primary key makes `add` succeed in only one process. Once a minute, the
+    process holding the "idempotency_prune" job lock deletes expired records.
+    """
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self._pruned_at = 0.0
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Any]:
+        async with AsyncSessionLocal() as db:
+            raw = await db.scalar(
+                select(IdempotencyRecord.value).where(
+                    IdempotencyRecord.key_hash == self._hash(key),
+                    IdempotencyRecord.expires_at > datetime.now(),
+                )
+            )
+        return self._record(None if raw is None else json.loads(raw))
+
+    async def set(self, key: str, value: Any):
+        await self._write(key, value, self.ttl, replace=True)
+
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return await self._write(
+            key, value, self.ttl if ttl is None else ttl, replace=False
+        )
+
+    async def _write(self, key: str, value: Any, ttl: float, replace: bool) -> bool:
+        key_hash = self._hash(key)
+        now = datetime.now()
+        async with AsyncSessionLocal() as db:
+            replaced = IdempotencyRecord.key_hash == key_hash
+            if not replace:
+                replaced &= IdempotencyRecord.expires_at <= now
+            await db.execute(delete(IdempotencyRecord).where(replaced))
+            db.add(
+                IdempotencyRecord(
+                    key_hash=key_hash,
+                    value=json.dumps(value),
+                    expires_at=now + timedelta(seconds=ttl),
+                )
+            )
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Added by another process first
+                await db.rollback()
+                return False
+
+        if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL.total_seconds():
+            self._pruned_at = time.monotonic()
+            await self._prune()
+        return True
+
+    async def delete(self, *keys: str):
+        if not keys:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(IdempotencyRecord).where(
+                    IdempotencyRecord.key_hash.in_(map(self._hash, keys))
+                )
+            )
+            await db.commit()
+
+    async def _prune(self):
+        async with AsyncSessionLocal() as db:
+            if not await db.run_sync(
+                acquire_job_lock, "idempotency_prune", PRUNE_INTERVAL
+            ):
+                return
+            await db.execute(
+                delete(IdempotencyRecord).where(
+                    IdempotencyRecord.expires_at <= datetime.now()
+                )
+            )
+            await db.commit()
+
+
+def build_store() -> Cache:
+    backend = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+    ttl = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    if backend == "memory":
+        return MemoryCache(ttl, int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000")))
+    if backend == "database":
+        return DatabaseStore(ttl)
+    if backend == "redis":
+        return RedisCache(os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl)
+    raise ValueError(f"Unknown IDEMPOTENCY_BACKEND '{backend}'")
+
+
+class Idempotency:
+    """
+    Runs a request handler at most once per Idempotency-Key.
+
+    The outcome of the first request with a key (its 2xx response, or a 4xx
+    error) is stored under the method, path and key, together with a hash of
+    the request body. A retry with the same key and body gets the stored
+    response back from one store lookup, without touching the attendee or
+    event tables. Retries that arrive while the first request is still
+    running wait for its outcome instead of running the handler again: in
+    the same process through a future, in others by polling the store, where
+    the first request holds the key with an IN_PROGRESS claim for up to
+    CLAIM_TIMEOUT. Server errors are not stored, so the client can retry
+    them.
+    """
+
+    def __init__(self, store: Cache):
+        self.store = store
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def run(
+        self,
+        request: Request,
+        key: Optional[str],
+        handler: Callable[[], Awaitable],
+        response_model: Optional[Type[BaseModel]] = None,
+    ):
+        if key is None:
+            return await handler()
+
+        entry_key = f"idempotency:{request.method} {request.url.path}:{key}"
+        fingerprint = hashlib.sha256(await request.body()).hexdigest()
+        while True:
+            pending = self._in_flight.get(entry_key)
+            if pending is not None:
+                stored = await asyncio.shield(pending)
+                if stored is not None:
+                    return replay(stored, fingerprint)
+                # The first attempt failed without an outcome: run it again
+                continue
+            stored = await self.store.get(entry_key)
+            if stored is None:
+                if await self.store.add(entry_key, IN_PROGRESS, CLAIM_TIMEOUT):
+                    break
+            elif not stored.get("in_progress"):
+                return replay(stored, fingerprint)
+            # Running elsewhere: wait for its outcome, or for the claim to go
+            await asyncio.sleep(CLAIM_POLL_INTERVAL)
+
+        outcome = asyncio.get_running_loop().create_future()
+        self._in_flight[entry_key] = outcome
+        stored = None
+        try:
+            try:
+                result = await handler()
+            except HTTPException as e:
+                if e.status_code < 500:
+                    stored = {
+                        "status": e.status_code,
+                        "body": {"detail": e.detail},
+                        "fingerprint": fingerprint,
+                    }
+                    await self.store.set(entry_key, stored)
+                raise
+            if isinstance(result, JSONResponse):
+                # Already rendered, with its own status code
+                stored = {
+                    "status": result.status_code,
+                    "body": json.loads(result.body),
+                    "fingerprint": fingerprint,
+                }
+                await self.store.set(entry_key, stored)
+                return result
+            if response_model is not None:
+                result = response_model.from_orm(result)
+            stored = {
+                "status": 200,
+                "body": jsonable_encoder(result),
+                "fingerprint": fingerprint,
+            }
+            await self.store.set(entry_key, stored)
+            return stored["body"]
+        finally:
+            del self._in_flight[entry_key]
+            outcome.set_result(stored)
+            if stored is None:
+                # Lets a retry run the request again
+                await self.store.delete(entry_key)
+
+
+def replay(stored: dict, fingerprint: str) -> JSONResponse:
+    if stored["fingerprint"] != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request body.",
+        )
+    return JSONResponse(
+        status_code=stored["status"],
+        content=stored["body"],
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+idempotency = Idempotency(build_store())
@@ -0,0 +1,424 @@
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# Requests running more statements than this are logged as likely N+1 queries
+SQL_STATEMENT_WARN_THRESHOLD = int(os.getenv("SQL_STATEMENT_WARN_THRESHOLD", "20"))
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestTimings:
+    """Where one request spent its time; all durations are in seconds."""
+
+    __slots__ = (
+        "route",
+        "statements",
+        "db_time",
+        "orm_time",
+        "encode_time",
+        "endpoint_done",
+    )
+
+    def __init__(self):
+        self.route = UNMATCHED_ROUTE
+        self.statements = 0
+        self.db_time = 0.0
+        self.orm_time = 0.0
+        self.encode_time = 0.0
+        self.endpoint_done: Optional[float] = None
+
+
+# Timings of the request being handled. The object is mutated in place, so
+# updates made in threadpool workers and SQLAlchemy greenlets are seen here.
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+def _record_statement(started: float):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.statements += 1
+        timings.db_time += time.perf_counter() - started
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _, started = conn.info["query_started"].pop()
+    _record_statement(started)
+
+
+def _handle_error(exception_context):
+    # A statement that raised never reaches after_cursor_execute: its start
+    # is dropped here, or it would stay on the connection for as long as the
+    # pool keeps it. Errors raised outside execution (connecting, fetching
+    # after the statement ran) have no start pending.
+    conn = exception_context.connection
+    if conn is None:
+        return
+    pending = conn.info.get("query_started")
+    if pending and pending[-1][0] is exception_context.execution_context:
+        _, started = pending.pop()
+        _record_statement(started)
+
+
+def instrument_engine(engine):
+    """Counts the statements and cursor time of `engine` (a sync Engine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def _time_orm_execute(orm_execute_state):
+    """
+    Runs the ORM statement and records the time spent outside cursor
+    execution: fetching the rows and building objects from them. Async
+    sessions buffer ORM results, so objects are built here; streamed results
+    are built later and not counted.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return None
+    started = time.perf_counter()
+    db_time_before = timings.db_time
+    result = orm_execute_state.invoke_statement()
+    elapsed = time.perf_counter() - started
+    timings.orm_time += elapsed - (timings.db_time - db_time_before)
+    return result
+
+
+def instrument_sessions(session_class):
+    event.listen(session_class, "do_orm_execute", _time_orm_execute)
+
+
+class TimedCheckout:
+    """
+    Pool mixin recording how long each checkout took (waiting for a free
+    connection, opening a new one, pre-ping) and every checkout that timed
+    out because the pool was exhausted.
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            metrics.observe_pool_timeout(self)
+            logger.warning(
+                "Connection pool %s exhausted: %s", self.logging_name, self.status()
+            )
+            raise
+        finally:
+            metrics.observe_checkout(self, time.perf_counter() - started)
+
+
+class TimedQueuePool(TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedRoute(APIRoute):
+    """
+    Route that records its path template and how long turning the endpoint's
+    return value into a response took (response_model validation and JSON
+    rendering).
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        # FastAPI awaits or threads the call based on the original endpoint,
+        # so the wrapper has to keep its kind
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+
+            async def timed_call(*args, **kwargs):
+                try:
+                    return await call(*args, **kwargs)
+                finally:
+                    _mark_endpoint_done()
+
+        else:
+
+            def timed_call(*args, **kwargs):
+                try:
+                    return call(*args, **kwargs)
+                finally:
+                    _mark_endpoint_done()
+
+        self.dependant.call = timed_call
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = " ".join([",".join(sorted(self.methods)), self.path_format])
+
+        async def timed_handler(request):
+            timings = current_timings.get()
+            if timings is not None:
+                timings.route = route
+            response = await handler(request)
+            if timings is not None and timings.endpoint_done is not None:
+                timings.encode_time = time.perf_counter() - timings.endpoint_done
+            return response
+
+        return timed_handler
+
+
+def _mark_endpoint_done():
+    timings = current_timings.get()
+    if timings is not None:
+        timings.endpoint_done = time.perf_counter()
+
+
+class Metrics:
+    """Per-process request metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.requests = defaultdict(int)
+        self.duration_buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.duration_sum = defaultdict(float)
+        self.statements = defaultdict(int)
+        self.db_time = defaultdict(float)
+        self.orm_time = defaultdict(float)
+        self.encode_time = defaultdict(float)
+        self.n_plus_one_warnings = defaultdict(int)
+        self.pools = {}
+        self.checkouts = defaultdict(int)
+        self.checkout_time = defaultdict(float)
+        self.pool_timeouts = defaultdict(int)
+
+    def watch_pool(self, pool):
+        """Reports `pool` under its logging name (the engine's pool_logging_name)."""
+        self.pools[pool.logging_name] = pool
+
+    def observe_checkout(self, pool, duration: float):
+        self.checkouts[pool.logging_name] += 1
+        self.checkout_time[pool.logging_name] += duration
+
+    def observe_pool_timeout(self, pool):
+        self.pool_timeouts[pool.logging_name] += 1
+
+    def observe(self, timings: RequestTimings, status: int, duration: float):
+        route = timings.route
+        self.requests[(route, status)] += 1
+        bucket = bisect_left(DURATION_BUCKETS, duration)
+        if bucket < len(DURATION_BUCKETS):
+            self.duration_buckets[route][bucket] += 1
+        self.duration_sum[route] += duration
+        self.statements[route] += timings.statements
+        self.db_time[route] += timings.db_time
+        self.orm_time[route] += timings.orm_time
+        self.encode_time[route] += timings.encode_time
+        if timings.statements > SQL_STATEMENT_WARN_THRESHOLD:
+            self.n_plus_one_warnings[route] += 1
+
+    def render(self, extra: dict = None) -> str:
+        lines = []
+
+        def family(name, kind, description, samples):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {value}")
+
+        family(
+            "http_requests_total",
+            "counter",
+            "Requests handled, by route and status code.",
+            [
+                ({"route": route, "status": status}, count)
+                for (route, status), count in sorted(self.requests.items())
+            ],
+        )
+
+        lines.append(
+            "# HELP http_request_duration_seconds Time until the response started."
+        )
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for route in sorted(self.duration_sum):
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, self.duration_buckets[route]):
+                cumulative += count
+                labels = _labels({"route": route, "le": bound})
+                lines.append(
+                    f"http_request_duration_seconds_bucket{labels} {cumulative}"
+                )
+            total = sum(
+                count for (name, _), count in self.requests.items() if name == route
+            )
+            labels = _labels({"route": route, "le": "+Inf"})
+            lines.append(f"http_request_duration_seconds_bucket{labels} {total}")
+            labels = _labels({"route": route})
+            lines.append(
+                f"http_request_duration_seconds_sum{labels} {self.duration_sum[route]}"
+            )
+            lines.append(f"http_request_duration_seconds_count{labels} {total}")
+
+        for name, description, values in (
+            ("db_statements_total", "SQL statements executed.", self.statements),
+            ("db_time_seconds_total", "Time spent in SQL cursors.", self.db_time),
+            (
+                "orm_load_seconds_total",
+                "ORM time outside cursor execution: fetching rows, building objects.",
+                self.orm_time,
+            ),
+            (
+                "response_encode_seconds_total",
+                "Time turning endpoint results into responses.",
+                self.encode_time,
+            ),
+            (
+                "n_plus_one_warnings_total",
+                f"Requests running more than {SQL_STATEMENT_WARN_THRESHOLD} statements.",
+                self.n_plus_one_warnings,
+            ),
+        ):
+            family(
+                name,
+                "counter",
+                description,
+                [({"route": route}, value) for route, value in sorted(values.items())],
+            )
+
+        queue_pools = sorted(
+            (name, pool)
+            for name, pool in self.pools.items()
+            if isinstance(pool, QueuePool)
+        )
+        for name, description, value in (
+            ("db_pool_size", "Connections the pool keeps open.", QueuePool.size),
+            (
+                "db_pool_checked_out",
+                "Connections in use by requests and jobs.",
+                QueuePool.checkedout,
+            ),
+            (
+                "db_pool_idle",
+                "Open connections waiting in the pool.",
+                QueuePool.checkedin,
+            ),
+            (
+                "db_pool_overflow",
+                "Connections open beyond the pool size.",
+                lambda pool: max(pool.overflow(), 0),
+            ),
+        ):
+            family(
+                name,
+                "gauge",
+                description,
+                [({"pool": pool_name}, value(pool)) for pool_name, pool in queue_pools],
+            )
+        for name, description, values in (
+            ("db_pool_checkouts_total", "Connection checkouts.", self.checkouts),
+            (
+                "db_pool_checkout_seconds_total",
+                "Time spent checking out connections, including waits for a free one.",
+                self.checkout_time,
+            ),
+            (
+                "db_pool_timeouts_total",
+                "Checkouts that gave up because the pool was exhausted.",
+                self.pool_timeouts,
+            ),
+        ):
+            family(
+                name,
+                "counter",
+                description,
+                [({"pool": pool}, value) for pool, value in sorted(values.items())],
+            )
+
+        for name, value in sorted((extra or {}).items()):
+            family(name, "gauge", name.replace("_", " ") + ".", [({}, value)])
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+metrics = Metrics()
+
+
+def server_timing(timings: RequestTimings, duration: float) -> str:
+    return ", ".join(
+        [
+            f'db;dur={timings.db_time * 1000:.2f};desc="{timings.statements} statements"',
+            f"orm;dur={timings.orm_time * 1000:.2f}",
+            f"encode;dur={timings.encode_time * 1000:.2f}",
+            f"total;dur={duration * 1000:.2f}",
+        ]
+    )
+
+
+class InstrumentationMiddleware:
+    """
+    ASGI middleware that collects RequestTimings for every HTTP request,
+    reports them in a Server-Timing response header and in `metrics`, and
+    logs requests that run more than SQL_STATEMENT_WARN_THRESHOLD statements.
+    Streamed bodies are still being produced when the header is sent, so
+    their timings only cover the work done before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timings(message):
+            if message["type"] == "http.response.start":
+                duration = time.perf_counter() - started
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(timings, duration))
+                metrics.observe(timings, message["status"], duration)
+                if timings.statements > SQL_STATEMENT_WARN_THRESHOLD:
+                    logger.warning(
+                        "%s %s ran %d SQL statements (threshold %d); "
+                        "possible N+1 query",
+                        scope["method"],
+                        scope["path"],
+                        timings.statements,
+                        SQL_STATEMENT_WARN_THRESHOLD,
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            current_timings.reset(token)
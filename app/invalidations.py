@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Set
+
+from sqlalchemy import delete, func, insert, select
+
+from app.database import AsyncSessionLocal
+from app.job_locks import PROCESS_ID, acquire_job_lock
+from app.models import Invalidation
+
+logger = logging.getLogger(__name__)
+
+# Share invalidations of in-memory state between the worker processes of a
+# deployment through the invalidations table; gunicorn.conf.py turns this on
+# when it starts more than one worker
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "none")
+# How often (milliseconds) each process publishes its own invalidations and
+# reads those of the others
+INVALIDATION_POLL_MS = float(os.getenv("INVALIDATION_POLL_MS", "100"))
+# Invalidations older than this are deleted
+INVALIDATION_RETENTION = timedelta(
+    seconds=int(os.getenv("INVALIDATION_RETENTION_SECONDS", "300"))
+)
+
+PRUNE_INTERVAL = timedelta(seconds=60)
+
+# Called with the keys other processes invalidated since the last poll
+Listener = Callable[[Set[str]], Awaitable[None]]
+
+
+class InvalidationChannel:
+    """
+    Tells the other worker processes which keys of their in-memory state
+    (cached responses, live counters) were changed by this one.
+
+    `publish` only queues the keys. Every poll interval a background task
+    inserts the queued keys into the invalidations table with one statement,
+    reads the rows the other processes added since its last poll and hands
+    their keys to every listener, so a change made in one worker reaches the
+    others within about two poll intervals. Once a minute, the process
+    holding the "invalidation_prune" job lock deletes the rows older than the
+    retention.
+
+    Rows are read in invalidation_id order. On MySQL a row can commit after
+    a higher id was already read and is then missed; the cache TTL still
+    bounds how long such an entry stays stale.
+    """
+
+    def __init__(self, enabled: bool, poll_interval: float, retention: timedelta):
+        self.enabled = enabled
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._listeners: List[Listener] = []
+        self._pending: Set[str] = set()
+        self._last_id: Optional[int] = None
+        self._pruned_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def publish(self, *keys: str):
+        if self.enabled:
+            self._pending.update(keys)
+
+    async def start(self):
+        """Starts polling, from the invalidations published so far."""
+        if self._task:
+            return
+        async with AsyncSessionLocal() as db:
+            self._last_id = (
+                await db.scalar(select(func.max(Invalidation.invalidation_id))) or 0
+            )
+        self._stopping = asyncio.Event()
+        self._task = asyncio.ensure_future(self._poll_periodically())
+
+    async def _poll_periodically(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Polling invalidations failed; will retry")
+
+    async def poll(self):
+        """Publishes the queued keys and delivers the other processes' keys."""
+        keys, self._pending = self._pending, set()
+        try:
+            async with AsyncSessionLocal() as db:
+                if keys:
+                    await db.execute(
+                        insert(Invalidation),
+                        [{"key": key, "origin": PROCESS_ID} for key in keys],
+                    )
+                rows = (
+                    await db.execute(
+                        select(
+                            Invalidation.invalidation_id,
+                            Invalidation.key,
+                            Invalidation.origin,
+                        )
+                        .where(Invalidation.invalidation_id > self._last_id)
+                        .order_by(Invalidation.invalidation_id)
+                    )
+                ).all()
+                await db.commit()
+        except Exception:
+            self._pending |= keys
+            raise
+
+        if rows:
+            self._last_id = rows[-1].invalidation_id
+        changed = {row.key for row in rows if row.origin != PROCESS_ID}
+        if changed:
+            for listener in self._listeners:
+                await listener(changed)
+
+        if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL.total_seconds():
+            self._pruned_at = time.monotonic()
+            await self._prune()
+
+    async def _prune(self):
+        async with AsyncSessionLocal() as db:
+            if not await db.run_sync(
+                acquire_job_lock, "invalidation_prune", PRUNE_INTERVAL
+            ):
+                return
+            await db.execute(
+                delete(Invalidation).where(
+                    Invalidation.created_at < datetime.now() - self.retention
+                )
+            )
+            await db.commit()
+
+    async def stop(self):
+        """Publishes what is still queued and stops polling."""
+        if not self._task:
+            return
+        # The task polls once more before it returns
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+
+if INVALIDATION_CHANNEL not in ("none", "database"):
+    raise ValueError(f"Unknown INVALIDATION_CHANNEL '{INVALIDATION_CHANNEL}'")
+
+invalidations = InvalidationChannel(
+    INVALIDATION_CHANNEL == "database",
+    INVALIDATION_POLL_MS / 1000,
+    INVALIDATION_RETENTION,
+)
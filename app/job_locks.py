@@ -0,0 +1,45 @@
+import os
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import JobLock
+
+# Identifies this process as a lock owner across the cluster
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_job_lock(
+    db: Session, name: str, ttl: timedelta, owner: str = PROCESS_ID
+) -> bool:
+    """
+    Takes or renews a lease on the named job lock in the job_locks table.
+    The lease succeeds when the lock is free, expired, or already held by
+    `owner`, so the current holder keeps running the job on every tick and
+    another process only takes over once the holder stops renewing.
+    """
+    now = datetime.now()
+    renewed = db.execute(
+        update(JobLock)
+        .where(
+            JobLock.name == name,
+            or_(JobLock.locked_until < now, JobLock.owner == owner),
+        )
+        .values(owner=owner, locked_until=now + ttl)
+        .execution_options(synchronize_session=False)
+    )
+    if renewed.rowcount == 1:
+        db.commit()
+        return True
+
+    try:
+        db.add(JobLock(name=name, owner=owner, locked_until=now + ttl))
+        db.commit()
+        return True
+    except IntegrityError:
+        # The row exists and is leased by another process
+        db.rollback()
+        return False
@@ -0,0 +1,303 @@
+import hashlib
+import hmac
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, bindparam, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Attendee, KioskCheckIn
+from app.pagination import STREAM_BATCH_SIZE
+from app.schemas import KioskScan
+from app.stats import recount_checked_in
+
+MAX_FEED_PAGE_SIZE = 1000
+
+# Secret the email hashes are keyed with; kiosks are provisioned with it
+KIOSK_HASH_KEY = os.getenv("KIOSK_HASH_KEY", "")
+# How long after its updated_at a change may still commit. Writers stamp
+# updated_at from their own clock before they commit, so a change can become
+# visible after a later-stamped one was read; the feed keeps re-sending the
+# changes of the last FEED_SETTLE_WINDOW until they are older than that.
+# Covers transaction time plus clock skew between the app hosts. It does not
+# cover replication delay, so the feed and the search index read the primary.
+FEED_SETTLE_WINDOW = timedelta(
+    seconds=float(os.getenv("KIOSK_FEED_SETTLE_SECONDS", "5"))
+)
+
+# Outcomes of a pushed scan
+APPLIED = "applied"
+STALE = "stale"
+DUPLICATE = "duplicate"
+UNKNOWN_ATTENDEE = "unknown_attendee"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KioskNotConfigured(RuntimeError):
+    pass
+
+
+def require_hash_key():
+    if not KIOSK_HASH_KEY:
+        raise KioskNotConfigured("Kiosk sync requires KIOSK_HASH_KEY to be set")
+
+
+def email_hash(email: str) -> str:
+    """
+    First 16 hex digits of the HMAC-SHA-256, keyed with KIOSK_HASH_KEY, of
+    the normalized email. Kiosks hash what they scan the same way, so they
+    never hold attendees' addresses, and without the key the hashes can't be
+    matched against a list of guessed addresses.
+    """
+    return hmac.new(
+        KIOSK_HASH_KEY.encode(), email.strip().lower().encode(), hashlib.sha256
+    ).hexdigest()[:16]
+
+
+def compact(attendee_id: int, email: str, check_in_status: bool) -> list:
+    """An attendee as the kiosks store it: [attendee_id, email_hash, checked_in]."""
+    return [attendee_id, email_hash(email), bool(check_in_status)]
+
+
+def encode_cursor(updated_at: datetime, attendee_id: int) -> str:
+    return f"{updated_at.isoformat()}_{attendee_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        updated_at, attendee_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(updated_at), int(attendee_id)
+    except ValueError:
+        raise InvalidCursor(f"Invalid cursor '{cursor}'")
+
+
+def after_cursor(cursor: str):
+    """Attendees changed after the cursor, in (updated_at, attendee_id) order."""
+    updated_at, attendee_id = decode_cursor(cursor)
+    return and_(
+        # Redundant, but gives the index a range to seek to: on its own, the
+        # OR below makes SQLite scan every attendee of the event
+        Attendee.updated_at >= updated_at,
+        or_(
+            Attendee.updated_at > updated_at,
+            and_(
+                Attendee.updated_at == updated_at,
+                Attendee.attendee_id > attendee_id,
+            ),
+        ),
+    )
+
+
+def feed_order():
+    return Attendee.updated_at, Attendee.attendee_id
+
+
+def settle_horizon() -> datetime:
+    """Changes stamped up to this time are taken to be committed."""
+    return datetime.now() - FEED_SETTLE_WINDOW
+
+
+def settled_cursor(rows, horizon: datetime, since: Optional[str]) -> Optional[str]:
+    """
+    Cursor after the last of `rows` (in feed order, with updated_at and
+    attendee_id) stamped up to `horizon`, or `since` if none was. Reading on
+    from it returns the unsettled rows again, along with any change that
+    commits late with an earlier stamp.
+    """
+    settled = [row for row in rows if row.updated_at <= horizon]
+    if not settled:
+        return since
+    return encode_cursor(settled[-1].updated_at, settled[-1].attendee_id)
+
+
+async def latest_cursor(db: AsyncSession, event_id: int) -> Optional[str]:
+    """Cursor after the event's last settled change."""
+    row = (
+        await db.execute(
+            select(Attendee.updated_at, Attendee.attendee_id)
+            .where(
+                Attendee.event_id == event_id, Attendee.updated_at <= settle_horizon()
+            )
+            .order_by(*(column.desc() for column in feed_order()))
+            .limit(1)
+        )
+    ).first()
+    return encode_cursor(*row) if row else None
+
+
+def snapshot_response(db: AsyncSession, event_id: int, cursor: Optional[str]):
+    """
+    Streams {"event_id", "cursor", "attendees": [compact attendee, ...]}.
+    The cursor is read before the rows and stops short of the settle window,
+    so the change feed from it repeats anything that changed, or committed
+    late, while the snapshot was taken rather than missing it; kiosks apply
+    changes idempotently.
+    """
+    require_hash_key()
+
+    async def body():
+        header = {"event_id": event_id, "cursor": cursor}
+        yield json.dumps(header)[:-1] + ', "attendees": ['
+        result = await db.stream(
+            select(Attendee.attendee_id, Attendee.email, Attendee.check_in_status)
+            .where(Attendee.event_id == event_id)
+            .order_by(Attendee.attendee_id)
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        separator = ""
+        async for batch in result.partitions():
+            yield separator + ",".join(json.dumps(compact(*row)) for row in batch)
+            separator = ","
+        yield "]}"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+async def changes_since(
+    db: AsyncSession, event_id: int, since: Optional[str], limit: int
+) -> dict:
+    """
+    One page of the change feed: attendees of the event changed after
+    `since`. The cursor returned only moves past settled changes, so changes
+    from the last FEED_SETTLE_WINDOW are sent again by the next page.
+    """
+    require_hash_key()
+    horizon = settle_horizon()
+    query = select(
+        Attendee.attendee_id,
+        Attendee.email,
+        Attendee.check_in_status,
+        Attendee.updated_at,
+    ).where(Attendee.event_id == event_id)
+    if since:
+        query = query.where(after_cursor(since))
+    rows = (await db.execute(query.order_by(*feed_order()).limit(limit))).all()
+
+    return {
+        "changes": [compact(*row[:3]) for row in rows],
+        "cursor": settled_cursor(rows, horizon, since),
+        # A full page that ends in unsettled changes would be fetched again
+        # as is; the rest follows once they settle
+        "has_more": len(rows) == limit and rows[-1].updated_at <= horizon,
+    }
+
+
+async def apply_check_ins(
+    db: AsyncSession, event_id: int, scans: List[KioskScan]
+) -> Tuple[List[dict], Set[int]]:
+    """
+    Applies a pushed batch of kiosk scans in the caller's transaction.
+
+    Scans whose idempotency key was already recorded are reported as
+    duplicates and not applied again. The others are merged with
+    last-write-wins: a scan takes effect only if it is newer than the
+    attendee's last check-in change, from any source. Scan times are
+    capped at the server's clock, so a kiosk with a fast clock cannot win
+    every future conflict.
+
+    Returns a result per scan, in push order, with the attendee's resulting
+    check-in status, and the ids of the attendees that changed.
+    """
+    keys = [scan.key for scan in scans]
+    recorded = set(
+        await db.scalars(
+            select(KioskCheckIn.idempotency_key).where(
+                KioskCheckIn.idempotency_key.in_(keys)
+            )
+        )
+    )
+
+    # Locked so a concurrent push or check-in cannot interleave with the merge
+    attendee_ids = {scan.attendee_id for scan in scans}
+    state: Dict[int, list] = {
+        attendee_id: [check_in_status, check_in_updated_at]
+        for attendee_id, check_in_status, check_in_updated_at in await db.execute(
+            select(
+                Attendee.attendee_id,
+                Attendee.check_in_status,
+                Attendee.check_in_updated_at,
+            )
+            .where(
+                Attendee.attendee_id.in_(attendee_ids), Attendee.event_id == event_id
+            )
+            .with_for_update()
+        )
+    }
+    # Stamped once the locks are held, so the feed's settle window only has
+    # to cover the rest of the transaction
+    now = datetime.now()
+
+    outcomes: Dict[int, str] = {}
+    fresh = []
+    for index, scan in enumerate(scans):
+        if scan.key in recorded:
+            outcomes[index] = DUPLICATE
+        else:
+            recorded.add(scan.key)
+            fresh.append((index, scan))
+
+    winners: Dict[int, list] = {}
+    # Newest first: an attendee's latest scan wins, older ones in the batch are stale
+    for index, scan in sorted(fresh, key=lambda item: item[1].at, reverse=True):
+        scanned_at = min(scan.at, now)
+        current = state.get(scan.attendee_id)
+        if current is None:
+            outcomes[index] = UNKNOWN_ATTENDEE
+        elif current[1] is not None and scanned_at <= current[1]:
+            outcomes[index] = STALE
+        else:
+            current[:] = [scan.checked_in, scanned_at]
+            winners[scan.attendee_id] = current
+            outcomes[index] = APPLIED
+
+    if winners:
+        await db.execute(
+            update(Attendee.__table__)
+            .where(Attendee.__table__.c.attendee_id == bindparam("b_attendee_id"))
+            .values(
+                check_in_status=bindparam("b_check_in_status"),
+                check_in_updated_at=bindparam("b_check_in_updated_at"),
+                updated_at=now,
+            ),
+            [
+                {
+                    "b_attendee_id": attendee_id,
+                    "b_check_in_status": current[0],
+                    "b_check_in_updated_at": current[1],
+                }
+                for attendee_id, current in winners.items()
+            ],
+        )
+        await recount_checked_in(db, [event_id])
+    if fresh:
+        await db.execute(
+            insert(KioskCheckIn),
+            [
+                {
+                    "idempotency_key": scan.key,
+                    "attendee_id": scan.attendee_id,
+                    "outcome": outcomes[index],
+                    "received_at": now,
+                }
+                for index, scan in fresh
+            ],
+        )
+
+    results = []
+    for index, scan in enumerate(scans):
+        current = state.get(scan.attendee_id)
+        results.append(
+            {
+                "key": scan.key,
+                "attendee_id": scan.attendee_id,
+                "outcome": outcomes[index],
+                "check_in_status": None if current is None else bool(current[0]),
+            }
+        )
+    return results, set(winners)
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Set
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.invalidations import InvalidationChannel, invalidations
+from app.models import Event
+
+# How often (seconds) a watched event's counters are reloaded from the
+# database, picking up writes made by other workers or other code paths
+RESYNC_INTERVAL = float(os.getenv("LIVE_COUNTERS_RESYNC_SECONDS", "30"))
+
+# Idle subscribers get a keep-alive after this many seconds
+HEARTBEAT_INTERVAL = 15.0
+
+# Reads of an event's row per reload while `add`s keep landing during them
+RELOAD_ATTEMPTS = 3
+
+
+def counters_key(event_id: int) -> str:
+    return f"counters:{event_id}"
+
+
+class WatchedEvent:
+    __slots__ = ("counters", "loaded_at", "changes", "subscribers", "lock")
+
+    def __init__(self):
+        self.counters: Optional[dict] = None
+        self.loaded_at = 0.0
+        # Number of `add`s made, so that a reload can tell if one raced it
+        self.changes = 0
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.lock = asyncio.Lock()
+
+
+class LiveCounters:
+    """
+    Registered, checked-in and remaining-capacity counters of the events that
+    dashboards are watching, kept in process memory.
+
+    An event's counters are read from its row (registered_count and
+    checked_in_count) when its first subscriber arrives, then moved by the
+    write paths through `add`, and broadcast to every subscriber. However many
+    dashboards watch an event, the database sees at most one reload per
+    RESYNC_INTERVAL for it. Events nobody watches
+    are not tracked, so writes to them cost nothing here.
+    Changes are also published on the `channel`, and watched events that
+    another worker changed are reloaded when the channel reports them.
+    """
+
+    def __init__(self, channel: InvalidationChannel):
+        self._events: Dict[int, WatchedEvent] = {}
+        self.channel = channel
+        channel.subscribe(self._changed_elsewhere)
+
+    async def _changed_elsewhere(self, keys: Set[str]):
+        changed = [
+            event_id for event_id in self._events if counters_key(event_id) in keys
+        ]
+        for event_id in changed:
+            # Its last subscriber may have left during an earlier reload
+            watched = self._events.get(event_id)
+            if watched is not None:
+                await self._reload(event_id, watched, force=True)
+
+    async def _load(self, event_id: int) -> Optional[dict]:
+        async with AsyncSessionLocal() as db:
+            row = (
+                await db.execute(
+                    select(
+                        Event.registered_count,
+                        Event.max_attendees,
+                        Event.checked_in_count,
+                    ).where(Event.event_id == event_id)
+                )
+            ).first()
+        if row is None:
+            return None
+        registered, max_attendees, checked_in = row
+        return {
+            "event_id": event_id,
+            "registered": registered,
+            "checked_in": checked_in,
+            "max_attendees": max_attendees,
+            "remaining": max(max_attendees - registered, 0),
+        }
+
+    async def _reload(self, event_id: int, watched: WatchedEvent, force: bool):
+        async with watched.lock:
+            due = time.monotonic() - watched.loaded_at >= RESYNC_INTERVAL
+            if watched.counters is not None and not (force or due):
+                return
+            for _ in range(RELOAD_ATTEMPTS):
+                changes = watched.changes
+                counters = await self._load(event_id)
+                # A change added during the read may or may not be in the row
+                # read, so the row can neither replace nor be added to the
+                # counters: read it again
+                if watched.changes == changes:
+                    break
+            else:
+                if watched.counters is not None:
+                    # Keeps the counters the changes moved; the next resync
+                    # tries again
+                    return
+            watched.loaded_at = time.monotonic()
+            if counters is not None and counters != watched.counters:
+                watched.counters = counters
+                self._publish(watched)
+
+    def _publish(self, watched: WatchedEvent):
+        for queue in watched.subscribers:
+            # Slow subscribers only need the latest value
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(watched.counters)
+
+    async def subscribe(self, event_id: int) -> Optional[asyncio.Queue]:
+        """
+        Returns a queue that yields the event's counters now and after every
+        change, or None if the event does not exist. Pair with `unsubscribe`.
+        """
+        watched = self._events.setdefault(event_id, WatchedEvent())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        watched.subscribers.add(queue)
+        await self._reload(event_id, watched, force=False)
+        if watched.counters is None:
+            self.unsubscribe(event_id, queue)
+            return None
+        if queue.empty():
+            queue.put_nowait(watched.counters)
+        return queue
+
+    def unsubscribe(self, event_id: int, queue: asyncio.Queue):
+        watched = self._events.get(event_id)
+        if watched is None:
+            return
+        watched.subscribers.discard(queue)
+        if not watched.subscribers:
+            del self._events[event_id]
+
+    async def current(self, event_id: int) -> Optional[dict]:
+        """The event's counters, from memory when it is being watched."""
+        watched = self._events.get(event_id)
+        if watched is not None and watched.counters is not None:
+            return watched.counters
+        return await self._load(event_id)
+
+    async def wait(self, event_id: int, queue: asyncio.Queue) -> Optional[dict]:
+        """
+        Next counters for a subscriber, or None after HEARTBEAT_INTERVAL
+        without changes (time to send a keep-alive). Idle waits also trigger
+        the periodic resync.
+        """
+        try:
+            return await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+        except asyncio.TimeoutError:
+            watched = self._events.get(event_id)
+            if watched is not None:
+                await self._reload(event_id, watched, force=False)
+            return None if queue.empty() else queue.get_nowait()
+
+    def add(self, event_id: int, registered: int = 0, checked_in: int = 0):
+        """Applies a committed change to a watched event's counters."""
+        self.channel.publish(counters_key(event_id))
+        watched = self._events.get(event_id)
+        if watched is None:
+            return
+        watched.changes += 1
+        if watched.counters is None:
+            return
+        counters = dict(watched.counters)
+        counters["registered"] += registered
+        counters["checked_in"] += checked_in
+        counters["remaining"] = max(
+            counters["max_attendees"] - counters["registered"], 0
+        )
+        watched.counters = counters
+        self._publish(watched)
+
+    async def refresh(self, event_id: int):
+        """Reloads a watched event after a change `add` cannot express."""
+        self.channel.publish(counters_key(event_id))
+        watched = self._events.get(event_id)
+        if watched is not None:
+            await self._reload(event_id, watched, force=True)
+
+
+live_counters = LiveCounters(invalidations)
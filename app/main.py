@@ -1,44 +1,91 @@
-from fastapi import FastAPI, HTTPException
-from app.database import engine, Base
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.database import dispose_engines, ping_databases
 from app.routers import events, attendees
-from app import update_event_status
-from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
-from app.database import SessionLocal
-from app.models import Event, EventStatus
-from app.routers import check_in
+from app.background_tasks import ENABLE_SCHEDULER, build_scheduler
+from app.cache import cache
+from app.instrumentation import InstrumentationMiddleware, metrics
+from app.invalidations import invalidations
+from app.routers import check_in, counters, kiosk, waitlist
+from app.write_behind import check_in_write_behind
 
+# Health and metrics routes of the app itself
+router = APIRouter()
 
-app = FastAPI(title="Event Management API")
 
+# Nothing runs at import time: the scheduler, the write-behind flusher and the
+# invalidation channel start here, database engines on first use, and the
+# schema is managed by Alembic (`alembic upgrade head`) outside the API process.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scheduler = build_scheduler() if ENABLE_SCHEDULER else None
+    if scheduler:
+        scheduler.start()
+    # Replay check-ins journaled before a crash
+    if check_in_write_behind.enabled:
+        await check_in_write_behind.start()
+    # Hear about cache and counter changes made by the other workers
+    if invalidations.enabled:
+        await invalidations.start()
+    try:
+        yield
+    finally:
+        # Flush the pending check-ins before the connections go away
+        await check_in_write_behind.stop()
+        # ...then publish the invalidations queued by the last requests
+        await invalidations.stop()
+        if scheduler:
+            scheduler.shutdown(wait=False)
+        await dispose_engines()
 
-# Function to update event statuses periodically
-def update_event_statuses():
-    db = SessionLocal()
-    events = (
-        db.query(Event)
-        .filter(Event.end_time < datetime.now(), Event.status != EventStatus.COMPLETED)
-        .all()
-    )
-    for event in events:
-        event.status = EventStatus.COMPLETED
-        db.commit()
-    db.close()
 
+def create_app() -> FastAPI:
+    app = FastAPI(title="Event Management API", lifespan=lifespan)
+
+    # Server-Timing headers, /metrics counters and N+1 query warnings
+    app.add_middleware(InstrumentationMiddleware)
+
+    try:
+        app.include_router(events.router, prefix="/events", tags=["Events"])
+        app.include_router(counters.router, prefix="/events", tags=["Counters"])
+        app.include_router(attendees.router, prefix="/attendees", tags=["Attendees"])
+        app.include_router(check_in.router, prefix="/attendees", tags=["Attendees"])
+        app.include_router(kiosk.router, prefix="/kiosk", tags=["Kiosk"])
+        app.include_router(waitlist.router, prefix="/waitlist", tags=["Waitlist"])
+        app.include_router(router)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading routers: {e}")
+
+    return app
 
-scheduler = BackgroundScheduler()
-scheduler.add_job(update_event_statuses, "interval", minutes=10)
-scheduler.start()
 
-try:
-    Base.metadata.create_all(bind=engine)
-except Exception as e:
-    raise HTTPException(status_code=500, detail=f"Error creating database tables: {e}")
+# Hit/miss counters of the event and attendee lookup cache
+@router.get("/cache/stats", tags=["Cache"])
+async def cache_stats():
+    return cache.stats()
+
+
+# Per-route request, SQL, ORM and encoding metrics in the Prometheus text format
+@router.get("/metrics", tags=["Metrics"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return metrics.render({"cache_hits": cache.hits, "cache_misses": cache.misses})
+
+
+# Liveness of the primary database (and the read replica, when configured);
+# 503 if any of them cannot run a query
+@router.get("/health", tags=["Metrics"])
+async def health():
+    errors = await ping_databases()
+    healthy = not any(errors.values())
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={
+            "status": "ok" if healthy else "unavailable",
+            "databases": {name: error or "ok" for name, error in errors.items()},
+        },
+    )
 
-try:
-    app.include_router(events.router, prefix="/events", tags=["Events"])
-    app.include_router(attendees.router, prefix="/attendees", tags=["Attendees"])
-    app.include_router(check_in.router, prefix="/attendees", tags=["Attendees"])
 
-except Exception as e:
-    raise HTTPException(status_code=500, detail=f"Error loading routers: {e}")
+app = create_app()
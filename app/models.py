@@ -2,17 +2,25 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
+    Text,
     DateTime,
     ForeignKey,
     Boolean,
     Enum,
+    Index,
+    UniqueConstraint,
+    case,
+    literal,
+    and_,
+    or_,
 )
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
+from app.database import Base
+from datetime import datetime
 import enum
 
-Base = declarative_base()
-
 
 class EventStatus(enum.Enum):
     SCHEDULED = "SCHEDULED"
@@ -21,6 +29,32 @@ class EventStatus(enum.Enum):
     CANCELED = "CANCELED"
 
 
+# MySQL DATETIME keeps whole seconds unless asked for microseconds; change feed
+# cursors and last-write-wins comparisons need the sub-second part
+PreciseDateTime = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+
+# Statuses that are stored because they cannot be derived from the event times
+TERMINAL_STATUSES = (EventStatus.CANCELED, EventStatus.COMPLETED)
+
+
+def derive_event_status(
+    stored_status: EventStatus, start_time: datetime, end_time: datetime, now=None
+) -> EventStatus:
+    """
+    The status of an event at `now`: a terminal stored status wins, otherwise it
+    follows from the start and end times.
+    """
+    now = now or datetime.now()
+    if stored_status in TERMINAL_STATUSES:
+        return stored_status
+    if end_time < now:
+        return EventStatus.COMPLETED
+    if start_time <= now:
+        return EventStatus.ONGOING
+    return EventStatus.SCHEDULED
+
+
 class Event(Base):
     __tablename__ = "events"
 
@@ -31,10 +65,77 @@ class Event(Base):
     end_time = Column(DateTime, nullable=False)
     location = Column(String, nullable=False)
     max_attendees = Column(Integer, nullable=False)
-    status = Column(Enum(EventStatus), default=EventStatus.SCHEDULED, nullable=False)
+    # Maintained by app.registration so capacity checks never COUNT(*) attendees
+    registered_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Maintained by every check-in path (see app.stats) for stats and counters
+    checked_in_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Waitlist tickets issued so far; the next entry gets waitlist_tickets + 1
+    waitlist_tickets = Column(Integer, nullable=False, default=0, server_default="0")
+    # Only CANCELED and COMPLETED are authoritative here; use `status` for the
+    # current status, which is derived from the event times
+    stored_status = Column(
+        "status", Enum(EventStatus), default=EventStatus.SCHEDULED, nullable=False
+    )
 
     attendees = relationship("Attendee", back_populates="event")
 
+    @hybrid_property
+    def status(self):
+        return derive_event_status(self.stored_status, self.start_time, self.end_time)
+
+    @status.setter
+    def status(self, value):
+        self.stored_status = (
+            EventStatus[value.upper()] if isinstance(value, str) else value
+        )
+
+    @status.expression
+    def status(cls):
+        now = datetime.now()
+
+        def status_literal(status: EventStatus):
+            # Bound like the column, so the CASE can be selected and grouped by
+            return literal(status, cls.stored_status.type)
+
+        return case(
+            (cls.stored_status.in_(TERMINAL_STATUSES), cls.stored_status),
+            (cls.end_time < now, status_literal(EventStatus.COMPLETED)),
+            (cls.start_time <= now, status_literal(EventStatus.ONGOING)),
+            else_=status_literal(EventStatus.SCHEDULED),
+        )
+
+    @classmethod
+    def status_is(cls, status: EventStatus, now=None):
+        """
+        Same result as `Event.status == status`, written as range predicates on
+        the stored status and event times so it can use the status indexes.
+        """
+        now = now or datetime.now()
+        derived = cls.stored_status.not_in(TERMINAL_STATUSES)
+        if status == EventStatus.CANCELED:
+            return cls.stored_status == EventStatus.CANCELED
+        if status == EventStatus.COMPLETED:
+            return or_(
+                cls.stored_status == EventStatus.COMPLETED,
+                and_(derived, cls.end_time < now),
+            )
+        if status == EventStatus.ONGOING:
+            return and_(derived, cls.start_time <= now, cls.end_time >= now)
+        return and_(derived, cls.start_time > now)
+
+    __table_args__ = (
+        # Status filters and the status sweep (SCHEDULED -> ONGOING -> COMPLETED)
+        Index("ix_events_status_start_time", "status", "start_time"),
+        Index("ix_events_status_end_time", "status", "end_time"),
+        # Date filtering in list_events
+        Index("ix_events_start_time", "start_time"),
+        # Prefix and full-text location search in list_events
+        Index("ix_events_location", "location"),
+        Index(
+            "ix_events_location_fulltext", "location", mysql_prefix="FULLTEXT"
+        ).ddl_if(dialect="mysql"),
+    )
+
 
 class Attendee(Base):
     __tablename__ = "attendees"
@@ -46,5 +147,106 @@ class Attendee(Base):
     phone_number = Column(String, nullable=True)
     event_id = Column(Integer, ForeignKey("events.event_id"), nullable=False)
     check_in_status = Column(Boolean, default=False)
+    # When check_in_status was last set; later kiosk check-ins win
+    check_in_updated_at = Column(PreciseDateTime, nullable=True)
+    # Bumped by every insert and update, ORM or Core; drives the kiosk change feed
+    updated_at = Column(
+        PreciseDateTime, nullable=False, default=datetime.now, onupdate=datetime.now
+    )
 
     event = relationship("Event", back_populates="attendees")
+
+    __table_args__ = (
+        # Attendee lists of an event, paged by attendee_id
+        Index("ix_attendees_event_id", "event_id"),
+        # Check-in filters and counts per event
+        Index("ix_attendees_event_id_check_in_status", "event_id", "check_in_status"),
+        # Kiosk change feed of an event, in (updated_at, attendee_id) order
+        Index("ix_attendees_event_id_updated_at", "event_id", "updated_at"),
+    )
+
+
+class WaitlistStatus(enum.Enum):
+    WAITING = "WAITING"
+    PROMOTED = "PROMOTED"
+    # Reached the front, but the email had been registered in the meantime
+    SKIPPED = "SKIPPED"
+
+
+class WaitlistEntry(Base):
+    """Someone waiting for a seat at a full event, in ticket order."""
+
+    __tablename__ = "waitlist_entries"
+
+    entry_id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("events.event_id"), nullable=False)
+    # 1, 2, 3, ... per event. Entries leave the queue strictly in ticket order,
+    # so the waiting tickets of an event are always contiguous
+    ticket = Column(Integer, nullable=False)
+    first_name = Column(String, nullable=False)
+    last_name = Column(String, nullable=False)
+    email = Column(String, nullable=False)
+    phone_number = Column(String, nullable=True)
+    status = Column(
+        Enum(WaitlistStatus), nullable=False, default=WaitlistStatus.WAITING
+    )
+    # The attendee created when the entry was promoted
+    attendee_id = Column(Integer, ForeignKey("attendees.attendee_id"), nullable=True)
+    joined_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint("event_id", "ticket", name="uq_waitlist_entries_ticket"),
+        UniqueConstraint("event_id", "email", name="uq_waitlist_entries_email"),
+        # Head of an event's queue, and the next entries to promote
+        Index(
+            "ix_waitlist_entries_event_id_status_ticket", "event_id", "status", "ticket"
+        ),
+    )
+
+
+class KioskCheckIn(Base):
+    """Check-ins pushed by kiosks, keyed by the kiosk's idempotency key."""
+
+    __tablename__ = "kiosk_check_ins"
+
+    idempotency_key = Column(String(64), primary_key=True)
+    attendee_id = Column(Integer, nullable=False)
+    outcome = Column(String(32), nullable=False)
+    received_at = Column(DateTime, nullable=False, default=datetime.now)
+
+
+class JobLock(Base):
+    __tablename__ = "job_locks"
+
+    name = Column(String(64), primary_key=True)
+    owner = Column(String(128), nullable=False)
+    locked_until = Column(DateTime, nullable=False)
+
+
+class Invalidation(Base):
+    """Keys of in-memory state changed by one process, for the others to drop."""
+
+    __tablename__ = "invalidations"
+
+    invalidation_id = Column(Integer, primary_key=True)
+    key = Column(String(255), nullable=False)
+    # PROCESS_ID of the publisher, which skips its own invalidations
+    origin = Column(String(128), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    # Pruning of old invalidations
+    __table_args__ = (Index("ix_invalidations_created_at", "created_at"),)
+
+
+class IdempotencyRecord(Base):
+    """Outcome (or in-progress claim) of a request, by its Idempotency-Key."""
+
+    __tablename__ = "idempotency_records"
+
+    # SHA-256 of the method, path and Idempotency-Key
+    key_hash = Column(String(64), primary_key=True)
+    value = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    # Pruning of expired records
+    __table_args__ = (Index("ix_idempotency_records_expires_at", "expires_at"),)
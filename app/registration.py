@@ -0,0 +1,87 @@
+from fastapi import HTTPException
+from sqlalchemy import exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Attendee, Event
+from app.schemas import AttendeeCreate
+from app.stats import add_checked_in
+
+
+class EventFull(HTTPException):
+    """Raised by `register` when the event has no seat left."""
+
+    def __init__(self, max_attendees: int):
+        super().__init__(
+            status_code=400,
+            detail=f"Cannot add attendee. The event has reached its maximum attendee limit of {max_attendees}.",
+        )
+
+
+async def reserve_seats(db: AsyncSession, event_id: int, seats: int = 1) -> bool:
+    """
+    Atomically takes `seats` places from the event's capacity.
+    The conditional UPDATE holds the event row lock until the caller commits,
+    so concurrent registrations can never push registered_count past
+    max_attendees. Returns False when the event does not have enough room.
+    """
+    result = await db.execute(
+        update(Event)
+        .where(
+            Event.event_id == event_id,
+            Event.registered_count + seats <= Event.max_attendees,
+        )
+        .values(registered_count=Event.registered_count + seats)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+async def register(db: AsyncSession, attendee: AttendeeCreate) -> Attendee:
+    """
+    Registers an attendee within the caller's transaction.
+    Email uniqueness and the event's capacity are checked in a single query;
+    the seat itself is then taken with `reserve_seats`. The caller commits, or
+    rolls back on IntegrityError (an email registered concurrently).
+    """
+    in_event = Event.event_id == attendee.event_id
+    snapshot = (
+        await db.execute(
+            select(
+                exists().where(Attendee.email == attendee.email).label("email_taken"),
+                select(Event.max_attendees)
+                .where(in_event)
+                .scalar_subquery()
+                .label("max_attendees"),
+                select(Event.registered_count)
+                .where(in_event)
+                .scalar_subquery()
+                .label("registered_count"),
+            )
+        )
+    ).one()
+
+    if snapshot.email_taken:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Attendee with email '{attendee.email}' already exists.",
+        )
+    if snapshot.max_attendees is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if snapshot.registered_count >= snapshot.max_attendees or not await reserve_seats(
+        db, attendee.event_id
+    ):
+        raise EventFull(snapshot.max_attendees)
+
+    db_attendee = Attendee(
+        first_name=attendee.first_name,
+        last_name=attendee.last_name,
+        email=attendee.email,
+        phone_number=attendee.phone_number,
+        event_id=attendee.event_id,
+        check_in_status=attendee.check_in_status or False,
+    )
+    db.add(db_attendee)
+    if db_attendee.check_in_status:
+        await add_checked_in(db, attendee.event_id)
+    await db.flush()
+    return db_attendee
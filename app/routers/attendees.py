@@ -1,119 +1,305 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Depends,
+    File,
+    Header,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.attendee_search import MAX_SEARCH_RESULTS, attendee_search
+from app.bulk_import import (
+    IMPORT_FORMATS,
+    InvalidImportFile,
+    import_attendees,
+    iter_import_rows,
+)
+from app.cache import attendee_key, cache
+from app.database import get_db, get_read_db
+from app.idempotency import MAX_KEY_LENGTH, idempotency
+from app.live_counters import live_counters
+from app.instrumentation import TimedRoute
 from app.models import Attendee, Event
-from app.schemas import AttendeeCreate, AttendeeUpdate, AttendeeResponse
+from app.uploads import rows_in_threadpool
+from app.registration import EventFull, register
+from app.schemas import (
+    AttendeeCreate,
+    AttendeeUpdate,
+    AttendeeResponse,
+    WaitlistEntryResponse,
+)
+from app.stats import recount_checked_in
+from app.waitlist import (
+    entry_response,
+    join_waitlist,
+    promote_waitlist,
+    promotion_signals,
+)
+from app.pagination import (
+    MAX_PAGE_SIZE,
+    RESPONSE_FORMATS,
+    fast_json_response,
+    keyset_paginate,
+    ndjson_response,
+    set_next_cursor,
+)
 from typing import List, Optional
+from datetime import datetime
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 # API to create an attendee
-@router.post("/", response_model=AttendeeResponse)
-async def register_attendee(attendee: AttendeeCreate, db: Session = Depends(get_db)):
-    try:
+# Send an Idempotency-Key header to make retries safe: a retried request gets
+# the original response back instead of registering again.
+# With `waitlist=true`, a full event queues the attendee instead of refusing
+# them: the response is 202 with the waitlist entry to follow.
+@router.post(
+    "/",
+    response_model=AttendeeResponse,
+    responses={202: {"model": WaitlistEntryResponse}},
+)
+async def register_attendee(
+    request: Request,
+    attendee: AttendeeCreate,
+    waitlist: bool = False,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=MAX_KEY_LENGTH),
+):
+    async def create():
+        try:
+            db_attendee = await register(db, attendee)
+            await db.commit()
+            live_counters.add(
+                attendee.event_id,
+                registered=1,
+                checked_in=int(db_attendee.check_in_status),
+            )
+            return db_attendee
 
-        existing_attendee = (
-            db.query(Attendee).filter(Attendee.email == attendee.email).first()
-        )
-        if existing_attendee:
+        except EventFull:
+            await db.rollback()
+            if not waitlist:
+                raise
+
+        except HTTPException:
+            await db.rollback()
+            raise
+
+        except IntegrityError:
+            await db.rollback()
             raise HTTPException(
                 status_code=400,
                 detail=f"Attendee with email '{attendee.email}' already exists.",
             )
 
-        event = db.query(Event).filter(Event.event_id == attendee.event_id).first()
-        if not event:
-            raise HTTPException(status_code=404, detail="Event not found")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error creating attendee: {e}")
+
+        return await queue_attendee(db, attendee)
+
+    return await idempotency.run(request, idempotency_key, create, AttendeeResponse)
 
-        current_attendees_count = (
-            db.query(Attendee).filter(Attendee.event_id == attendee.event_id).count()
-        )
-        if current_attendees_count >= event.max_attendees:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Cannot add attendee. The event has reached its maximum attendee limit of {event.max_attendees}.",
-            )
 
-        db_attendee = Attendee(
-            first_name=attendee.first_name,
-            last_name=attendee.last_name,
-            email=attendee.email,
-            phone_number=attendee.phone_number,
-            event_id=attendee.event_id,
-            check_in_status=attendee.check_in_status,
+async def queue_attendee(db: AsyncSession, attendee: AttendeeCreate) -> JSONResponse:
+    try:
+        entry = await join_waitlist(db, attendee)
+        # A seat may have been freed since the registration found none
+        promoted = await promote_waitlist(db, attendee.event_id)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Attendee with email '{attendee.email}' is already on the waitlist for this event.",
         )
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error joining waitlist: {e}")
 
-        db.add(db_attendee)
-        db.commit()
-        db.refresh(db_attendee)
-        return db_attendee
+    if promoted:
+        live_counters.add(attendee.event_id, registered=promoted)
+        promotion_signals.notify([attendee.event_id])
+    await db.refresh(entry)
+    return JSONResponse(
+        status_code=202, content=jsonable_encoder(await entry_response(db, entry))
+    )
 
-    except IntegrityError as e:
-        db.rollback()
+
+# API to register attendees in bulk from a CSV, NDJSON or JSON array upload
+@router.post("/import")
+async def import_attendees_file(
+    file: UploadFile = File(...), db: AsyncSession = Depends(get_db)
+):
+    """
+    Every row is validated like a single registration. Valid rows are inserted
+    in batches, one transaction per batch, and the response lists the reason
+    each rejected row was skipped.
+    """
+    extension = "." + file.filename.rsplit(".", 1)[-1].lower()
+    if extension not in IMPORT_FORMATS:
         raise HTTPException(
-            status_code=400, detail=f"Duplicate entry: {e.orig.args[1]}"
+            status_code=400,
+            detail="Invalid file type. Only CSV, NDJSON and JSON files are allowed.",
         )
 
+    try:
+        report = await import_attendees(
+            db,
+            rows_in_threadpool(iter_import_rows(file.file, IMPORT_FORMATS[extension])),
+        )
+        return {
+            "message": f"{report['imported']} attendees successfully imported.",
+            **report,
+        }
+
+    except InvalidImportFile as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating attendee: {e}")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error importing attendees: {e}")
 
 
 # API to update an attendee
 @router.put("/{attendee_id}", response_model=AttendeeResponse)
 async def update_attendee(
-    attendee_id: int, attendee: AttendeeUpdate, db: Session = Depends(get_db)
+    attendee_id: int, attendee: AttendeeUpdate, db: AsyncSession = Depends(get_db)
 ):
     try:
-        db_attendee = (
-            db.query(Attendee).filter(Attendee.attendee_id == attendee_id).first()
+        db_attendee = await db.scalar(
+            select(Attendee).where(Attendee.attendee_id == attendee_id)
         )
         if not db_attendee:
             raise HTTPException(status_code=404, detail="Attendee not found")
 
-        for key, value in attendee.dict(exclude_unset=True).items():
+        changes = attendee.dict(exclude_unset=True)
+        for key, value in changes.items():
             setattr(db_attendee, key, value)
+        if "check_in_status" in changes:
+            db_attendee.check_in_updated_at = datetime.now()
+            await db.flush()
+            await recount_checked_in(db, [db_attendee.event_id])
 
-        db.commit()
-        db.refresh(db_attendee)
+        await db.commit()
+        await db.refresh(db_attendee)
+        await cache.delete(attendee_key(attendee_id))
+        if "check_in_status" in changes:
+            await live_counters.refresh(db_attendee.event_id)
         return db_attendee
+    except HTTPException:
+        raise
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Attendee with email '{attendee.email}' already exists.",
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating attendee: {e}")
 
 
 # API to list all attendees or filter by event and check-in status
+# Pass `limit` (and the X-Next-Cursor value as `after`) to page through the
+# results, or `format=ndjson` to stream them. `format=fast` returns the same
+# JSON built from column tuples, for large pages.
 @router.get("/", response_model=List[AttendeeResponse])
 async def list_attendees(
+    response: Response,
     event_id: Optional[int] = None,
     check_in_status: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    response_format: str = Query("json", alias="format", regex=RESPONSE_FORMATS),
+    db: AsyncSession = Depends(get_read_db),
 ):
     try:
-        query = db.query(Attendee)
+        query = select(Attendee)
 
         if event_id:
-            query = query.filter(Attendee.event_id == event_id)
+            query = query.where(Attendee.event_id == event_id)
         if check_in_status is not None:
-            query = query.filter(Attendee.check_in_status == check_in_status)
+            query = query.where(Attendee.check_in_status == check_in_status)
 
-        attendees = query.all()
+        query = keyset_paginate(query, Attendee.attendee_id, after, limit)
+        if response_format == "ndjson":
+            return ndjson_response(db, query, AttendeeResponse)
+        if response_format == "fast":
+            return await fast_json_response(
+                db, query, Attendee, AttendeeResponse, "attendee_id", limit
+            )
+
+        attendees = (await db.scalars(query)).all()
+        set_next_cursor(response, attendees, "attendee_id", limit)
         return attendees
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching attendees: {e}")
 
 
-# API to fetch a specific attendee by ID
+# API to search an event's attendees by name or email, for door staff
+# Every word of `q` must match the start of a first name, last name or email
+# word, allowing a typo per 4 letters; the best `limit` matches come first.
+# Reads the primary, as the index follows the kiosk change feed.
+# Declared before /{attendee_id} so "search" is not taken for an attendee ID.
+@router.get("/search", response_model=List[AttendeeResponse])
+async def search_attendees(
+    event_id: int,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        if (
+            await db.scalar(select(Event.event_id).where(Event.event_id == event_id))
+            is None
+        ):
+            raise HTTPException(status_code=404, detail="Event not found")
+
+        attendee_ids = await attendee_search.search(db, event_id, q, limit)
+        found = {
+            attendee.attendee_id: attendee
+            for attendee in await db.scalars(
+                select(Attendee).where(Attendee.attendee_id.in_(attendee_ids))
+            )
+        }
+        return [
+            found[attendee_id] for attendee_id in attendee_ids if attendee_id in found
+        ]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching attendees: {e}")
+
+
+# API to fetch a specific attendee by ID (served from the cache when possible)
 @router.get("/{attendee_id}", response_model=AttendeeResponse)
-async def get_attendee(attendee_id: int, db: Session = Depends(get_db)):
+async def get_attendee(attendee_id: int, db: AsyncSession = Depends(get_db)):
     try:
-        db_attendee = (
-            db.query(Attendee).filter(Attendee.attendee_id == attendee_id).first()
+        cached = await cache.get(attendee_key(attendee_id))
+        if cached is not None:
+            return cached
+
+        db_attendee = await db.scalar(
+            select(Attendee).where(Attendee.attendee_id == attendee_id)
         )
         if not db_attendee:
             raise HTTPException(status_code=404, detail="Attendee not found")
-        return db_attendee
+
+        response = jsonable_encoder(AttendeeResponse.from_orm(db_attendee))
+        # Not cached if the attendee was changed (deleted from the cache)
+        # since it was read
+        await cache.add(attendee_key(attendee_id), response)
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching attendee: {e}")
 
@@ -1,42 +1,108 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, UploadFile, File
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import attendee_key, cache
 from app.database import get_db
+from app.idempotency import MAX_KEY_LENGTH, idempotency
+from app.live_counters import live_counters
+from app.instrumentation import TimedRoute
 from app.models import Attendee
-import csv
-from io import StringIO
+from app.stats import add_checked_in
+from app.uploads import rows_in_threadpool
+from app.write_behind import check_in_write_behind
+from app.bulk_check_in import (
+    CHECKED_IN,
+    MissingEmailColumn,
+    bulk_check_in_emails,
+    iter_csv_emails,
+)
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post("/check-in/{attendee_id}", tags=["Attendees"])
-async def check_in_attendee(attendee_id: int, db: Session = Depends(get_db)):
+async def check_in_attendee(
+    request: Request,
+    attendee_id: int,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=MAX_KEY_LENGTH),
+):
     """
-    Marks an attendee as checked in by their ID.
+    Marks an attendee as checked in by their ID. Retries sent with the same
+    Idempotency-Key header get the original response back. In write-behind
+    mode the check-in is acknowledged once journaled and written to the
+    attendees table with the next flush.
     """
-    try:
-        attendee = (
-            db.query(Attendee).filter(Attendee.attendee_id == attendee_id).first()
-        )
-        if not attendee:
-            raise HTTPException(status_code=404, detail="Attendee not found.")
-        if attendee.check_in_status:
-            return {"message": f"Attendee with ID {attendee_id} is already checked in."}
 
-        # Mark as checked in
-        attendee.check_in_status = True
-        db.commit()
-        db.refresh(attendee)
+    async def check_in():
+        try:
+            attendee = (
+                await db.execute(
+                    select(Attendee.event_id, Attendee.check_in_status).where(
+                        Attendee.attendee_id == attendee_id
+                    )
+                )
+            ).first()
+            if not attendee:
+                raise HTTPException(status_code=404, detail="Attendee not found.")
+            already_checked_in = {
+                "message": f"Attendee with ID {attendee_id} is already checked in."
+            }
+            if attendee.check_in_status:
+                return already_checked_in
 
-        return {"message": f"Attendee with ID {attendee_id} has been checked in."}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error checking in attendee: {e}")
+            if check_in_write_behind.enabled:
+                await db.rollback()
+                if not await check_in_write_behind.check_in(
+                    attendee_id, attendee.event_id
+                ):
+                    return already_checked_in
+                live_counters.add(attendee.event_id, checked_in=1)
+                return {
+                    "message": f"Attendee with ID {attendee_id} has been checked in."
+                }
+
+            # Mark as checked in; the guard turns a concurrent duplicate into a no-op
+            result = await db.execute(
+                update(Attendee)
+                .where(
+                    Attendee.attendee_id == attendee_id,
+                    Attendee.check_in_status.is_not(True),
+                )
+                .values(check_in_status=True, check_in_updated_at=datetime.now())
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                await db.rollback()
+                return already_checked_in
+            await add_checked_in(db, attendee.event_id)
+            await db.commit()
+            await cache.delete(attendee_key(attendee_id))
+            live_counters.add(attendee.event_id, checked_in=1)
+
+            return {"message": f"Attendee with ID {attendee_id} has been checked in."}
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error checking in attendee: {e}"
+            )
+
+    return await idempotency.run(request, idempotency_key, check_in)
 
 
 @router.post("/bulk-check-in", tags=["Attendees"])
-async def bulk_check_in(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def bulk_check_in(
+    file: UploadFile = File(...), db: AsyncSession = Depends(get_db)
+):
     """
     Handles bulk attendee check-ins via a CSV upload.
     The CSV must have a header row with 'email' as a column.
+    Emails are deduplicated and resolved in batches, and the response reports
+    the outcome of every row: checked_in, already_checked_in or unknown_email.
     """
     if not file.filename.endswith(".csv"):
         raise HTTPException(
@@ -44,35 +110,21 @@ async def bulk_check_in(file: UploadFile = File(...), db: Session = Depends(get_
         )
 
     try:
-        # Read and decode the uploaded file
-        content = await file.read()
-        csv_data = StringIO(content.decode("utf-8"))
-        csv_reader = csv.DictReader(csv_data)
-
-        # Ensure 'email' column exists
-        if "email" not in csv_reader.fieldnames:
-            raise HTTPException(
-                status_code=400, detail="CSV must contain an 'email' column."
-            )
-
-        # Process each row in the CSV
-        check_in_count = 0
-        for row in csv_reader:
-            email = row.get("email")
-            if not email:
-                continue
-
-            # Fetch the attendee by email
-            attendee = db.query(Attendee).filter(Attendee.email == email).first()
-            if attendee and not attendee.check_in_status:
-                # Mark attendee as checked in
-                attendee.check_in_status = True
-                check_in_count += 1
-
-        # Commit the changes to the database
-        db.commit()
+        summary, checked_in = await bulk_check_in_emails(
+            db, rows_in_threadpool(iter_csv_emails(file.file))
+        )
+        await db.commit()
+        await cache.delete(*map(attendee_key, checked_in))
+        for event_id, count in Counter(checked_in.values()).items():
+            live_counters.add(event_id, checked_in=count)
 
-        return {"message": f"{check_in_count} attendees successfully checked in."}
+        return {
+            "message": f"{summary[CHECKED_IN]} attendees successfully checked in.",
+            **summary,
+        }
 
+    except MissingEmailColumn as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error processing file: {e}")
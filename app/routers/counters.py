@@ -0,0 +1,85 @@
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.instrumentation import TimedRoute
+from app.live_counters import live_counters
+
+router = APIRouter(route_class=TimedRoute)
+
+
+# Current registered / checked-in / remaining counters of an event
+@router.get("/{event_id}/counters")
+async def get_counters(event_id: int):
+    try:
+        counters = await live_counters.current(event_id)
+        if counters is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return counters
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching counters: {e}")
+
+
+# Live counters as Server-Sent Events: one `counters` event per change
+@router.get("/{event_id}/counters/stream")
+async def stream_counters(event_id: int):
+    queue = await live_counters.subscribe(event_id)
+    if queue is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    async def events():
+        try:
+            while True:
+                counters = await live_counters.wait(event_id, queue)
+                if counters is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: counters\ndata: {json.dumps(counters)}\n\n"
+        finally:
+            live_counters.unsubscribe(event_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Live counters over a WebSocket: one JSON message per change, and the current
+# counters again every heartbeat so dropped connections are noticed
+@router.websocket("/{event_id}/counters/ws")
+async def counters_websocket(websocket: WebSocket, event_id: int):
+    queue = await live_counters.subscribe(event_id)
+    if queue is None:
+        await websocket.close(code=4404, reason="Event not found")
+        return
+
+    await websocket.accept()
+
+    async def send_changes():
+        while True:
+            counters = await live_counters.wait(event_id, queue)
+            if counters is None:
+                counters = await live_counters.current(event_id)
+            await websocket.send_json(counters)
+
+    async def until_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    # Clients only listen; their disconnect ends the subscription
+    tasks = [
+        asyncio.ensure_future(send_changes()),
+        asyncio.ensure_future(until_disconnect()),
+    ]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if not isinstance(task.exception(), WebSocketDisconnect):
+                task.result()
+    finally:
+        live_counters.unsubscribe(event_id, queue)
@@ -1,126 +1,327 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
-from app.database import SessionLocal
-from app.models import Event, EventStatus
-from app.schemas import EventCreate, EventUpdate, EventResponse
+from app.attendee_export import (
+    EXPORT_FORMATS,
+    ExportFormatUnavailable,
+    export_response,
+)
+from app.cache import cache, event_key
+from app.database import get_db, get_read_db
+from app.instrumentation import TimedRoute
+from app.live_counters import live_counters
+from app.models import Event, EventStatus, derive_event_status
+from app.schemas import (
+    EventBatchCreate,
+    EventBatchUpdate,
+    EventCreate,
+    EventResponse,
+    EventShift,
+    EventUpdate,
+)
+from app.event_batch import (
+    build_event,
+    create_events,
+    event_error,
+    shift_events,
+    update_error,
+    update_events,
+)
+from app.stats import STATS_SOURCES, event_stats, stats_by_status
+from app.waitlist import promote_waitlist, promotion_signals
+from app.pagination import (
+    MAX_PAGE_SIZE,
+    RESPONSE_FORMATS,
+    fast_json_response,
+    keyset_paginate,
+    ndjson_response,
+    set_next_cursor,
+)
 from datetime import datetime
-from app.update_event_status import update_event_status_if_needed
+from app.filters import (
+    LOCATION_MATCH_MODES,
+    Day,
+    location_filter,
+    start_time_between,
+)
 
-router = APIRouter()
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error while interacting with the database: {e}"
-        )
-    finally:
-        db.close()
+router = APIRouter(route_class=TimedRoute)
 
 
 # Create a new event
 @router.post("/", response_model=EventResponse)
-async def create_event(event: EventCreate, db: Session = Depends(get_db)):
+async def create_event(event: EventCreate, db: AsyncSession = Depends(get_db)):
     try:
-        if event.start_time >= event.end_time:
-            raise HTTPException(
-                status_code=400, detail="Start time must be before end time"
-            )
+        error = event_error(event.start_time, event.end_time, event.max_attendees)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
 
-        if event.max_attendees <= 0:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Maximum attendees can't be {event.max_attendees}",
-            )
-
-        if isinstance(event.status, str):
-            status_enum = (
-                EventStatus[event.status.upper()]
-                if event.status
-                else EventStatus.SCHEDULED
-            )
-        else:
-            status_enum = event.status or EventStatus.SCHEDULED
-
-        db_event = Event(
-            name=event.name,
-            description=event.description,
-            start_time=event.start_time,
-            end_time=event.end_time,
-            location=event.location,
-            max_attendees=event.max_attendees,
-            status=status_enum,
-        )
+        db_event = build_event(event)
 
         db.add(db_event)
-        db.commit()
-        db.refresh(db_event)
+        await db.commit()
+        await db.refresh(db_event)
+        await cache.delete(event_key(db_event.event_id))
         return db_event
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating event: {e}")
 
 
-# Update an existing event
+# Create many events in one transaction, e.g. a festival's schedule. Each
+# event is validated like a single create; the response has the new event_id
+# or the error of every item, in request order.
+@router.post("/batch")
+async def create_events_batch(
+    batch: EventBatchCreate, db: AsyncSession = Depends(get_db)
+):
+    try:
+        report = await create_events(db, batch.events)
+        await db.commit()
+        return report
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error creating events: {e}")
+
+
+# Update many events in one transaction. Each item is an event_id with the
+# fields to change, validated like a single update; events given the same
+# changes are updated by one statement.
+@router.patch("/batch")
+async def update_events_batch(
+    batch: EventBatchUpdate, db: AsyncSession = Depends(get_db)
+):
+    try:
+        report, resized, promoted = await update_events(db, batch.events)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error updating events: {e}")
+
+    updated = [
+        result["event_id"] for result in report["results"] if not result["error"]
+    ]
+    await cache.delete(*map(event_key, updated))
+    for event_id in resized:
+        await live_counters.refresh(event_id)
+    promotion_signals.notify(list(promoted))
+    return report
+
+
+# Move the start and end of many events by the same number of minutes (e.g.
+# after a delay) with a single UPDATE
+@router.post("/batch/shift")
+async def shift_events_batch(shift: EventShift, db: AsyncSession = Depends(get_db)):
+    try:
+        report = await shift_events(db, shift.event_ids, shift.minutes)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error shifting events: {e}")
+
+    await cache.delete(*map(event_key, set(shift.event_ids)))
+    return report
+
+
+# Update an existing event. The changes are validated against the event's
+# current times, as each item of a batch update is.
 @router.put("/{event_id}", response_model=EventResponse)
 async def update_event(
-    event_id: int, updated_event: EventUpdate, db: Session = Depends(get_db)
+    event_id: int, updated_event: EventUpdate, db: AsyncSession = Depends(get_db)
 ):
-    event = db.query(Event).filter(Event.event_id == event_id).first()
+    event = await db.scalar(
+        select(Event).where(Event.event_id == event_id).with_for_update()
+    )
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    for key, value in updated_event.dict(exclude_unset=True).items():
+    values = updated_event.dict(exclude_unset=True)
+    error = update_error(values, event.start_time, event.end_time)
+    if error:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=error)
+
+    for key, value in values.items():
         setattr(event, key, value)
 
-    db.commit()
-    db.refresh(event)
+    # More seats go to the waitlist first, in the same transaction
+    promoted = 0
+    if updated_event.max_attendees is not None:
+        await db.flush()
+        promoted = await promote_waitlist(db, event_id)
+
+    await db.commit()
+    await db.refresh(event)
+    await cache.delete(event_key(event_id))
+    if updated_event.max_attendees is not None:
+        await live_counters.refresh(event_id)
+    if promoted:
+        promotion_signals.notify([event_id])
     return event
 
 
 # Get a list of events (with optional filters)
+# `date` selects the events starting on that day, `from`/`to` an inclusive range
+# of days. `location_match=prefix|fulltext` searches the location through an
+# index instead of a substring scan.
+# Pass `limit` (and the X-Next-Cursor value as `after`) to page through the
+# results, or `format=ndjson` to stream them. `format=fast` returns the same
+# JSON built from column tuples, for large pages.
 @router.get("/", response_model=List[EventResponse])
 async def list_events(
+    response: Response,
     status: Optional[str] = None,
     location: Optional[str] = None,
-    date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    location_match: str = Query("contains", regex=LOCATION_MATCH_MODES),
+    date: Optional[Day] = None,
+    from_day: Optional[Day] = Query(None, alias="from"),
+    to_day: Optional[Day] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    response_format: str = Query("json", alias="format", regex=RESPONSE_FORMATS),
+    db: AsyncSession = Depends(get_read_db),
 ):
     try:
-        query = db.query(Event)
+        query = select(Event)
 
         if status:
             if status.upper() not in EventStatus.__members__:
                 raise HTTPException(status_code=400, detail="Invalid status value")
-            query = query.filter(Event.status == EventStatus[status.upper()])
+            query = query.where(Event.status_is(EventStatus[status.upper()]))
         if location:
-            query = query.filter(Event.location.ilike(f"%{location}%"))
+            query = query.where(
+                location_filter(
+                    Event.location, location, location_match, db.bind.dialect.name
+                )
+            )
         if date:
-            query = query.filter(Event.start_time.date() == date.date())
+            query = query.where(start_time_between(Event.start_time, date, date))
+        if from_day or to_day:
+            query = query.where(start_time_between(Event.start_time, from_day, to_day))
 
-        events = query.all()
+        query = keyset_paginate(query, Event.event_id, after, limit)
+        if response_format == "ndjson":
+            return ndjson_response(db, query, EventResponse)
+        if response_format == "fast":
+            return await fast_json_response(
+                db, query, Event, EventResponse, "event_id", limit
+            )
+
+        events = (await db.scalars(query)).all()
+        set_next_cursor(response, events, "event_id", limit)
         return events
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching events: {e}")
 
 
-# Get details of a single event by its ID
-@router.get("/{event_id}", response_model=EventResponse)
-async def get_event(event_id: int, db: Session = Depends(get_db)):
+# Registrations, check-ins and fill/check-in rates per current status, with the
+# totals across all matching events. `status` and `from`/`to` (days of
+# start_time) narrow the events; `source=live` recounts from the attendees
+# instead of reading the per-event counters.
+# Declared before /{event_id} so "stats" is not taken for an event ID.
+@router.get("/stats")
+async def get_events_stats(
+    status: Optional[str] = None,
+    from_day: Optional[Day] = Query(None, alias="from"),
+    to_day: Optional[Day] = Query(None, alias="to"),
+    source: str = Query("summary", regex=STATS_SOURCES),
+    db: AsyncSession = Depends(get_read_db),
+):
     try:
-        event = db.query(Event).filter(Event.event_id == event_id).first()
-        if not event:
+        filters = [start_time_between(Event.start_time, from_day, to_day)]
+        if status:
+            if status.upper() not in EventStatus.__members__:
+                raise HTTPException(status_code=400, detail="Invalid status value")
+            filters.append(Event.status_is(EventStatus[status.upper()]))
+        return await stats_by_status(db, source, *filters)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching stats: {e}")
+
+
+# Registrations, check-ins and fill/check-in rates of a single event
+@router.get("/{event_id}/stats")
+async def get_event_stats(
+    event_id: int,
+    source: str = Query("summary", regex=STATS_SOURCES),
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        stats = await event_stats(db, event_id, source)
+        if stats is None:
             raise HTTPException(status_code=404, detail="Event not found")
+        return stats
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching stats: {e}")
 
-        update_event_status_if_needed(db, event)
 
-        db.commit()
-        db.refresh(event)
+# Download an event's attendee manifest as CSV, NDJSON or Parquet (the latter
+# needs pyarrow). Rows are streamed from the database in batches, so the
+# export runs in constant memory however large the event. `gzip=true`
+# compresses CSV and NDJSON into a .gz file, and Parquet columns with gzip.
+@router.get("/{event_id}/attendees/export")
+async def export_attendees(
+    event_id: int,
+    export_format: str = Query("csv", alias="format", regex=EXPORT_FORMATS),
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        if (
+            await db.scalar(select(Event.event_id).where(Event.event_id == event_id))
+            is None
+        ):
+            raise HTTPException(status_code=404, detail="Event not found")
+        return export_response(db, event_id, export_format, gzip)
+    except HTTPException:
+        raise
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting attendees: {e}")
+
+
+def _with_current_status(cached: dict) -> dict:
+    # The status of a cached event may have moved on since it was cached
+    status = derive_event_status(
+        EventStatus(cached["stored_status"]),
+        datetime.fromisoformat(cached["start_time"]),
+        datetime.fromisoformat(cached["end_time"]),
+    )
+    return {**cached, "status": status}
+
 
-        return event
+# Get details of a single event by its ID (served from the cache when possible)
+# Reads never write: the status is derived from the event times.
+@router.get("/{event_id}", response_model=EventResponse)
+async def get_event(event_id: int, db: AsyncSession = Depends(get_db)):
+    try:
+        cached = await cache.get(event_key(event_id))
+        if cached is not None:
+            return _with_current_status(cached)
+
+        event = await db.scalar(select(Event).where(Event.event_id == event_id))
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+
+        response = jsonable_encoder(EventResponse.from_orm(event))
+        # Not cached if the event was changed (deleted from the cache) since
+        # it was read
+        await cache.add(
+            event_key(event_id),
+            {**response, "stored_status": event.stored_status.value},
+        )
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching event: {e}")
 
@@ -0,0 +1,107 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.cache import attendee_key, cache
+from app.database import get_db
+from app.instrumentation import TimedRoute
+from app.live_counters import live_counters
+from app.kiosk_sync import (
+    MAX_FEED_PAGE_SIZE,
+    InvalidCursor,
+    KioskNotConfigured,
+    apply_check_ins,
+    changes_since,
+    latest_cursor,
+    snapshot_response,
+)
+from app.models import Event
+from app.schemas import KioskPush
+
+router = APIRouter(route_class=TimedRoute)
+
+
+async def ensure_event(db: AsyncSession, event_id: int):
+    found = await db.scalar(select(Event.event_id).where(Event.event_id == event_id))
+    if found is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+
+# Snapshot of an event's attendees for a kiosk to work offline from. The
+# snapshot and the change feed read the primary: a replica lagging more than
+# KIOSK_FEED_SETTLE_SECONDS would show a late commit after the cursor passed it.
+@router.get("/events/{event_id}/snapshot")
+async def kiosk_snapshot(event_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Returns every attendee of the event as [attendee_id, email_hash,
+    checked_in], plus the cursor to follow the change feed from.
+    """
+    try:
+        await ensure_event(db, event_id)
+        return snapshot_response(db, event_id, await latest_cursor(db, event_id))
+    except KioskNotConfigured as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building snapshot: {e}")
+
+
+# Attendees of an event that changed since a snapshot or an earlier page
+@router.get("/events/{event_id}/changes")
+async def kiosk_changes(
+    event_id: int,
+    since: Optional[str] = None,
+    limit: int = Query(MAX_FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Pass the `cursor` of the snapshot, or of the previous page, as `since`.
+    Keep fetching while `has_more` is true.
+    """
+    try:
+        await ensure_event(db, event_id)
+        return await changes_since(db, event_id, since, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KioskNotConfigured as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching changes: {e}")
+
+
+# Check-ins recorded by a kiosk while offline
+@router.post("/events/{event_id}/check-ins")
+async def kiosk_push(
+    event_id: int, push: KioskPush, db: AsyncSession = Depends(get_db)
+):
+    """
+    Applies the batch in one transaction. Every scan carries an idempotency
+    key, so a push can be retried safely; conflicting scans of an attendee
+    are resolved by scan time, latest first. Each result reports the outcome
+    (applied, stale, duplicate or unknown_attendee) and the attendee's
+    check-in status on the server.
+    """
+    try:
+        await ensure_event(db, event_id)
+        try:
+            results, changed = await apply_check_ins(db, event_id, push.check_ins)
+            await db.commit()
+        except IntegrityError:
+            # Another push recorded one of the keys first; now it is a duplicate
+            await db.rollback()
+            results, changed = await apply_check_ins(db, event_id, push.check_ins)
+            await db.commit()
+
+        await cache.delete(*map(attendee_key, changed))
+        if changed:
+            await live_counters.refresh(event_id)
+        return {"changed": len(changed), "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error applying check-ins: {e}")
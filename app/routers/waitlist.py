@@ -0,0 +1,73 @@
+import time
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app.instrumentation import TimedRoute
+from app.live_counters import live_counters
+from app.models import WaitlistEntry, WaitlistStatus
+from app.schemas import WaitlistEntryResponse
+from app.waitlist import (
+    RECHECK_INTERVAL,
+    entry_response,
+    promote_waitlist,
+    promotion_signals,
+)
+
+router = APIRouter(route_class=TimedRoute)
+
+# Longest a client can wait on its entry in one request
+MAX_WAIT_SECONDS = 60
+
+
+# Status and queue position of a waitlist entry.
+# With `wait`, the request is held (up to that many seconds) until the entry
+# is promoted or skipped, so clients wait on the queue instead of polling.
+@router.get("/{entry_id}", response_model=WaitlistEntryResponse)
+async def get_waitlist_entry(
+    entry_id: int,
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        deadline = time.monotonic() + wait
+        while True:
+            entry = await db.scalar(
+                select(WaitlistEntry)
+                .where(WaitlistEntry.entry_id == entry_id)
+                .execution_options(populate_existing=True)
+            )
+            if not entry:
+                raise HTTPException(status_code=404, detail="Waitlist entry not found")
+            remaining = deadline - time.monotonic()
+            if entry.status != WaitlistStatus.WAITING or remaining <= 0:
+                return await entry_response(db, entry)
+            # Give the connection back to the pool while waiting
+            event_id = entry.event_id
+            await db.rollback()
+            await promotion_signals.wait(event_id, min(remaining, RECHECK_INTERVAL))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error fetching waitlist entry: {e}"
+        )
+
+
+# Registers as many waitlisted people as the event has free seats, in order.
+# Raising max_attendees does this automatically; this covers capacity freed
+# outside the API.
+@router.post("/events/{event_id}/promote")
+async def promote_event_waitlist(event_id: int, db: AsyncSession = Depends(get_db)):
+    try:
+        promoted = await promote_waitlist(db, event_id)
+        await db.commit()
+        if promoted:
+            live_counters.add(event_id, registered=promoted)
+            promotion_signals.notify([event_id])
+        return {"promoted": promoted}
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error promoting waitlist: {e}")
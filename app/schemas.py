@@ -1,7 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist, constr, validator
 from typing import Optional
 from datetime import datetime
-from app.models import EventStatus
+from app.models import EventStatus, WaitlistStatus
 
 
 class AttendeeCreate(BaseModel):
@@ -31,7 +31,22 @@ class AttendeeResponse(BaseModel):
     check_in_status: bool
 
     class Config:
-        from_attributes = True
+        orm_mode = True
+
+
+class WaitlistEntryResponse(BaseModel):
+    entry_id: int
+    event_id: int
+    email: str
+    status: WaitlistStatus
+    # Place in the queue (1 is next) while WAITING
+    position: Optional[int]
+    # Set once PROMOTED
+    attendee_id: Optional[int]
+    joined_at: datetime
+
+    class Config:
+        orm_mode = True
 
 
 class EventCreate(BaseModel):
@@ -53,6 +68,28 @@ class EventUpdate(BaseModel):
     max_attendees: Optional[int] = None
 
 
+class EventBatchUpdateItem(EventUpdate):
+    event_id: int
+
+
+# Items per batch request; a festival schedule fits in one
+MAX_EVENT_BATCH = 5000
+
+
+class EventBatchCreate(BaseModel):
+    events: conlist(EventCreate, min_items=1, max_items=MAX_EVENT_BATCH)
+
+
+class EventBatchUpdate(BaseModel):
+    events: conlist(EventBatchUpdateItem, min_items=1, max_items=MAX_EVENT_BATCH)
+
+
+class EventShift(BaseModel):
+    event_ids: conlist(int, min_items=1, max_items=MAX_EVENT_BATCH)
+    # Moves start_time and end_time together; negative to bring events forward
+    minutes: int
+
+
 class EventResponse(BaseModel):
     event_id: int
     name: str
@@ -61,7 +98,27 @@ class EventResponse(BaseModel):
     end_time: datetime
     location: str
     max_attendees: int
-    status: str
+    status: EventStatus
 
     class Config:
-        from_attributes = True
+        orm_mode = True
+
+
+class KioskScan(BaseModel):
+    # Generated by the kiosk per scan, so a retried push is applied once
+    key: constr(min_length=1, max_length=64)
+    attendee_id: int
+    checked_in: bool = True
+    # When the kiosk scanned the attendee; the latest scan wins
+    at: datetime
+
+    @validator("at")
+    def to_server_time(cls, value: datetime) -> datetime:
+        # Stored times are naive server-local times
+        if value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        return value
+
+
+class KioskPush(BaseModel):
+    check_ins: conlist(KioskScan, min_items=1, max_items=1000)
@@ -0,0 +1,133 @@
+from typing import List, Optional
+
+from sqlalchemy import Select, case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Attendee, Event, EventStatus
+
+# summary: the counters kept on each event row (one row read per event)
+# live:    recounted from the attendees table, for audits
+STATS_SOURCES = "^(summary|live)$"
+
+
+async def add_checked_in(db: AsyncSession, event_id: int, count: int = 1):
+    """Moves the event's checked_in_count in the caller's transaction."""
+    await db.execute(
+        update(Event)
+        .where(Event.event_id == event_id)
+        .values(checked_in_count=Event.checked_in_count + count)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def recount_checked_in(db: AsyncSession, event_ids):
+    """
+    Recomputes checked_in_count of the given events from their attendees in
+    one UPDATE, for batch paths that do not know their exact per-event delta.
+    Each count is an index range scan on (event_id, check_in_status).
+    """
+    if not event_ids:
+        return
+    checked_in = (
+        select(func.count())
+        .where(Attendee.event_id == Event.event_id, Attendee.check_in_status.is_(True))
+        .correlate(Event)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(Event)
+        .where(Event.event_id.in_(event_ids))
+        .values(checked_in_count=checked_in)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def per_event_stats(source: str, *filters) -> Select:
+    """One row per matching event: status, capacity, registered, checked_in."""
+    if source == "summary":
+        return select(
+            Event.event_id,
+            Event.status.label("status"),
+            Event.max_attendees.label("capacity"),
+            Event.registered_count.label("registered"),
+            Event.checked_in_count.label("checked_in"),
+        ).where(*filters)
+
+    attendees = (
+        select(
+            Attendee.event_id,
+            func.count().label("registered"),
+            func.sum(case((Attendee.check_in_status.is_(True), 1), else_=0)).label(
+                "checked_in"
+            ),
+        )
+        .group_by(Attendee.event_id)
+        .subquery()
+    )
+    return (
+        select(
+            Event.event_id,
+            Event.status.label("status"),
+            Event.max_attendees.label("capacity"),
+            func.coalesce(attendees.c.registered, 0).label("registered"),
+            func.coalesce(attendees.c.checked_in, 0).label("checked_in"),
+        )
+        .outerjoin(attendees, attendees.c.event_id == Event.event_id)
+        .where(*filters)
+    )
+
+
+def with_rates(stats: dict) -> dict:
+    registered = stats["registered"]
+    return {
+        **stats,
+        "remaining": max(stats["capacity"] - registered, 0),
+        "fill_rate": (
+            round(registered / stats["capacity"], 4) if stats["capacity"] else 0
+        ),
+        "check_in_rate": (
+            round(stats["checked_in"] / registered, 4) if registered else 0
+        ),
+    }
+
+
+async def stats_by_status(db: AsyncSession, source: str, *filters) -> dict:
+    """
+    Events, capacity, registrations and check-ins per current status, plus
+    the overall totals, in one GROUP BY query over the matching events.
+    """
+    events = per_event_stats(source, *filters).subquery()
+    rows = await db.execute(
+        select(
+            events.c.status,
+            func.count().label("events"),
+            func.sum(events.c.capacity).label("capacity"),
+            func.sum(events.c.registered).label("registered"),
+            func.sum(events.c.checked_in).label("checked_in"),
+        ).group_by(events.c.status)
+    )
+
+    by_status: List[dict] = []
+    totals = {"events": 0, "capacity": 0, "registered": 0, "checked_in": 0}
+    for status, *values in rows:
+        counts = dict(zip(totals, map(int, values)))
+        for key, value in counts.items():
+            totals[key] += value
+        by_status.append(with_rates({"status": EventStatus(status), **counts}))
+    by_status.sort(key=lambda stats: list(EventStatus).index(stats["status"]))
+    return {"totals": with_rates(totals), "by_status": by_status}
+
+
+async def event_stats(db: AsyncSession, event_id: int, source: str) -> Optional[dict]:
+    row = (
+        await db.execute(per_event_stats(source, Event.event_id == event_id))
+    ).first()
+    if row is None:
+        return None
+    return with_rates(
+        {
+            **row._mapping,
+            "registered": int(row.registered),
+            "checked_in": int(row.checked_in),
+        }
+    )
@@ -0,0 +1,25 @@
+from itertools import islice
+from typing import AsyncIterator, Iterator, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+# Rows parsed per trip to the threadpool
+PARSE_BATCH_SIZE = 1000
+
+Row = TypeVar("Row")
+
+
+async def rows_in_threadpool(
+    rows: Iterator[Row], batch_size: int = PARSE_BATCH_SIZE
+) -> AsyncIterator[Row]:
+    """
+    Yields the rows of a blocking parser over an uploaded file, reading and
+    parsing them `batch_size` at a time in the threadpool, so the event loop
+    is never blocked by the upload's I/O or parsing.
+    """
+    while True:
+        batch = await run_in_threadpool(list, islice(rows, batch_size))
+        if not batch:
+            return
+        for row in batch:
+            yield row
@@ -0,0 +1,202 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Attendee, Event, WaitlistEntry, WaitlistStatus
+from app.registration import reserve_seats
+from app.schemas import AttendeeCreate, WaitlistEntryResponse
+
+# Entries promoted per INSERT when a lot of capacity frees up at once
+PROMOTION_BATCH_SIZE = 500
+
+# Waiters re-read their entry at least this often (seconds), to notice
+# promotions made by other workers
+RECHECK_INTERVAL = 5.0
+
+
+async def join_waitlist(db: AsyncSession, attendee: AttendeeCreate) -> WaitlistEntry:
+    """
+    Queues an attendee for a full event within the caller's transaction.
+    The ticket is taken from the event row, whose lock is held until the
+    caller commits, so tickets are issued in order without gaps. The caller
+    rolls back on IntegrityError (the email is already on the waitlist).
+    """
+    await db.execute(
+        update(Event)
+        .where(Event.event_id == attendee.event_id)
+        .values(waitlist_tickets=Event.waitlist_tickets + 1)
+        .execution_options(synchronize_session=False)
+    )
+    ticket = await db.scalar(
+        select(Event.waitlist_tickets).where(Event.event_id == attendee.event_id)
+    )
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    entry = WaitlistEntry(
+        event_id=attendee.event_id,
+        ticket=ticket,
+        first_name=attendee.first_name,
+        last_name=attendee.last_name,
+        email=attendee.email,
+        phone_number=attendee.phone_number,
+        status=WaitlistStatus.WAITING,
+    )
+    db.add(entry)
+    await db.flush()
+    return entry
+
+
+async def waitlist_position(db: AsyncSession, entry: WaitlistEntry) -> Optional[int]:
+    """
+    1-based place of a waiting entry in its event's queue, or None once it
+    has left the queue. Waiting tickets are contiguous, so this is the
+    distance to the head of the queue: one index seek, whatever the length.
+    """
+    if entry.status != WaitlistStatus.WAITING:
+        return None
+    head = await db.scalar(
+        select(func.min(WaitlistEntry.ticket)).where(
+            WaitlistEntry.event_id == entry.event_id,
+            WaitlistEntry.status == WaitlistStatus.WAITING,
+        )
+    )
+    return entry.ticket - head + 1
+
+
+async def promote_waitlist(db: AsyncSession, event_id: int) -> int:
+    """
+    Fills the event's free seats from the front of its waitlist, within the
+    caller's transaction, and returns the number of attendees registered.
+    Each round locks the event row, takes as many entries as there are free
+    seats and registers them with one multi-row INSERT. Entries whose email
+    was registered in the meantime are skipped and their seat offered to the
+    next in line. Entries always leave the queue in ticket order.
+    """
+    promoted = 0
+    while True:
+        event = (
+            await db.execute(
+                select(Event.max_attendees, Event.registered_count)
+                .where(Event.event_id == event_id)
+                .with_for_update()
+            )
+        ).first()
+        if event is None:
+            return promoted
+        free = event.max_attendees - event.registered_count
+        if free <= 0:
+            return promoted
+
+        entries = (
+            await db.execute(
+                select(
+                    WaitlistEntry.entry_id,
+                    WaitlistEntry.first_name,
+                    WaitlistEntry.last_name,
+                    WaitlistEntry.email,
+                    WaitlistEntry.phone_number,
+                )
+                .where(
+                    WaitlistEntry.event_id == event_id,
+                    WaitlistEntry.status == WaitlistStatus.WAITING,
+                )
+                .order_by(WaitlistEntry.ticket)
+                .limit(min(free, PROMOTION_BATCH_SIZE))
+            )
+        ).all()
+        if not entries:
+            return promoted
+
+        taken = set(
+            await db.scalars(
+                select(Attendee.email).where(
+                    Attendee.email.in_([entry.email for entry in entries])
+                )
+            )
+        )
+        accepted = [entry for entry in entries if entry.email not in taken]
+        skipped = [entry.entry_id for entry in entries if entry.email in taken]
+
+        if accepted:
+            await reserve_seats(db, event_id, len(accepted))
+            await db.execute(
+                insert(Attendee),
+                [
+                    {
+                        "first_name": entry.first_name,
+                        "last_name": entry.last_name,
+                        "email": entry.email,
+                        "phone_number": entry.phone_number,
+                        "event_id": event_id,
+                        "check_in_status": False,
+                    }
+                    for entry in accepted
+                ],
+            )
+            attendee_ids: Dict[str, int] = dict(
+                (
+                    await db.execute(
+                        select(Attendee.email, Attendee.attendee_id).where(
+                            Attendee.email.in_([entry.email for entry in accepted])
+                        )
+                    )
+                ).all()
+            )
+            entries_table = WaitlistEntry.__table__
+            await db.execute(
+                update(entries_table)
+                .where(entries_table.c.entry_id == bindparam("promoted_entry_id"))
+                .values(
+                    status=WaitlistStatus.PROMOTED,
+                    attendee_id=bindparam("promoted_attendee_id"),
+                ),
+                [
+                    {
+                        "promoted_entry_id": entry.entry_id,
+                        "promoted_attendee_id": attendee_ids[entry.email],
+                    }
+                    for entry in accepted
+                ],
+            )
+            promoted += len(accepted)
+        if skipped:
+            await db.execute(
+                update(WaitlistEntry)
+                .where(WaitlistEntry.entry_id.in_(skipped))
+                .values(status=WaitlistStatus.SKIPPED)
+                .execution_options(synchronize_session=False)
+            )
+
+
+async def entry_response(db: AsyncSession, entry: WaitlistEntry) -> dict:
+    return {
+        **WaitlistEntryResponse.from_orm(entry).dict(),
+        "position": await waitlist_position(db, entry),
+    }
+
+
+class PromotionSignals:
+    """Wakes the requests waiting on an event's waitlist after a promotion."""
+
+    def __init__(self):
+        self._events: Dict[int, asyncio.Event] = {}
+
+    async def wait(self, event_id: int, timeout: float):
+        signal = self._events.setdefault(event_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(signal.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def notify(self, event_ids: List[int]):
+        for event_id in event_ids:
+            signal = self._events.pop(event_id, None)
+            if signal is not None:
+                signal.set()
+
+
+promotion_signals = PromotionSignals()
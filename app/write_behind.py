@@ -0,0 +1,295 @@
+import asyncio
+import glob
+import itertools
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals of live processes cannot be told apart
+    fcntl = None
+
+from sqlalchemy import bindparam, update
+
+from app.cache import attendee_key, cache
+from app.database import AsyncSessionLocal
+from app.models import Attendee
+from app.stats import recount_checked_in
+
+logger = logging.getLogger(__name__)
+
+# Acknowledge single check-ins from a local journal and write them to the
+# attendees table in grouped transactions (see CheckInWriteBehind)
+WRITE_BEHIND_ENABLED = os.getenv("CHECK_IN_WRITE_BEHIND", "false").lower() == "true"
+# Pending check-ins are flushed at least this often (milliseconds)...
+FLUSH_INTERVAL_MS = float(os.getenv("CHECK_IN_FLUSH_INTERVAL_MS", "50"))
+# ...or as soon as this many are pending; also the size of each transaction
+FLUSH_BATCH_SIZE = int(os.getenv("CHECK_IN_FLUSH_BATCH_SIZE", "500"))
+# One journal file per process; journals left by crashed processes are
+# replayed by the next process to start
+JOURNAL_DIR = os.getenv("CHECK_IN_JOURNAL_DIR", "./check_in_journal")
+
+JOURNAL_SUFFIX = ".journal"
+
+# attendee_id -> (event_id, checked in at)
+PendingCheckIns = Dict[int, Tuple[int, datetime]]
+
+
+def _try_lock(journal) -> bool:
+    """Claims a journal file for this process; False if a live process has it."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _journal_line(attendee_id: int, event_id: int, at: datetime) -> str:
+    return f"{attendee_id} {event_id} {at.isoformat()}\n"
+
+
+def _read_journal(journal) -> PendingCheckIns:
+    entries: PendingCheckIns = {}
+    journal.seek(0)
+    for line in journal:
+        try:
+            attendee_id, event_id, at = line.split()
+            entries[int(attendee_id)] = (int(event_id), datetime.fromisoformat(at))
+        except ValueError:
+            # A line torn by a crash was never acknowledged
+            continue
+    return entries
+
+
+def _sync(journal):
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+class CheckInWriteBehind:
+    """
+    Write-behind buffer for single check-ins.
+
+    A check-in is acknowledged once it is in `pending` and its line is on
+    disk in this process's journal. Journal lines are group-committed: every
+    check-in that arrives while an fsync is running shares the next one. A
+    background task writes the pending check-ins to the attendees table in
+    transactions of up to `flush_batch_size`, every `flush_interval` seconds
+    or as soon as a batch is full, and then compacts the journal to what is
+    still pending. After a crash, the next process to start replays the
+    journal. Replaying is idempotent, because a check-in only updates
+    attendees who are not checked in yet.
+
+    Until a check-in is flushed, the attendees table and the cached attendee
+    still show the attendee as not checked in.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        journal_dir: str,
+        flush_interval: float,
+        flush_batch_size: int,
+    ):
+        self.enabled = enabled
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        # Acknowledged, not yet in the attendees table
+        self.pending: PendingCheckIns = {}
+        self._unjournaled: List[Tuple[int, str, asyncio.Future]] = []
+        self._journal = None
+        self._journal_path: Optional[str] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Replays journals left by crashed processes and starts flushing."""
+        if self._tasks:
+            return
+        # Synchronous, so concurrent first check-ins cannot both get here
+        self._open_journal()
+        self._stopping = False
+        self._journal_due = asyncio.Event()
+        self._flush_due = asyncio.Event()
+        self._journal_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._tasks = [
+            asyncio.ensure_future(self._write_journal()),
+            asyncio.ensure_future(self._flush_periodically()),
+        ]
+        if self.pending:
+            logger.info("Replaying %d journaled check-ins", len(self.pending))
+            self._flush_due.set()
+
+    def _open_journal(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        recovered: PendingCheckIns = {}
+        orphans = []
+        for path in glob.glob(os.path.join(self.journal_dir, "*" + JOURNAL_SUFFIX)):
+            journal = open(path, "r")
+            if _try_lock(journal):
+                recovered.update(_read_journal(journal))
+                orphans.append((path, journal))
+            else:
+                journal.close()
+
+        self._journal_path = os.path.join(
+            self.journal_dir, f"{os.getpid()}{JOURNAL_SUFFIX}"
+        )
+        # Recovered entries are made durable here before the orphans go away
+        tmp_path = self._journal_path + ".tmp"
+        journal = open(tmp_path, "w")
+        _try_lock(journal)
+        journal.writelines(
+            _journal_line(attendee_id, event_id, at)
+            for attendee_id, (event_id, at) in recovered.items()
+        )
+        _sync(journal)
+        for path, orphan in orphans:
+            if path != self._journal_path:
+                os.remove(path)
+            orphan.close()
+        os.replace(tmp_path, self._journal_path)
+        self._journal = journal
+        self.pending.update(recovered)
+
+    async def check_in(self, attendee_id: int, event_id: int) -> bool:
+        """
+        Acknowledges a check-in once it is journaled. Returns False if the
+        attendee already has a pending check-in.
+        """
+        await self.start()
+        if attendee_id in self.pending:
+            return False
+        at = datetime.now()
+        self.pending[attendee_id] = (event_id, at)
+        journaled = asyncio.get_running_loop().create_future()
+        self._unjournaled.append(
+            (attendee_id, _journal_line(attendee_id, event_id, at), journaled)
+        )
+        self._journal_due.set()
+        if len(self.pending) >= self.flush_batch_size:
+            self._flush_due.set()
+        await journaled
+        return True
+
+    async def _write_journal(self):
+        while not (self._stopping and not self._unjournaled):
+            await self._journal_due.wait()
+            self._journal_due.clear()
+            batch, self._unjournaled = self._unjournaled, []
+            if not batch:
+                continue
+            try:
+                async with self._journal_lock:
+                    await asyncio.to_thread(
+                        self._append, [line for _, line, _ in batch]
+                    )
+            except Exception as e:
+                # Not durable, so not acknowledged: the client can retry
+                for attendee_id, _, journaled in batch:
+                    self.pending.pop(attendee_id, None)
+                    journaled.set_exception(e)
+                continue
+            for _, _, journaled in batch:
+                journaled.set_result(None)
+
+    def _append(self, lines: List[str]):
+        self._journal.writelines(lines)
+        _sync(self._journal)
+
+    async def _flush_periodically(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_due.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_due.clear()
+            if self.pending:
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("Flushing check-ins failed; will retry")
+
+    async def flush(self):
+        """Writes every pending check-in to the attendees table."""
+        async with self._flush_lock:
+            while self.pending:
+                batch = list(
+                    itertools.islice(self.pending.items(), self.flush_batch_size)
+                )
+                await self._write_batch(batch)
+                for attendee_id, entry in batch:
+                    if self.pending.get(attendee_id) == entry:
+                        del self.pending[attendee_id]
+            async with self._journal_lock:
+                await asyncio.to_thread(self._compact_journal, dict(self.pending))
+
+    async def _write_batch(self, batch: List[Tuple[int, Tuple[int, datetime]]]):
+        attendees = Attendee.__table__
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(attendees)
+                .where(
+                    attendees.c.attendee_id == bindparam("scanned_id"),
+                    attendees.c.check_in_status.is_not(True),
+                )
+                .values(
+                    check_in_status=True, check_in_updated_at=bindparam("scanned_at")
+                ),
+                [
+                    {"scanned_id": attendee_id, "scanned_at": at}
+                    for attendee_id, (_, at) in batch
+                ],
+            )
+            await recount_checked_in(db, {event_id for _, (event_id, _) in batch})
+            await db.commit()
+        await cache.delete(*(attendee_key(attendee_id) for attendee_id, _ in batch))
+
+    def _compact_journal(self, still_pending: PendingCheckIns):
+        if not still_pending:
+            # Back to the start too, or the next line lands after a hole
+            self._journal.seek(0)
+            self._journal.truncate(0)
+            _sync(self._journal)
+            return
+        # Rewritten aside and swapped in, so the journal is never incomplete
+        tmp_path = self._journal_path + ".tmp"
+        journal = open(tmp_path, "w")
+        _try_lock(journal)
+        journal.writelines(
+            _journal_line(attendee_id, event_id, at)
+            for attendee_id, (event_id, at) in still_pending.items()
+        )
+        _sync(journal)
+        os.replace(tmp_path, self._journal_path)
+        self._journal.close()
+        self._journal = journal
+
+    async def stop(self):
+        """Flushes what is pending and stops; the journal is kept on failure."""
+        if not self._tasks:
+            return
+        # Not cancelled: a flush or journal write in progress is let finish
+        self._stopping = True
+        self._journal_due.set()
+        self._flush_due.set()
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Flushing check-ins on shutdown failed; kept in journal")
+            return
+        finally:
+            self._journal.close()
+        os.remove(self._journal_path)
+
+
+check_in_write_behind = CheckInWriteBehind(
+    WRITE_BEHIND_ENABLED, JOURNAL_DIR, FLUSH_INTERVAL_MS / 1000, FLUSH_BATCH_SIZE
+)
@@ -0,0 +1,134 @@
+"""
+Throughput of single check-ins (POST /attendees/check-in/{id}) committed one
+transaction per request against write-behind mode (acknowledged from the local
+journal, flushed to the attendees table in grouped transactions).
+
+Runs the app in-process against a scratch database (see benchmarks.common),
+seeds --attendees attendees for each mode, then checks them all in from --concurrency scanners. Write-behind mode is timed twice:
+until the last scan is acknowledged, and until the last check-in is flushed.
+Scans that fail on a lock conflict (SQLite allows a single writer) are retried,
+as a kiosk would, and counted:
+
+    python -m benchmarks.bench_check_in --attendees 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from uuid import uuid4
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmarks/bench_check_in.db")
+
+import httpx  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Attendee  # noqa: E402
+from app.write_behind import check_in_write_behind  # noqa: E402
+from benchmarks.common import create_schema, seed_event  # noqa: E402
+
+
+def seed(attendees: int) -> list:
+    tag = uuid4().hex
+    event_id = seed_event(
+        "Check-in benchmark",
+        attendees,
+        lambda i: {
+            "first_name": "First",
+            "last_name": f"Last {i}",
+            "email": f"{tag}-{i}@example.com",
+            "check_in_status": False,
+        },
+    )
+    with SessionLocal() as db:
+        return list(
+            db.scalars(
+                select(Attendee.attendee_id).where(Attendee.event_id == event_id)
+            )
+        )
+
+
+def checked_in(attendee_ids: list) -> int:
+    with SessionLocal() as db:
+        return db.scalar(
+            select(func.count()).where(
+                Attendee.attendee_id.in_(attendee_ids),
+                Attendee.check_in_status.is_(True),
+            )
+        )
+
+
+async def scan_all(
+    client: httpx.AsyncClient, attendee_ids: list, concurrency: int
+) -> int:
+    queue = list(reversed(attendee_ids))
+    retries = 0
+
+    async def scanner():
+        nonlocal retries
+        while queue:
+            attendee_id = queue.pop()
+            while True:
+                response = await client.post(f"/attendees/check-in/{attendee_id}")
+                if response.status_code != 500 or "locked" not in response.text:
+                    break
+                retries += 1
+            assert response.status_code == 200, response.text
+
+    await asyncio.gather(*[scanner() for _ in range(concurrency)])
+    return retries
+
+
+async def run(attendees: int, concurrency: int):
+    create_schema()
+    results = {}
+    async with httpx.AsyncClient(
+        app=app, base_url="http://bench", timeout=None
+    ) as client:
+        attendee_ids = seed(attendees)
+        started = time.perf_counter()
+        retries = await scan_all(client, attendee_ids, concurrency)
+        results["per-request commit"] = (time.perf_counter() - started, None, retries)
+        assert checked_in(attendee_ids) == attendees
+
+        with tempfile.TemporaryDirectory() as journal_dir:
+            check_in_write_behind.enabled = True
+            check_in_write_behind.journal_dir = journal_dir
+            attendee_ids = seed(attendees)
+            await check_in_write_behind.start()
+            started = time.perf_counter()
+            retries = await scan_all(client, attendee_ids, concurrency)
+            acknowledged = time.perf_counter() - started
+            await check_in_write_behind.stop()
+            flushed = time.perf_counter() - started
+            results["write-behind"] = (acknowledged, flushed, retries)
+            assert checked_in(attendee_ids) == attendees
+
+    print(
+        f"{attendees} check-ins from {concurrency} scanners "
+        f"(flush every {check_in_write_behind.flush_interval * 1000:.0f} ms "
+        f"or {check_in_write_behind.flush_batch_size} check-ins)"
+    )
+    print(f"{'mode':<20}{'acked s':>10}{'acked/s':>10}{'flushed s':>11}{'retries':>9}")
+    for mode, (acknowledged, flushed, retries) in results.items():
+        print(
+            f"{mode:<20}{acknowledged:10.2f}{attendees / acknowledged:10.0f}"
+            f"{flushed or acknowledged:11.2f}{retries:9d}"
+        )
+    speedup = results["per-request commit"][0] / results["write-behind"][0]
+    print(f"write-behind acknowledges {speedup:.1f}x more check-ins per second")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--attendees", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.attendees, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Time, size and peak memory of GET /events/{id}/attendees/export in each
+format, against fetching the same attendees as one JSON list.
+
+Runs the app in-process against a scratch database (see benchmarks.common)
+and seeds one event per --sizes entry. Responses are
+driven straight through the ASGI interface and their bodies counted and
+dropped as they are sent, so the peak memory (tracemalloc) is the server's
+alone; each download is timed in a separate run without tracemalloc:
+
+    python -m benchmarks.bench_export --sizes 10000,100000
+
+Parquet is skipped unless pyarrow is installed.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import time
+import tracemalloc
+from typing import List, Tuple
+from uuid import uuid4
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmarks/bench_export.db")
+
+from app.main import app  # noqa: E402
+from benchmarks.common import create_schema, seed_event  # noqa: E402
+
+
+def seed(attendees: int) -> int:
+    tag = uuid4().hex
+    return seed_event(
+        "Export benchmark",
+        attendees,
+        lambda i: {
+            "first_name": f"First {i}",
+            "last_name": f"Last {i}",
+            "email": f"export-{tag}.{i}@example.com",
+            "phone_number": f"555-{i:07d}",
+            "check_in_status": i % 3 == 0,
+        },
+    )
+
+
+async def download(path: str, query: str) -> int:
+    """Sends one GET through the ASGI app and returns the body size."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    requested = False
+    status = 0
+    size = 0
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client never disconnects
+        await asyncio.get_running_loop().create_future()
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    assert status == 200, f"GET {path}?{query} returned {status}"
+    return size
+
+
+async def measure(path: str, query: str) -> Tuple[float, int, int]:
+    """Seconds, body bytes and peak traced memory of one download."""
+    started = time.perf_counter()
+    size = await download(path, query)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        await download(path, query)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, size, peak
+
+
+def variants(event_id: int) -> List[Tuple[str, str, str]]:
+    export = f"/events/{event_id}/attendees/export"
+    formats = ["csv", "ndjson"]
+    if importlib.util.find_spec("pyarrow") is not None:
+        formats.append("parquet")
+    return [("JSON list", "/attendees/", f"event_id={event_id}")] + [
+        (f"{export_format}{' gzip' if gzip else ''}", export, query)
+        for export_format in formats
+        for gzip in (False, True)
+        for query in [f"format={export_format}" + ("&gzip=true" if gzip else "")]
+    ]
+
+
+async def run(sizes: List[int]):
+    create_schema()
+    events = {attendees: seed(attendees) for attendees in sizes}
+    # Loads the app's lazy engines and code paths before anything is measured
+    await download("/events/", "")
+
+    print(f"{'attendees':<11}{'output':<14}{'seconds':>9}{'MB out':>9}{'peak MB':>9}")
+    for attendees, event_id in events.items():
+        for name, path, query in variants(event_id):
+            elapsed, size, peak = await measure(path, query)
+            print(
+                f"{attendees:<11}{name:<14}{elapsed:9.2f}{size / 1e6:9.1f}"
+                f"{peak / 1e6:9.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10000,100000")
+    args = parser.parse_args()
+    asyncio.run(run([int(size) for size in args.sizes.split(",")]))
+
+
+if __name__ == "__main__":
+    main()
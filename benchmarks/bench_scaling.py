@@ -0,0 +1,189 @@
+"""
+Read throughput as gunicorn workers are added: 1, 2, 4, ... up to
+--max-workers (default: one per CPU).
+
+Seeds a scratch database (see benchmarks.common) as the load test does, then
+for every worker count starts `gunicorn -c gunicorn.conf.py app.main:app` on
+a local port and drives it for --duration seconds from --clients load
+generator processes, each keeping --concurrency requests in flight. The
+traffic is the read side of the `mixed` load test: single events and
+attendees (mostly served from the worker's cache) and list pages. Prints
+requests per second, latency, and the speedup and efficiency against one
+worker:
+
+    python -m benchmarks.bench_scaling --max-workers 4 --clients 4
+
+The load generators share the machine: leave them as many spare cores as
+the largest worker count, or the curve flattens on the client side first.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmarks/bench_scaling.db")
+
+import httpx  # noqa: E402
+
+from benchmarks.load_test import (  # noqa: E402
+    Call,
+    list_page,
+    percentile,
+    run_calls,
+    seed,
+)
+
+ROOT = Path(__file__).parent.parent
+
+BASE_PORT = 8700
+
+
+def read_call(rng: random.Random, events: int, attendees: int) -> Call:
+    roll = rng.random()
+    if roll < 0.5:
+        return Call("GET /events/{id}", "GET", f"/events/{rng.randint(1, events)}")
+    if roll < 0.8:
+        attendee_id = rng.randint(1, attendees)
+        return Call("GET /attendees/{id}", "GET", f"/attendees/{attendee_id}")
+    return list_page(rng, events, attendees)
+
+
+def reads_until(
+    deadline: float, rng: random.Random, events: int, attendees: int
+) -> Iterator[Call]:
+    while time.perf_counter() < deadline:
+        yield read_call(rng, events, attendees)
+
+
+def drive(
+    base_url: str, seconds: float, concurrency: int, events: int, attendees: int
+) -> Tuple[List[float], int]:
+    """One load generator process: latencies (seconds) and the error count."""
+
+    async def run():
+        calls = reads_until(
+            time.perf_counter() + seconds, random.Random(), events, attendees
+        )
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(
+            base_url=base_url, limits=limits, timeout=30
+        ) as client:
+            latencies, statuses, _ = await run_calls(client, calls, concurrency)
+        errors = sum(
+            count
+            for route_statuses in statuses.values()
+            for status, count in route_statuses.items()
+            if status == 0 or status >= 500
+        )
+        return [latency for route in latencies.values() for latency in route], errors
+
+    return asyncio.run(run())
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=ROOT,
+        env={
+            **os.environ,
+            "WEB_CONCURRENCY": str(workers),
+            "BIND": f"127.0.0.1:{port}",
+        },
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"gunicorn with {workers} workers did not come up")
+
+
+def worker_counts(max_workers: int) -> List[int]:
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def measure(args, workers: int, port: int) -> dict:
+    server = start_server(workers, port)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        with multiprocessing.Pool(args.clients) as pool:
+            job = (args.concurrency, args.events, args.attendees)
+            # Fills every worker's cache before the measured run
+            pool.starmap(drive, [(base_url, args.warmup, *job)] * args.clients)
+            started = time.perf_counter()
+            results = pool.starmap(
+                drive, [(base_url, args.duration, *job)] * args.clients
+            )
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    latencies = sorted(latency for run, _ in results for latency in run)
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "errors": sum(errors for _, errors in results),
+    }
+
+
+def run(args):
+    if not args.no_seed:
+        seed(args.events, args.attendees)
+    results = {}
+    for workers in worker_counts(args.max_workers):
+        results[workers] = measure(args, workers, BASE_PORT + workers)
+
+    print(
+        f"Read routes, {args.duration:g} s per run, {args.clients} load generators"
+        f" x {args.concurrency} requests in flight ({os.cpu_count()} CPUs)"
+    )
+    print(
+        f"{'workers':<9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'errors':>8}{'speedup':>9}{'efficiency':>12}"
+    )
+    single = results[1]["rps"]
+    for workers, result in results.items():
+        speedup = result["rps"] / single
+        print(
+            f"{workers:<9}{result['rps']:9.0f}{result['p50_ms']:9.2f}"
+            f"{result['p95_ms']:9.2f}{result['errors']:8d}{speedup:9.2f}"
+            f"{speedup / workers:12.0%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--clients", type=int, default=os.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--attendees", type=int, default=50_000)
+    parser.add_argument("--no-seed", action="store_true")
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
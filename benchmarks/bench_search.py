@@ -0,0 +1,115 @@
+"""
+Latency of GET /attendees/search on a large event: the first search, which
+builds the event's index, then prefix, full-name, typo and email queries.
+
+Runs the app in-process against a scratch database (see benchmarks.common),
+seeds one event with --attendees attendees with random names, then runs --repeat queries of each kind:
+
+    python -m benchmarks.bench_search --attendees 100000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from uuid import uuid4
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmarks/bench_search.db")
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from benchmarks.common import create_schema, seed_event  # noqa: E402
+
+SYLLABLES = (
+    "an ber cal da el fin gor ha is jo ka lin mar no or pe quin ro sa ti ul ven"
+).split()
+
+
+def random_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+
+
+def seed(attendees: int, rng: random.Random):
+    """Returns the event_id and the (first, last, email) of every attendee."""
+    people = []
+    tag = uuid4().hex[:8]
+    for i in range(attendees):
+        first_name, last_name = random_name(rng), random_name(rng)
+        email = f"{first_name}.{last_name}.{i}.{tag}@example.com".lower()
+        people.append((first_name, last_name, email))
+
+    event_id = seed_event(
+        "Search benchmark",
+        attendees,
+        lambda i: {
+            "first_name": people[i][0],
+            "last_name": people[i][1],
+            "email": people[i][2],
+            "check_in_status": False,
+        },
+    )
+    return event_id, people
+
+
+def with_typo(word: str, rng: random.Random) -> str:
+    position = rng.randrange(1, len(word))
+    return word[:position] + rng.choice("aeiou") + word[position + 1 :]
+
+
+def queries(people: list, rng: random.Random, repeat: int) -> dict:
+    sample = rng.sample(people, repeat)
+    return {
+        "prefix": [last_name[:3] for _, last_name, _ in sample],
+        "full name": [f"{first} {last}" for first, last, _ in sample],
+        "typo": [with_typo(last_name, rng) for _, last_name, _ in sample],
+        "email prefix": [email[: email.index("@") + 3] for _, _, email in sample],
+    }
+
+
+async def timed_search(client: httpx.AsyncClient, event_id: int, q: str) -> float:
+    started = time.perf_counter()
+    response = await client.get(
+        "/attendees/search", params={"event_id": event_id, "q": q, "limit": 10}
+    )
+    assert response.status_code == 200, response.text
+    return (time.perf_counter() - started) * 1000
+
+
+async def run(attendees: int, repeat: int):
+    create_schema()
+    rng = random.Random(42)
+    event_id, people = seed(attendees, rng)
+    async with httpx.AsyncClient(
+        app=app, base_url="http://bench", timeout=None
+    ) as client:
+        first = await timed_search(client, event_id, "warm")
+        results = {}
+        for kind, texts in queries(people, rng, repeat).items():
+            results[kind] = sorted(
+                [await timed_search(client, event_id, q) for q in texts]
+            )
+
+    print(f"GET /attendees/search on an event with {attendees} attendees (ms)")
+    print(f"{'first search (builds the index)':<34}{first:9.1f}")
+    print(f"{'query':<18}{'p50':>8}{'p95':>8}{'max':>8}")
+    for kind, latencies in results.items():
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(
+            f"{kind:<18}{statistics.median(latencies):8.2f}{p95:8.2f}"
+            f"{latencies[-1]:8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--attendees", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.attendees, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Latency of a large attendee page with format=json (ORM objects validated and
+encoded through the response model) against format=fast (column tuples encoded
+by orjson).
+
+Runs the app in-process against a scratch database (see benchmarks.common),
+seeds --rows attendees, then fetches pages of --limit
+rows --repeat times in each format. The Server-Timing header of every response
+splits the time into SQL, ORM and encoding:
+
+    python -m benchmarks.bench_serialization --rows 20000 --limit 1000
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+from uuid import uuid4
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmarks/bench_serialization.db")
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from benchmarks.common import create_schema, seed_event  # noqa: E402
+
+FORMATS = ("json", "fast")
+
+SERVER_TIMING = re.compile(r"(\w+);dur=([\d.]+)")
+
+
+def seed(rows: int) -> int:
+    tag = uuid4().hex
+    return seed_event(
+        "Serialization benchmark",
+        rows,
+        lambda i: {
+            "first_name": "First",
+            "last_name": f"Last {i}",
+            "email": f"{tag}-{i}@example.com",
+            "phone_number": "+1 555 0100",
+            "check_in_status": i % 3 == 0,
+        },
+    )
+
+
+async def bench_format(
+    client: httpx.AsyncClient,
+    event_id: int,
+    response_format: str,
+    limit: int,
+    repeat: int,
+) -> dict:
+    params = {"event_id": event_id, "limit": limit, "format": response_format}
+    await client.get("/attendees/", params=params)  # warm-up
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get("/attendees/", params=params)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200, response.text
+        assert len(response.json()) == limit
+        phases = {
+            name: float(duration)
+            for name, duration in SERVER_TIMING.findall(
+                response.headers["Server-Timing"]
+            )
+        }
+        samples.append({**phases, "client": elapsed * 1000})
+    return {
+        phase: statistics.median(sample[phase] for sample in samples)
+        for phase in ("db", "orm", "encode", "total", "client")
+    }
+
+
+async def run(rows: int, limit: int, repeat: int):
+    create_schema()
+    event_id = seed(rows)
+    async with httpx.AsyncClient(
+        app=app, base_url="http://bench", timeout=None
+    ) as client:
+        results = {
+            response_format: await bench_format(
+                client, event_id, response_format, limit, repeat
+            )
+            for response_format in FORMATS
+        }
+
+    print(f"GET /attendees/?limit={limit}, median of {repeat} requests (ms)")
+    print(f"{'format':<8}{'db':>9}{'orm':>9}{'encode':>9}{'total':>9}{'rows/s':>11}")
+    for response_format, timings in results.items():
+        print(
+            f"{response_format:<8}"
+            + "".join(
+                f"{timings[phase]:9.2f}" for phase in ("db", "orm", "encode", "total")
+            )
+            + f"{limit / (timings['client'] / 1000):11.0f}"
+        )
+    speedup = results["json"]["client"] / results["fast"]["client"]
+    print(f"format=fast is {speedup:.1f}x faster end to end")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, min(args.limit, args.rows), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold-start time of a worker: importing app.main, then serving its first
+request (GET /health, after the lifespan startup hooks have run).
+
+Every run starts a fresh interpreter against a scratch database (SQLite by
+default, or any URL in DATABASE_URL) and also reports the threads running
+after the import, which is where import-time schedulers show up:
+
+    python -m benchmarks.bench_startup --repeat 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in the fresh interpreter; prints one JSON line
+PROBE = """
+import json, threading, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+threads = threading.active_count()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    assert client.get("/health").status_code == 200
+    served = time.perf_counter()
+print(json.dumps({
+    "import": (imported - started) * 1000,
+    "first_response": (served - started) * 1000,
+    "threads": threads,
+}))
+"""
+
+
+def probe(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(repeat: int):
+    env = {
+        **os.environ,
+        "DATABASE_URL": os.environ.get(
+            "DATABASE_URL", "sqlite:///./benchmarks/bench_startup.db"
+        ),
+    }
+    probe(env)  # warm the filesystem and bytecode caches
+    samples = [probe(env) for _ in range(repeat)]
+
+    print(f"Cold start, median of {repeat} fresh interpreters")
+    for phase, label in (
+        ("import", "import app.main"),
+        ("first_response", "first response"),
+    ):
+        median = statistics.median(sample[phase] for sample in samples)
+        print(f"{label:<22}{median:9.1f} ms")
+    threads = max(sample["threads"] for sample in samples)
+    print(f"{'threads after import':<22}{threads:9d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    run(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
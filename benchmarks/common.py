@@ -0,0 +1,71 @@
+"""
+Scratch-database helpers shared by the benchmarks.
+
+Every benchmark runs against a scratch database: SQLite by default (a file in
+benchmarks/ named after the script), or any URL in DATABASE_URL. Scripts set
+that default before importing this module or the app, as app.database reads
+DATABASE_URL on import. The app leaves the schema to Alembic, so the
+benchmarks create it themselves from the models.
+"""
+
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Callable, Iterable
+
+from sqlalchemy import insert
+
+from app.database import Base, SessionLocal, get_engine
+from app.models import Attendee, Event
+
+# Rows per INSERT when seeding
+SEED_BATCH_SIZE = 10_000
+
+
+def create_schema(fresh: bool = False):
+    """Creates the missing tables, or every table from scratch if `fresh`."""
+    engine = get_engine()
+    if fresh:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+
+def insert_in_batches(conn, table, rows: Iterable[dict]):
+    """Inserts `rows` into `table` through `conn`, SEED_BATCH_SIZE at a time."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, SEED_BATCH_SIZE))
+        if not batch:
+            return
+        conn.execute(insert(table), batch)
+
+
+def create_event(name: str, capacity: int, registered: int = 0) -> int:
+    """A SCHEDULED event starting tomorrow; returns its event_id."""
+    with SessionLocal() as db:
+        event = Event(
+            name=name,
+            start_time=datetime.now() + timedelta(days=1),
+            end_time=datetime.now() + timedelta(days=2),
+            location="Benchmark Hall",
+            max_attendees=capacity,
+            registered_count=registered,
+        )
+        db.add(event)
+        db.commit()
+        return event.event_id
+
+
+def seed_event(name: str, attendees: int, attendee: Callable[[int], dict]) -> int:
+    """
+    Creates a full event with `attendees` attendees, the i-th given by
+    `attendee(i)` (without its event_id), and returns the event_id.
+    """
+    event_id = create_event(name, attendees, registered=attendees)
+    with SessionLocal() as db:
+        insert_in_batches(
+            db,
+            Attendee,
+            ({**attendee(i), "event_id": event_id} for i in range(attendees)),
+        )
+        db.commit()
+    return event_id
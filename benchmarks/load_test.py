@@ -0,0 +1,379 @@
+"""
+Load test: per-route latency percentiles and throughput under realistic traffic.
+
+Seeds a scratch database (see benchmarks.common) with --events events and
+--attendees attendees, then replays a traffic mix against the app in-process,
+or against a running server with --base-url (which must use the same
+DATABASE_URL):
+
+    python -m benchmarks.load_test --scenario mixed --requests 5000
+    python -m benchmarks.load_test --scenario check_in_storm --concurrency 100
+    python -m benchmarks.load_test --scenario replay --log traffic.jsonl --no-seed
+
+Scenarios:
+    registration_burst  POST /attendees/ with fresh emails
+    check_in_storm      POST /attendees/check-in/{id} on random attendees
+    list_scan           keyset pages of GET /events/ and GET /attendees/
+    mixed               mostly cached reads, plus lists, registrations, check-ins
+    replay              requests from a JSONL log (--log), one object per line:
+                        {"method": "GET", "path": "/events/12", "params": {...},
+                         "json": {...}, "route": "GET /events/{id}"}
+                        ("route" is optional; --record writes this format)
+
+Each run prints count, errors, p50/p95/p99 latency and requests per second per
+route. --save-baseline NAME stores the numbers in benchmarks/baselines/NAME.json
+and --compare NAME flags routes whose p95 or throughput moved past --tolerance,
+exiting with status 1 if any did.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from uuid import uuid4
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmarks/load_test.db")
+
+import httpx  # noqa: E402
+
+from app.database import get_engine  # noqa: E402
+from app.models import Attendee, Event, EventStatus  # noqa: E402
+from benchmarks.common import create_schema, insert_in_batches  # noqa: E402
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+PAGE_SIZE = 100
+
+
+class Call(NamedTuple):
+    route: str
+    method: str
+    path: str
+    params: Optional[dict] = None
+    json: Optional[dict] = None
+
+
+def seed(events: int, attendees: int):
+    """Recreates the schema with ids 1..events and 1..attendees."""
+    rng = random.Random(42)
+    now = datetime.now().replace(microsecond=0)
+    per_event = Counter(i % events + 1 for i in range(attendees))
+    create_schema(fresh=True)
+    with get_engine().begin() as conn:
+        insert_in_batches(
+            conn,
+            Event,
+            [
+                {
+                    "event_id": event_id,
+                    "name": f"Event {event_id}",
+                    "start_time": now + timedelta(days=rng.randint(1, 90)),
+                    "end_time": now + timedelta(days=rng.randint(91, 120)),
+                    "location": f"Hall {event_id % 50}",
+                    # Headroom for the registrations the scenarios add
+                    "max_attendees": per_event[event_id] * 2 + 1000,
+                    "registered_count": per_event[event_id],
+                    "status": EventStatus.SCHEDULED,
+                }
+                for event_id in range(1, events + 1)
+            ],
+        )
+        insert_in_batches(
+            conn,
+            Attendee,
+            (
+                {
+                    "attendee_id": i + 1,
+                    "first_name": "First",
+                    "last_name": f"Last {i}",
+                    "email": f"attendee{i}@example.com",
+                    "event_id": i % events + 1,
+                    "check_in_status": False,
+                }
+                for i in range(attendees)
+            ),
+        )
+
+
+def registration(rng: random.Random, events: int) -> Call:
+    return Call(
+        "POST /attendees/",
+        "POST",
+        "/attendees/",
+        json={
+            "first_name": "Load",
+            "last_name": "Test",
+            "email": f"load-{uuid4().hex}@example.com",
+            "event_id": rng.randint(1, events),
+        },
+    )
+
+
+def check_in(rng: random.Random, attendees: int) -> Call:
+    attendee_id = rng.randint(1, attendees)
+    return Call(
+        "POST /attendees/check-in/{id}", "POST", f"/attendees/check-in/{attendee_id}"
+    )
+
+
+def list_page(rng: random.Random, events: int, attendees: int) -> Call:
+    kind = rng.randrange(3)
+    if kind == 0:
+        return Call(
+            "GET /events/",
+            "GET",
+            "/events/",
+            params={"limit": PAGE_SIZE, "after": rng.randint(0, events)},
+        )
+    if kind == 1:
+        return Call(
+            "GET /events/?status",
+            "GET",
+            "/events/",
+            params={"status": "SCHEDULED", "limit": PAGE_SIZE},
+        )
+    return Call(
+        "GET /attendees/?event_id",
+        "GET",
+        "/attendees/",
+        params={"event_id": rng.randint(1, events), "limit": PAGE_SIZE},
+    )
+
+
+def mixed(rng: random.Random, events: int, attendees: int) -> Call:
+    roll = rng.random()
+    if roll < 0.5:
+        return Call("GET /events/{id}", "GET", f"/events/{rng.randint(1, events)}")
+    if roll < 0.7:
+        attendee_id = rng.randint(1, attendees)
+        return Call("GET /attendees/{id}", "GET", f"/attendees/{attendee_id}")
+    if roll < 0.8:
+        return list_page(rng, events, attendees)
+    if roll < 0.9:
+        return registration(rng, events)
+    return check_in(rng, attendees)
+
+
+def route_of(method: str, path: str) -> str:
+    return f"{method} " + re.sub(r"/\d+(?=/|$)", "/{id}", path)
+
+
+def read_log(path: str) -> Iterator[Call]:
+    with open(path) as log:
+        for line in log:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            method = entry.get("method", "GET").upper()
+            yield Call(
+                entry.get("route") or route_of(method, entry["path"]),
+                method,
+                entry["path"],
+                entry.get("params"),
+                entry.get("json"),
+            )
+
+
+def build_calls(args) -> Iterator[Call]:
+    if args.scenario == "replay":
+        if not args.log:
+            sys.exit("--scenario replay needs --log")
+        yield from read_log(args.log)
+        return
+
+    rng = random.Random(7)
+    for _ in range(args.requests):
+        if args.scenario == "registration_burst":
+            yield registration(rng, args.events)
+        elif args.scenario == "check_in_storm":
+            yield check_in(rng, args.attendees)
+        elif args.scenario == "list_scan":
+            yield list_page(rng, args.events, args.attendees)
+        else:
+            yield mixed(rng, args.events, args.attendees)
+
+
+async def run_calls(
+    client: httpx.AsyncClient, calls: Iterator[Call], concurrency: int, record=None
+):
+    """
+    Sends the calls from `concurrency` workers sharing one iterator, so at most
+    `concurrency` requests are in flight. Returns per-route latencies (seconds),
+    per-route status codes and the wall time of the run.
+    """
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    async def worker():
+        for call in calls:
+            if record is not None:
+                record.write(json.dumps(call._asdict()) + "\n")
+            started = time.perf_counter()
+            try:
+                response = await client.request(
+                    call.method, call.path, params=call.params, json=call.json
+                )
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            latencies[call.route].append(time.perf_counter() - started)
+            statuses[call.route][status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, statuses, elapsed: float) -> dict:
+    summary = {}
+    for route in sorted(latencies):
+        ordered = sorted(latencies[route])
+        summary[route] = {
+            "count": len(ordered),
+            "errors": sum(
+                count
+                for status, count in statuses[route].items()
+                if status == 0 or status >= 500
+            ),
+            "statuses": {str(status): n for status, n in statuses[route].items()},
+            "p50_ms": percentile(ordered, 0.50) * 1000,
+            "p95_ms": percentile(ordered, 0.95) * 1000,
+            "p99_ms": percentile(ordered, 0.99) * 1000,
+            "rps": len(ordered) / elapsed,
+        }
+    return summary
+
+
+def print_summary(summary: dict, elapsed: float):
+    total = sum(route["count"] for route in summary.values())
+    print(f"{total} requests in {elapsed:.2f}s = {total / elapsed:.0f} req/s")
+    print(
+        f"{'route':32} {'count':>7} {'errors':>6} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}"
+    )
+    for route, stats in summary.items():
+        print(
+            f"{route:32} {stats['count']:7} {stats['errors']:6} "
+            f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} "
+            f"{stats['rps']:8.0f}"
+        )
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> bool:
+    """Prints the change against the baseline; True if any route regressed."""
+    regressed = False
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    for route, stats in summary.items():
+        before = baseline["routes"].get(route)
+        if before is None:
+            print(f"{route:32} not in baseline")
+            continue
+        p95_change = stats["p95_ms"] / before["p95_ms"] - 1
+        rps_change = stats["rps"] / before["rps"] - 1
+        slower = p95_change > tolerance or rps_change < -tolerance
+        regressed = regressed or slower
+        print(
+            f"{route:32} p95 {p95_change:+7.1%}  req/s {rps_change:+7.1%}"
+            + ("  REGRESSION" if slower else "")
+        )
+    return regressed
+
+
+async def run(args) -> dict:
+    calls = build_calls(args)
+    record = open(args.record, "w") if args.record else None
+    try:
+        if args.base_url:
+            client = httpx.AsyncClient(base_url=args.base_url, timeout=None)
+        else:
+            from app.main import app
+
+            client = httpx.AsyncClient(app=app, base_url="http://load", timeout=None)
+        async with client:
+            latencies, statuses, elapsed = await run_calls(
+                client, calls, args.concurrency, record
+            )
+    finally:
+        if record is not None:
+            record.close()
+
+    summary = summarize(latencies, statuses, elapsed)
+    print_summary(summary, elapsed)
+    return {
+        "scenario": args.scenario,
+        "database": get_engine().dialect.name,
+        "events": args.events,
+        "attendees": args.attendees,
+        "concurrency": args.concurrency,
+        "elapsed_s": elapsed,
+        "routes": summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("\n\n", 1)[1],
+    )
+    parser.add_argument(
+        "--scenario",
+        default="mixed",
+        choices=[
+            "registration_burst",
+            "check_in_storm",
+            "list_scan",
+            "mixed",
+            "replay",
+        ],
+    )
+    parser.add_argument("--events", type=int, default=1_000)
+    parser.add_argument("--attendees", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the database")
+    parser.add_argument("--base-url", help="target a running server instead")
+    parser.add_argument("--log", help="JSONL request log for --scenario replay")
+    parser.add_argument("--record", help="write the requests sent to a JSONL log")
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        started = time.perf_counter()
+        seed(args.events, args.attendees)
+        print(
+            f"Seeded {args.events} events and {args.attendees} attendees "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    result = asyncio.run(run(args))
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"\nSaved baseline {path}")
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        if compare(result["routes"], baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Multi-worker deployment: gunicorn -c gunicorn.conf.py app.main:app
+
+Each worker is a uvicorn event loop running the whole app. Workers share no
+memory, so with more than one of them the in-memory caches and live counters
+follow the others' writes through the invalidations table (see
+app.invalidations), Idempotency-Keys are recorded in a store every worker
+reads (see app.idempotency), and periodic jobs run in whichever worker holds
+their job lock (see app.job_locks).
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Lets the lifespan shutdown flush write-behind check-ins and invalidations
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+if workers > 1:
+    # Read by the workers, which inherit this process's environment
+    os.environ.setdefault("INVALIDATION_CHANNEL", "database")
+    os.environ.setdefault("IDEMPOTENCY_BACKEND", "database")
+    if os.environ["IDEMPOTENCY_BACKEND"] == "memory":
+        # A retry reaching another worker would run the request again
+        raise RuntimeError(
+            "IDEMPOTENCY_BACKEND=memory keeps Idempotency-Keys per worker; "
+            "use database or redis with more than one worker"
+        )
@@ -0,0 +1,13 @@
+import pytest
+
+from app import models  # noqa: F401  (registers the tables)
+from app.database import Base, get_engine
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database_schema():
+    """
+    Creates the tables once per test run. The app itself never does: the
+    schema is managed by Alembic, outside the API process.
+    """
+    Base.metadata.create_all(bind=get_engine())
@@ -1,11 +1,24 @@
 # D:\Even_management_new\tests\test_attendees.py
 
+import asyncio
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import os
+import time
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime, timedelta
+from uuid import uuid4
+from fastapi import HTTPException, Request
+from app.idempotency import DatabaseStore, Idempotency
 from app.main import app
 from app.models import Event, Attendee
-from app.database import SessionLocal
+from sqlalchemy import event as event_listen
+from app.database import SessionLocal, get_async_engine
 
 client = TestClient(app)
 
@@ -116,3 +129,767 @@ def test_invalid_check_in(test_db):
     response = client.post("/events/2/attendees/1/check-in")
     assert response.status_code == 404
     assert response.json()["detail"] == "Event or attendee not found."
+
+
+def test_bulk_check_in_reports_each_row(test_db):
+    """Test that bulk check-in resolves emails in batches and reports every row."""
+    db = test_db
+    event = create_sample_event(db)
+    suffix = uuid4().hex
+    fresh = Attendee(
+        first_name="Fresh",
+        last_name="Attendee",
+        email=f"fresh-{suffix}@example.com",
+        event_id=event.event_id,
+        check_in_status=False,
+    )
+    seen = Attendee(
+        first_name="Seen",
+        last_name="Attendee",
+        email=f"seen-{suffix}@example.com",
+        event_id=event.event_id,
+        check_in_status=True,
+    )
+    db.add_all([fresh, seen])
+    db.commit()
+
+    csv_body = "\n".join(
+        [
+            "email",
+            fresh.email,
+            seen.email,
+            f"unknown-{suffix}@example.com",
+            fresh.email,
+        ]
+    )
+    response = client.post(
+        "/attendees/bulk-check-in",
+        files={"file": ("check-ins.csv", csv_body, "text/csv")},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["checked_in"] == 1
+    assert data["already_checked_in"] == 2
+    assert data["unknown_email"] == 1
+    assert [row["status"] for row in data["results"]] == [
+        "checked_in",
+        "already_checked_in",
+        "unknown_email",
+        "already_checked_in",
+    ]
+
+    db.refresh(fresh)
+    assert fresh.check_in_status is True
+
+
+def test_bulk_check_in_reports_rows_a_concurrent_check_in_won(test_db):
+    """Test that an attendee checked in between the lookup and the UPDATE
+    is reported as already checked in, and not counted twice."""
+    db = test_db
+    event = create_sample_event(db)
+    suffix = uuid4().hex
+    attendee = Attendee(
+        first_name="Raced",
+        last_name="Attendee",
+        email=f"raced-{suffix}@example.com",
+        event_id=event.event_id,
+        check_in_status=False,
+    )
+    db.add(attendee)
+    db.commit()
+
+    engine = get_async_engine().sync_engine
+    raced = []
+
+    def check_in_elsewhere(conn, cursor, statement, parameters, context, many):
+        if not raced and statement.startswith("UPDATE attendees SET check_in_status"):
+            raced.append(statement)
+            with SessionLocal() as other:
+                other.query(Attendee).filter_by(
+                    attendee_id=attendee.attendee_id
+                ).update({"check_in_status": True})
+                other.commit()
+
+    event_listen.listen(engine, "before_cursor_execute", check_in_elsewhere)
+    try:
+        response = client.post(
+            "/attendees/bulk-check-in",
+            files={"file": ("check-ins.csv", f"email\n{attendee.email}\n", "text/csv")},
+        )
+    finally:
+        event_listen.remove(engine, "before_cursor_execute", check_in_elsewhere)
+    assert raced
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert (data["checked_in"], data["already_checked_in"]) == (0, 1)
+
+
+def test_bulk_check_in_requires_email_column(test_db):
+    """Test that a CSV without an 'email' column is rejected."""
+    response = client.post(
+        "/attendees/bulk-check-in",
+        files={"file": ("check-ins.csv", "name\nSomeone\n", "text/csv")},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "CSV must contain an 'email' column."
+
+
+def test_import_attendees_reports_rejected_rows(test_db):
+    """Test that a bulk import inserts valid rows and reports every rejected one."""
+    db = test_db
+    event = create_sample_event(db, max_attendees=2)
+    suffix = uuid4().hex
+    existing = Attendee(
+        first_name="Existing",
+        last_name="Attendee",
+        email=f"existing-{suffix}@example.com",
+        event_id=event.event_id,
+        check_in_status=False,
+    )
+    db.add(existing)
+    db.commit()
+
+    def row(name, email, event_id=event.event_id):
+        return f"{name},Attendee,{email},,{event_id}"
+
+    csv_body = "\n".join(
+        [
+            "first_name,last_name,email,phone_number,event_id",
+            row("One", f"one-{suffix}@example.com"),
+            row("Existing", existing.email),
+            row("Two", f"two-{suffix}@example.com"),
+            row("Again", f"one-{suffix}@example.com"),
+            row("Lost", f"lost-{suffix}@example.com", event_id=0),
+            ",Attendee,,,",
+            row("Three", f"three-{suffix}@example.com"),
+            row("Extra", f"extra-{suffix}@example.com") + ",surplus",
+        ]
+    )
+    response = client.post(
+        "/attendees/import",
+        files={"file": ("attendees.csv", csv_body, "text/csv")},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 2
+    assert [(error["row"], error["error"]) for error in data["errors"]] == [
+        (2, f"Attendee with email '{existing.email}' already exists."),
+        (4, "Duplicate email in upload."),
+        (5, "Event not found"),
+        (
+            6,
+            "first_name: field required; email: field required; event_id: field required",
+        ),
+        (7, "The event has reached its maximum attendee limit."),
+        (8, "Row has more fields than the header."),
+    ]
+    db.refresh(event)
+    assert event.registered_count == 2
+
+    ndjson_body = json.dumps(
+        {
+            "first_name": "Late",
+            "last_name": "Attendee",
+            "email": f"late-{suffix}@example.com",
+            "event_id": event.event_id,
+        }
+    )
+    response = client.post(
+        "/attendees/import",
+        files={"file": ("attendees.ndjson", ndjson_body + "\n{oops\n", "text/plain")},
+    )
+    data = response.json()
+    assert data["imported"] == 0
+    assert data["errors"][0]["error"] == (
+        "The event has reached its maximum attendee limit."
+    )
+    assert data["errors"][1]["error"].startswith("Invalid JSON")
+
+
+def test_kiosk_sync_snapshot_push_and_change_feed(test_db, monkeypatch):
+    """Test the kiosk snapshot, an idempotent last-write-wins push and the feed."""
+    db = test_db
+    event = create_sample_event(db)
+    monkeypatch.setattr("app.kiosk_sync.KIOSK_HASH_KEY", "")
+    response = client.get(f"/kiosk/events/{event.event_id}/changes")
+    assert response.status_code == 503
+    monkeypatch.setattr("app.kiosk_sync.KIOSK_HASH_KEY", "test-key")
+    suffix = uuid4().hex
+    first, second = (
+        Attendee(
+            first_name=name,
+            last_name="Attendee",
+            email=f"{name.lower()}-{suffix}@example.com",
+            event_id=event.event_id,
+            check_in_status=False,
+        )
+        for name in ("First", "Second")
+    )
+    db.add_all([first, second])
+    db.commit()
+
+    snapshot = client.get(f"/kiosk/events/{event.event_id}/snapshot").json()
+    assert [row[0] for row in snapshot["attendees"]] == [
+        first.attendee_id,
+        second.attendee_id,
+    ]
+    assert all(len(row[1]) == 16 and row[2] is False for row in snapshot["attendees"])
+    # Changes younger than the settle window are sent again
+    assert (
+        client.get(
+            f"/kiosk/events/{event.event_id}/changes",
+            params={"since": snapshot["cursor"]},
+        ).json()["changes"]
+        == snapshot["attendees"]
+    )
+
+    scanned = datetime.now() - timedelta(minutes=5)
+    push = {
+        "check_ins": [
+            {
+                "key": f"a-{suffix}",
+                "attendee_id": first.attendee_id,
+                "at": str(scanned),
+            },
+            # An earlier scan from another kiosk, undoing the check-in: loses
+            {
+                "key": f"b-{suffix}",
+                "attendee_id": first.attendee_id,
+                "checked_in": False,
+                "at": str(scanned - timedelta(minutes=1)),
+            },
+            {"key": f"c-{suffix}", "attendee_id": 0, "at": str(scanned)},
+        ]
+    }
+    url = f"/kiosk/events/{event.event_id}/check-ins"
+    response = client.post(url, json=push)
+    assert response.status_code == 200
+    assert [
+        (r["outcome"], r["check_in_status"]) for r in response.json()["results"]
+    ] == [
+        ("applied", True),
+        ("stale", True),
+        ("unknown_attendee", None),
+    ]
+
+    # Retrying the same push applies nothing twice
+    retried = client.post(url, json=push).json()
+    assert retried["changed"] == 0
+    assert {r["outcome"] for r in retried["results"]} == {"duplicate"}
+
+    feed = client.get(
+        f"/kiosk/events/{event.event_id}/changes",
+        params={"since": snapshot["cursor"]},
+    ).json()
+    assert feed["changes"] == [
+        snapshot["attendees"][1],
+        [first.attendee_id, snapshot["attendees"][0][1], True],
+    ]
+    assert feed["has_more"] is False
+    db.refresh(first)
+    assert first.check_in_status is True
+
+    # A change stamped before the last one read, but committed after it, is
+    # still found from the cursor
+    late = Attendee(
+        first_name="Late",
+        last_name="Attendee",
+        email=f"late-{suffix}@example.com",
+        event_id=event.event_id,
+        check_in_status=False,
+        updated_at=datetime.now() - timedelta(seconds=1),
+    )
+    db.add(late)
+    db.commit()
+    feed = client.get(
+        f"/kiosk/events/{event.event_id}/changes",
+        params={"since": feed["cursor"]},
+    ).json()
+    assert late.attendee_id in [row[0] for row in feed["changes"]]
+
+    # Once settled, changes are passed for good
+    monkeypatch.setattr("app.kiosk_sync.FEED_SETTLE_WINDOW", timedelta(0))
+    feed = client.get(
+        f"/kiosk/events/{event.event_id}/changes",
+        params={"since": feed["cursor"]},
+    ).json()
+    assert feed["changes"] != []
+    assert (
+        client.get(
+            f"/kiosk/events/{event.event_id}/changes",
+            params={"since": feed["cursor"]},
+        ).json()["changes"]
+        == []
+    )
+
+
+def test_concurrent_registrations_never_oversell(test_db):
+    """Stress test: a burst of concurrent registrations never exceeds the limit."""
+    db = test_db
+    event = create_sample_event(db, max_attendees=5)
+    suffix = uuid4().hex
+
+    async def registration_burst():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as burst:
+            return await asyncio.gather(
+                *[
+                    burst.post(
+                        "/attendees/",
+                        json={
+                            "first_name": "Burst",
+                            "last_name": f"Attendee {i}",
+                            "email": f"burst-{i}-{suffix}@example.com",
+                            "event_id": event.event_id,
+                        },
+                    )
+                    for i in range(40)
+                ]
+            )
+
+    responses = asyncio.run(registration_burst())
+    assert sorted({response.status_code for response in responses}) == [200, 400]
+    assert sum(response.status_code == 200 for response in responses) == 5
+
+    db.refresh(event)
+    assert event.registered_count == 5
+    assert db.query(Attendee).filter(Attendee.event_id == event.event_id).count() == 5
+
+
+def test_list_attendees_ndjson_stream(test_db):
+    """Test streaming the attendees of an event as NDJSON."""
+    db = test_db
+    event = create_sample_event(db)
+    suffix = uuid4().hex
+    db.add_all(
+        [
+            Attendee(
+                first_name="Streamed",
+                last_name=f"Attendee {i}",
+                email=f"stream-{i}-{suffix}@example.com",
+                event_id=event.event_id,
+                check_in_status=False,
+            )
+            for i in range(3)
+        ]
+    )
+    db.commit()
+
+    response = client.get(
+        "/attendees/", params={"event_id": event.event_id, "format": "ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["last_name"] for row in rows] == [f"Attendee {i}" for i in range(3)]
+
+
+def test_list_attendees_fast_format_matches_json(test_db):
+    """Test that format=fast returns the same page and cursor as format=json."""
+    db = test_db
+    event = create_sample_event(db)
+    suffix = uuid4().hex
+    db.add_all(
+        [
+            Attendee(
+                first_name="Fast",
+                last_name=f"Attendee {i}",
+                email=f"fast-{i}-{suffix}@example.com",
+                phone_number="+1 555 0100" if i % 2 else None,
+                event_id=event.event_id,
+                check_in_status=i == 0,
+            )
+            for i in range(3)
+        ]
+    )
+    db.commit()
+
+    params = {"event_id": event.event_id, "limit": 2}
+    validated = client.get("/attendees/", params=params)
+    fast = client.get("/attendees/", params={**params, "format": "fast"})
+    assert fast.status_code == 200
+    assert fast.content == validated.content
+    assert fast.headers["X-Next-Cursor"] == validated.headers["X-Next-Cursor"]
+
+
+def test_idempotent_registration_and_check_in_replay_the_first_response(test_db):
+    """Test that retries with an Idempotency-Key, even concurrent ones, run once."""
+    db = test_db
+    event = create_sample_event(db)
+    suffix = uuid4().hex
+    payload = {
+        "first_name": "Retry",
+        "last_name": "Attendee",
+        "email": f"retry-{suffix}@example.com",
+        "event_id": event.event_id,
+    }
+    headers = {"Idempotency-Key": f"register-{suffix}"}
+
+    async def retry_storm():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as storm:
+            return await asyncio.gather(
+                *[
+                    storm.post("/attendees/", json=payload, headers=headers)
+                    for _ in range(10)
+                ]
+            )
+
+    responses = asyncio.run(retry_storm())
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.text for response in responses}) == 1
+    assert sum("Idempotent-Replayed" in r.headers for r in responses) == 9
+    attendee_id = responses[0].json()["attendee_id"]
+    db.refresh(event)
+    assert event.registered_count == 1
+
+    changed = {**payload, "first_name": "Changed"}
+    response = client.post("/attendees/", json=changed, headers=headers)
+    assert response.status_code == 422
+
+    url = f"/attendees/check-in/{attendee_id}"
+    headers = {"Idempotency-Key": f"check-in-{suffix}"}
+    first = client.post(url, headers=headers)
+    retried = client.post(url, headers=headers)
+    assert (
+        retried.json()
+        == first.json()
+        == {"message": f"Attendee with ID {attendee_id} has been checked in."}
+    )
+    assert retried.headers["Idempotent-Replayed"] == "true"
+    assert client.post(url).json()["message"].endswith("is already checked in.")
+
+
+def test_idempotency_keys_are_shared_between_workers():
+    """Test that a retry reaching another worker waits for, then replays, the first."""
+    # Each Idempotency stands for one worker process, sharing the database
+    first_worker = Idempotency(DatabaseStore(60))
+    second_worker = Idempotency(DatabaseStore(60))
+    key = f"shared-{uuid4().hex}"
+    calls = []
+
+    def request():
+        async def receive():
+            return {"type": "http.request", "body": b"{}", "more_body": False}
+
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/attendees/",
+            "headers": [],
+            "query_string": b"",
+            "scheme": "http",
+            "server": ("test", 80),
+        }
+        return Request(scope, receive)
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return {"attendee_id": len(calls)}
+
+    async def retried_on_both():
+        first = asyncio.ensure_future(first_worker.run(request(), key, handler))
+        await asyncio.sleep(0.05)
+        second = await second_worker.run(request(), key, handler)
+        return await first, second
+
+    first, second = asyncio.run(retried_on_both())
+    assert calls == [1]
+    assert first == {"attendee_id": 1}
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert json.loads(second.body) == first
+
+    # A claim whose request failed without an outcome is released
+    async def failing():
+        raise HTTPException(status_code=500, detail="down")
+
+    other_key = f"released-{uuid4().hex}"
+    with pytest.raises(HTTPException):
+        asyncio.run(first_worker.run(request(), other_key, failing))
+    assert asyncio.run(second_worker.run(request(), other_key, handler)) == {
+        "attendee_id": 2
+    }
+
+
+def test_update_attendee_to_a_taken_email_is_rejected(test_db):
+    """Test that a duplicate email on update is a 400, not a database error."""
+    db = test_db
+    event = create_sample_event(db)
+    suffix = uuid4().hex
+    first, second = (
+        Attendee(
+            first_name=name,
+            last_name="Attendee",
+            email=f"{name.lower()}-{suffix}@example.com",
+            event_id=event.event_id,
+            check_in_status=False,
+        )
+        for name in ("First", "Second")
+    )
+    db.add_all([first, second])
+    db.commit()
+
+    response = client.put(
+        f"/attendees/{second.attendee_id}", json={"email": first.email}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == (
+        f"Attendee with email '{first.email}' already exists."
+    )
+
+
+def test_waitlist_queues_full_event_and_promotes_in_order(test_db):
+    """Test that a full event queues registrations and fills new seats in order."""
+    db = test_db
+    event = create_sample_event(db, max_attendees=1)
+    suffix = uuid4().hex
+
+    def register(name, **params):
+        return client.post(
+            "/attendees/",
+            params=params,
+            json={
+                "first_name": name,
+                "last_name": "Attendee",
+                "email": f"{name.lower()}-{suffix}@example.com",
+                "event_id": event.event_id,
+            },
+        )
+
+    assert register("Seated").status_code == 200
+    assert register("Refused").status_code == 400
+    queued = [register(name, waitlist="true") for name in ("One", "Two", "Three")]
+    assert [response.status_code for response in queued] == [202] * 3
+    assert [response.json()["position"] for response in queued] == [1, 2, 3]
+    assert register("One", waitlist="true").status_code == 400
+
+    response = client.put(f"/events/{event.event_id}", json={"max_attendees": 3})
+    assert response.status_code == 200
+
+    entries = [
+        client.get(f"/waitlist/{response.json()['entry_id']}").json()
+        for response in queued
+    ]
+    assert [(entry["status"], entry["position"]) for entry in entries] == [
+        ("PROMOTED", None),
+        ("PROMOTED", None),
+        ("WAITING", 1),
+    ]
+    promoted = client.get(f"/attendees/{entries[0]['attendee_id']}").json()
+    assert promoted["email"] == f"one-{suffix}@example.com"
+    db.refresh(event)
+    assert event.registered_count == 3
+
+
+def test_write_behind_check_in_replays_journal_and_flushes(
+    test_db, tmp_path, monkeypatch
+):
+    """Test that write-behind check-ins are journaled, replayed and flushed."""
+    from app.write_behind import check_in_write_behind
+
+    db = test_db
+    event = create_sample_event(db)
+    crashed, scanned = [
+        Attendee(
+            first_name=name,
+            last_name="Attendee",
+            email=f"{name.lower()}-{uuid4().hex}@example.com",
+            event_id=event.event_id,
+            check_in_status=False,
+        )
+        for name in ("Crashed", "Scanned")
+    ]
+    db.add_all([crashed, scanned])
+    db.commit()
+    # Acknowledged by a process that died before flushing it
+    (tmp_path / "99999999.journal").write_text(
+        f"{crashed.attendee_id} {event.event_id} {datetime.now().isoformat()}\n"
+        f"{scanned.attendee_id} {event.event_id} 2024-01"  # torn by the crash
+    )
+    monkeypatch.setattr(check_in_write_behind, "enabled", True)
+    monkeypatch.setattr(check_in_write_behind, "journal_dir", str(tmp_path))
+    monkeypatch.setattr(check_in_write_behind, "flush_interval", 60)
+
+    url = f"/attendees/check-in/{scanned.attendee_id}"
+    with TestClient(app) as doors:
+        # The replayed check-in is flushed straight away
+        deadline = time.monotonic() + 5
+        while check_in_write_behind.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not check_in_write_behind.pending
+
+        assert doors.post(url).json() == {
+            "message": f"Attendee with ID {scanned.attendee_id} has been checked in."
+        }
+        assert doors.post(url).json()["message"].endswith("is already checked in.")
+        assert scanned.attendee_id in check_in_write_behind.pending
+        journal = (tmp_path / f"{os.getpid()}.journal").read_text()
+        assert f"{scanned.attendee_id} {event.event_id} " in journal
+
+    # Flushed on shutdown, and the journals are gone
+    assert not check_in_write_behind.pending
+    assert list(tmp_path.iterdir()) == []
+    db.refresh(crashed)
+    db.refresh(scanned)
+    db.refresh(event)
+    assert crashed.check_in_status and scanned.check_in_status
+    assert event.checked_in_count == 2
+
+
+def test_write_behind_check_in_after_a_flush_is_replayed(test_db, tmp_path):
+    """Test that a check-in journaled after a flush emptied the journal is replayed."""
+    from app.write_behind import CheckInWriteBehind
+
+    db = test_db
+    event = create_sample_event(db)
+    first, second = [
+        Attendee(
+            first_name=name,
+            last_name="Attendee",
+            email=f"{name.lower()}-{uuid4().hex}@example.com",
+            event_id=event.event_id,
+            check_in_status=False,
+        )
+        for name in ("First", "Second")
+    ]
+    db.add_all([first, second])
+    db.commit()
+
+    async def crash_after_second_check_in():
+        doors = CheckInWriteBehind(True, str(tmp_path), 60, 100)
+        assert await doors.check_in(first.attendee_id, event.event_id)
+        await doors.flush()
+        assert await doors.check_in(second.attendee_id, event.event_id)
+        # Dies without flushing
+        for task in doors._tasks:
+            task.cancel()
+        doors._journal.close()
+
+        restarted = CheckInWriteBehind(True, str(tmp_path), 60, 100)
+        await restarted.start()
+        assert list(restarted.pending) == [second.attendee_id]
+        await restarted.stop()
+
+    asyncio.run(crash_after_second_check_in())
+    db.refresh(second)
+    assert second.check_in_status
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_search_attendees_by_prefix_typo_and_email(test_db):
+    """Test door search by name and email prefixes, with typos and accents."""
+    db = test_db
+    event = create_sample_event(db)
+    suffix = uuid4().hex
+    ids = {}
+    for first_name, last_name in [
+        ("Jane", "Smith"),
+        ("Janet", "Smithers"),
+        ("José", "Álvarez"),
+    ]:
+        response = client.post(
+            "/attendees/",
+            json={
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": f"{first_name.lower()}.{suffix}@example.com",
+                "event_id": event.event_id,
+            },
+        )
+        ids[first_name] = response.json()["attendee_id"]
+
+    def search(q, **params):
+        response = client.get(
+            "/attendees/search", params={"event_id": event.event_id, "q": q, **params}
+        )
+        assert response.status_code == 200, response.text
+        return [attendee["attendee_id"] for attendee in response.json()]
+
+    assert search("smi") == [ids["Jane"], ids["Janet"]]
+    assert search("smi", limit=1) == [ids["Jane"]]
+    # "janet" is one typo away from "jane"
+    assert search("janet smi") == [ids["Janet"], ids["Jane"]]
+    assert search("smoth") == [ids["Jane"], ids["Janet"]]
+    assert search("alvarez") == search("ÁLV") == [ids["José"]]
+    # "jone" is one typo away from "jane", "janet" and "jose"
+    assert search("jone") == [ids["Jane"], ids["Janet"], ids["José"]]
+    # Emails are matched without typos
+    assert search(f"janet.{suffix}@exa") == [ids["Janet"]]
+    assert search("nobody") == []
+
+    # Changes are picked up by the next search
+    client.put(f"/attendees/{ids['Jane']}", json={"last_name": "Doe"})
+    assert search("smi") == [ids["Janet"]]
+    assert search("doe") == [ids["Jane"]]
+
+    # An attendee stamped before the last change indexed, but committed after
+    # it, is found too
+    late = Attendee(
+        first_name="Latecomer",
+        last_name="Smith",
+        email=f"latecomer.{suffix}@example.com",
+        event_id=event.event_id,
+        check_in_status=False,
+        updated_at=datetime.now() - timedelta(seconds=1),
+    )
+    db.add(late)
+    db.commit()
+    assert search("latecomer") == [late.attendee_id]
+
+    response = client.get("/attendees/search", params={"event_id": 999999, "q": "x"})
+    assert response.status_code == 404
+
+
+def test_export_attendees_as_csv_ndjson_and_gzip(test_db):
+    """Test downloading an event's attendee manifest in each format."""
+    db = test_db
+    event = create_sample_event(db)
+    suffix = uuid4().hex
+    db.add_all(
+        [
+            Attendee(
+                first_name="Exported",
+                last_name=f"Attendee, {i}",
+                email=f"export-{i}-{suffix}@example.com",
+                phone_number="555-0100" if i else None,
+                event_id=event.event_id,
+                check_in_status=i == 2,
+            )
+            for i in range(3)
+        ]
+    )
+    db.commit()
+    url = f"/events/{event.event_id}/attendees/export"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == (
+        f'attachment; filename="event-{event.event_id}-attendees.csv"'
+    )
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["last_name"] for row in rows] == [f"Attendee, {i}" for i in range(3)]
+    assert [row["phone_number"] for row in rows] == ["", "555-0100", "555-0100"]
+
+    response = client.get(url, params={"format": "ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["check_in_status"] for row in rows] == [False, False, True]
+    assert rows[0]["phone_number"] is None
+
+    response = client.get(url, params={"format": "ndjson", "gzip": "true"})
+    assert response.headers["content-type"] == "application/gzip"
+    assert response.headers["content-disposition"].endswith('.ndjson.gz"')
+    lines = gzip.decompress(response.content).splitlines()
+    assert [json.loads(line) for line in lines] == rows
+
+    response = client.get(url, params={"format": "parquet"})
+    if importlib.util.find_spec("pyarrow") is None:
+        assert response.status_code == 501
+    else:
+        import pyarrow.parquet
+
+        table = pyarrow.parquet.read_table(io.BytesIO(response.content))
+        assert table.to_pylist() == rows
+
+    response = client.get("/events/999999/attendees/export")
+    assert response.status_code == 404
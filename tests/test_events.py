@@ -1,11 +1,28 @@
 # D:\Even_management_new\tests\test_events.py
 
+import asyncio
+import sqlite3
+import threading
+import time
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime, timedelta
-from app.main import app
-from app.models import Event
-from app.database import SessionLocal
+from uuid import uuid4
+from sqlalchemy import exc
+from app.main import app, create_app
+from app.background_tasks import update_event_statuses
+from app.cache import MemoryCache, event_key
+from app.instrumentation import (
+    RequestTimings,
+    TimedQueuePool,
+    current_timings,
+    metrics,
+)
+from app.invalidations import InvalidationChannel, invalidations
+from app.live_counters import LiveCounters
+from app.job_locks import PROCESS_ID, acquire_job_lock
+from app.models import Event, EventStatus, Invalidation, JobLock
+from app.database import SessionLocal, get_engine
 
 client = TestClient(app)
 
@@ -97,6 +114,32 @@ def test_update_event(test_db):
     assert response_data["description"] == updated_data["description"]
 
 
+def test_update_event_rejects_what_a_batch_update_rejects(test_db):
+    """Test that a single update is validated like an item of a batch update."""
+    db = test_db
+    event = create_sample_event(db)
+    url = f"/events/{event.event_id}"
+
+    for changes, error in (
+        ({"max_attendees": -3}, "Maximum attendees can't be -3"),
+        (
+            {"start_time": (event.end_time + timedelta(hours=1)).isoformat()},
+            "Start time must be before end time",
+        ),
+        ({"name": None}, "name can't be null"),
+    ):
+        response = client.put(url, json=changes)
+        assert response.status_code == 400
+        assert response.json()["detail"] == error
+        batch = client.patch(
+            "/events/batch", json={"events": [{"event_id": event.event_id, **changes}]}
+        )
+        assert batch.json()["results"][0]["error"] == error
+
+    db.refresh(event)
+    assert event.max_attendees == 50
+
+
 def test_update_nonexistent_event():
     """Test updating a non-existent event."""
     updated_data = {"name": "Updated Event Name", "description": "Updated description"}
@@ -124,3 +167,486 @@ def test_delete_nonexistent_event():
     response = client.delete("/events/999")
     assert response.status_code == 404
     assert response.json()["detail"] == "Event not found."
+
+
+def test_list_events_keyset_pagination(test_db):
+    """Test paging through events with limit/after and the next-page cursor."""
+    db = test_db
+    created = [create_sample_event(db).event_id for _ in range(3)]
+
+    response = client.get("/events/", params={"limit": 2, "after": created[0] - 1})
+    assert response.status_code == 200
+    assert [event["event_id"] for event in response.json()] == created[:2]
+    cursor = response.headers["X-Next-Cursor"]
+    assert cursor == str(created[1])
+
+    response = client.get("/events/", params={"limit": 2, "after": cursor})
+    assert response.status_code == 200
+    assert response.json()[0]["event_id"] == created[2]
+
+
+def test_status_sweep_moves_events_through_lifecycle(test_db):
+    """Test that one sweep persists started, completed and canceled statuses."""
+    db = test_db
+    db.query(JobLock).delete()
+    db.commit()
+    now = datetime.now()
+
+    def add_event(start, end, status):
+        event = Event(
+            name="Sweep Event",
+            start_time=start,
+            end_time=end,
+            location="Test Location",
+            max_attendees=10,
+            status=status,
+        )
+        db.add(event)
+        return event
+
+    started = add_event(now - timedelta(hours=1), now + timedelta(hours=1), "SCHEDULED")
+    ended = add_event(now - timedelta(days=2), now - timedelta(days=1), "ONGOING")
+    canceled = add_event(now - timedelta(days=2), now - timedelta(days=1), "CANCELED")
+    upcoming = add_event(now + timedelta(days=1), now + timedelta(days=2), "SCHEDULED")
+    db.commit()
+
+    update_event_statuses(now)
+
+    for event in (started, ended, canceled, upcoming):
+        db.refresh(event)
+    assert started.stored_status == EventStatus.ONGOING
+    assert ended.stored_status == EventStatus.COMPLETED
+    assert canceled.stored_status == EventStatus.CANCELED
+    assert upcoming.stored_status == EventStatus.SCHEDULED
+
+
+def test_job_lock_is_held_by_one_owner(test_db):
+    """Test that a job lease can only be held by one process at a time."""
+    db = test_db
+    db.query(JobLock).delete()
+    db.commit()
+
+    assert acquire_job_lock(db, "test-job", timedelta(minutes=1), owner="worker-1")
+    assert not acquire_job_lock(db, "test-job", timedelta(minutes=1), owner="worker-2")
+    assert acquire_job_lock(db, "test-job", timedelta(minutes=1), owner="worker-1")
+
+
+def test_list_events_filters_by_day_range_and_location_prefix(test_db):
+    """Test the half-open day filters and the prefix location search."""
+    db = test_db
+    location = f"Prefix Hall {uuid4().hex}"
+    day = datetime(2031, 3, 14)
+
+    def add_event(start):
+        event = Event(
+            name="Filtered Event",
+            start_time=start,
+            end_time=start + timedelta(hours=2),
+            location=location,
+            max_attendees=10,
+            status="SCHEDULED",
+        )
+        db.add(event)
+        return event
+
+    morning = add_event(day.replace(hour=9))
+    late = add_event(day.replace(hour=23, minute=59))
+    next_day = add_event(day + timedelta(days=1))
+    db.commit()
+
+    params = {"location": location[:-4], "location_match": "prefix"}
+    response = client.get("/events/", params={**params, "date": "2031-03-14"})
+    assert response.status_code == 200
+    assert [e["event_id"] for e in response.json()] == [
+        morning.event_id,
+        late.event_id,
+    ]
+
+    response = client.get(
+        "/events/", params={**params, "from": "2031-03-14", "to": "2031-03-15"}
+    )
+    assert [e["event_id"] for e in response.json()] == [
+        morning.event_id,
+        late.event_id,
+        next_day.event_id,
+    ]
+
+    response = client.get("/events/", params={**params, "date": "2031-03-15T12:00:00"})
+    assert [e["event_id"] for e in response.json()] == [next_day.event_id]
+
+
+def test_get_event_is_cached_and_invalidated_on_update(test_db):
+    """Test that event lookups hit the cache and updates invalidate it."""
+    db = test_db
+    event = create_sample_event(db)
+
+    before = client.get("/cache/stats").json()
+    assert client.get(f"/events/{event.event_id}").status_code == 200
+    assert client.get(f"/events/{event.event_id}").status_code == 200
+    after = client.get("/cache/stats").json()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+
+    response = client.put(f"/events/{event.event_id}", json={"name": "Renamed"})
+    assert response.status_code == 200
+    assert client.get(f"/events/{event.event_id}").json()["name"] == "Renamed"
+
+
+def test_reads_that_raced_a_delete_are_not_cached():
+    """Test that a read started before an update can't cache the old value."""
+
+    async def race():
+        cache = MemoryCache(ttl=30, max_entries=10, tombstone_ttl=0.1)
+        # A reader loads the event, then an update deletes its key...
+        await cache.delete("event:1")
+        # ...before the reader fills the cache with what it loaded
+        assert await cache.add("event:1", {"name": "Old"}) is False
+        assert await cache.get("event:1") is None
+        await asyncio.sleep(0.15)
+        assert await cache.add("event:1", {"name": "New"}) is True
+        assert await cache.get("event:1") == {"name": "New"}
+
+    asyncio.run(race())
+
+
+def test_event_status_is_derived_on_read_without_writing(test_db):
+    """Test that reads derive the status from the event times and never store it."""
+    db = test_db
+    now = datetime.now()
+    location = f"Derived Hall {uuid4().hex}"
+    event = Event(
+        name="Running Event",
+        start_time=now - timedelta(hours=1),
+        end_time=now + timedelta(hours=1),
+        location=location,
+        max_attendees=10,
+        status="SCHEDULED",
+    )
+    db.add(event)
+    db.commit()
+
+    response = client.get(f"/events/{event.event_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ONGOING"
+
+    for status, expected in (("ongoing", [event.event_id]), ("scheduled", [])):
+        response = client.get(
+            "/events/", params={"status": status, "location": location}
+        )
+        assert [e["event_id"] for e in response.json()] == expected
+
+    db.refresh(event)
+    assert event.stored_status == EventStatus.SCHEDULED
+
+
+def test_requests_report_server_timing_and_metrics(test_db, monkeypatch, caplog):
+    """Test that requests expose SQL/ORM/encode timings and warn on many statements."""
+    monkeypatch.setattr("app.instrumentation.SQL_STATEMENT_WARN_THRESHOLD", 0)
+
+    response = client.get("/events/", params={"limit": 5})
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    for metric in ("db;dur=", '"1 statements"', "orm;dur=", "encode;dur=", "total;"):
+        assert metric in timing
+    assert "possible N+1 query" in caplog.text
+
+    metrics = client.get("/metrics").text
+    assert 'http_requests_total{route="GET /events/",status="200"}' in metrics
+    assert 'db_statements_total{route="GET /events/"}' in metrics
+    assert 'n_plus_one_warnings_total{route="GET /events/"}' in metrics
+
+
+def test_failed_statements_are_timed_and_not_left_pending():
+    """Test that a statement that raises is still counted and its timer dropped."""
+    timings = RequestTimings()
+    token = current_timings.set(timings)
+    try:
+        with get_engine().connect() as conn:
+            with pytest.raises(exc.OperationalError):
+                conn.exec_driver_sql("SELECT * FROM no_such_table")
+            assert conn.info["query_started"] == []
+            conn.exec_driver_sql("SELECT 1")
+            assert conn.info["query_started"] == []
+    finally:
+        current_timings.reset(token)
+    assert timings.statements == 2
+
+
+def test_live_counters_follow_registrations_and_check_ins(test_db):
+    """Test that counter subscribers see registrations and check-ins as they happen."""
+    db = test_db
+    event = Event(
+        name="Live Event",
+        start_time=datetime.now() + timedelta(days=1),
+        end_time=datetime.now() + timedelta(days=2),
+        location="Live Hall",
+        max_attendees=3,
+        status="SCHEDULED",
+    )
+    db.add(event)
+    db.commit()
+    expected = {
+        "event_id": event.event_id,
+        "registered": 0,
+        "checked_in": 0,
+        "max_attendees": 3,
+        "remaining": 3,
+    }
+
+    # One event loop for the requests and the WebSocket
+    with TestClient(app) as live_client:
+        url = f"/events/{event.event_id}/counters/ws"
+        with live_client.websocket_connect(url) as websocket:
+            assert websocket.receive_json() == expected
+
+            attendee = live_client.post(
+                "/attendees/",
+                json={
+                    "first_name": "Live",
+                    "last_name": "Attendee",
+                    "email": f"live-{uuid4().hex}@example.com",
+                    "event_id": event.event_id,
+                },
+            ).json()
+            expected.update(registered=1, remaining=2)
+            assert websocket.receive_json() == expected
+
+            live_client.post(f"/attendees/check-in/{attendee['attendee_id']}")
+            expected.update(checked_in=1)
+            assert websocket.receive_json() == expected
+
+        response = live_client.get(f"/events/{event.event_id}/counters")
+        assert response.json() == expected
+
+
+def test_live_counters_keep_changes_added_during_a_reload():
+    """Test that a check-in committed while the counters reload is not lost."""
+    row = {"registered": 1, "checked_in": 0}
+
+    async def race():
+        counters = LiveCounters(InvalidationChannel(False, 1.0, timedelta(0)))
+
+        async def load(event_id):
+            read = dict(row)
+            if row["checked_in"] == 0:
+                # A check-in commits after the row was read, before the
+                # reload stores what it read
+                row["checked_in"] = 1
+                counters.add(event_id, checked_in=1)
+            await asyncio.sleep(0)
+            return {
+                **read,
+                "event_id": event_id,
+                "max_attendees": 10,
+                "remaining": 10 - read["registered"],
+            }
+
+        counters._load = load
+        queue = await counters.subscribe(1)
+        assert (await queue.get())["checked_in"] == 1
+
+        row["checked_in"] = 0
+        counters._events[1].counters = {**counters._events[1].counters, "checked_in": 0}
+        await counters.refresh(1)
+        assert (await counters.current(1))["checked_in"] == 1
+
+    asyncio.run(race())
+
+
+def test_event_stats_match_a_live_recount(test_db):
+    """Test that the stored stats counters agree with recounting the attendees."""
+    db = test_db
+    event = create_sample_event(db)
+    suffix = uuid4().hex
+    attendees = [
+        client.post(
+            "/attendees/",
+            json={
+                "first_name": "Stats",
+                "last_name": f"Attendee {i}",
+                "email": f"stats-{i}-{suffix}@example.com",
+                "event_id": event.event_id,
+            },
+        ).json()
+        for i in range(4)
+    ]
+    client.post(f"/attendees/check-in/{attendees[0]['attendee_id']}")
+    client.post(f"/attendees/check-in/{attendees[0]['attendee_id']}")
+    client.post(
+        "/attendees/bulk-check-in",
+        files={
+            "file": (
+                "check-ins.csv",
+                "\n".join(["email", attendees[1]["email"], attendees[2]["email"]]),
+                "text/csv",
+            )
+        },
+    )
+
+    url = f"/events/{event.event_id}/stats"
+    stats = client.get(url).json()
+    assert stats == {
+        "event_id": event.event_id,
+        "status": "SCHEDULED",
+        "capacity": 50,
+        "registered": 4,
+        "checked_in": 3,
+        "remaining": 46,
+        "fill_rate": 0.08,
+        "check_in_rate": 0.75,
+    }
+    assert client.get(url, params={"source": "live"}).json() == stats
+    assert client.get("/events/0/stats").status_code == 404
+
+    response = client.get("/events/stats", params={"status": "scheduled"})
+    assert response.status_code == 200
+    assert [row["status"] for row in response.json()["by_status"]] == ["SCHEDULED"]
+    assert client.get("/events/stats", params={"status": "nope"}).status_code == 400
+
+
+def test_health_check_and_pool_exhaustion_metrics(caplog):
+    """Test the health check and that pool checkouts and timeouts are reported."""
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "databases": {"primary": "ok"}}
+
+    pool = TimedQueuePool(
+        lambda: sqlite3.connect(":memory:"),
+        pool_size=1,
+        max_overflow=0,
+        timeout=0.05,
+        logging_name="test_exhausted",
+    )
+    metrics.watch_pool(pool)
+    held = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    assert "Connection pool test_exhausted exhausted" in caplog.text
+
+    text = client.get("/metrics").text
+    assert 'db_pool_checked_out{pool="test_exhausted"} 1' in text
+    assert 'db_pool_checkouts_total{pool="test_exhausted"} 2' in text
+    assert 'db_pool_timeouts_total{pool="test_exhausted"} 1' in text
+    held.close()
+    del metrics.pools["test_exhausted"]
+
+
+def test_batch_create_update_and_shift_events(test_db):
+    """Test that batch endpoints apply valid items and report each one."""
+    db = test_db
+    valid = create_sample_event_data()
+    backwards = {**valid, "start_time": valid["end_time"]}
+    empty = {**valid, "max_attendees": 0}
+    response = client.post(
+        "/events/batch", json={"events": [valid, backwards, valid, empty, valid]}
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["failed"]) == (3, 2)
+    results = report["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert results[1]["error"] == "Start time must be before end time"
+    assert results[3]["error"] == "Maximum attendees can't be 0"
+    first, second, third = (results[i]["event_id"] for i in (0, 2, 4))
+    assert first < second < third
+    assert client.get(f"/events/{first}").json()["name"] == valid["name"]
+
+    too_early = (datetime.now() - timedelta(days=30)).isoformat()
+    response = client.patch(
+        "/events/batch",
+        json={
+            "events": [
+                {"event_id": second, "end_time": too_early},
+                {"event_id": first, "location": "Main Stage"},
+                {"event_id": second, "location": "Main Stage", "max_attendees": 80},
+                {"event_id": first, "name": "Twice"},
+                {"event_id": 999999999, "name": "Missing"},
+                {"event_id": third, "location": None},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["updated"], report["failed"]) == (2, 4)
+    assert [result["error"] for result in report["results"]] == [
+        "Start time must be before end time",
+        None,
+        None,
+        "Duplicate event_id in batch.",
+        "Event not found",
+        "location can't be null",
+    ]
+    assert client.get(f"/events/{second}").json()["max_attendees"] == 80
+
+    before = {first: client.get(f"/events/{first}").json()}
+    response = client.post(
+        "/events/batch/shift", json={"event_ids": [first, 999999999], "minutes": 30}
+    )
+    report = response.json()
+    assert (report["shifted"], report["failed"]) == (1, 1)
+    after = client.get(f"/events/{first}").json()
+    for field in ("start_time", "end_time"):
+        moved = datetime.fromisoformat(after[field]) - datetime.fromisoformat(
+            before[first][field]
+        )
+        assert moved == timedelta(minutes=30)
+    assert after["location"] == "Main Stage"
+
+
+def test_scheduler_starts_with_the_app_only_when_enabled(monkeypatch):
+    """Test that importing the app starts nothing and the lifespan owns the sweep."""
+
+    def scheduler_threads():
+        return [t for t in threading.enumerate() if t.name == "APScheduler"]
+
+    assert not scheduler_threads()
+    with TestClient(create_app()) as started:
+        assert started.get("/health").status_code == 200
+        assert not scheduler_threads()
+
+    monkeypatch.setattr("app.main.ENABLE_SCHEDULER", True)
+    with TestClient(create_app()):
+        assert len(scheduler_threads()) == 1
+
+
+def test_cached_events_follow_changes_made_by_other_workers(test_db, monkeypatch):
+    """Test that cache deletes travel between workers through the database."""
+    db = test_db
+    event = create_sample_event(db)
+    monkeypatch.setattr(invalidations, "enabled", True)
+    monkeypatch.setattr(invalidations, "poll_interval", 0.01)
+
+    def name_seen_within(worker, seconds, expected):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            name = worker.get(f"/events/{event.event_id}").json()["name"]
+            if name == expected:
+                return True
+            time.sleep(0.01)
+        return False
+
+    with TestClient(app) as worker:
+        assert worker.get(f"/events/{event.event_id}").json()["name"] == "Test Event"
+
+        # Another worker renames the event: the cached copy is stale until
+        # its invalidation arrives
+        event.name = "Renamed Elsewhere"
+        db.commit()
+        assert worker.get(f"/events/{event.event_id}").json()["name"] == "Test Event"
+        db.add(Invalidation(key=event_key(event.event_id), origin="other-host:1"))
+        db.commit()
+        assert name_seen_within(worker, 5, "Renamed Elsewhere")
+
+        # Changes made here are published for the others
+        worker.put(f"/events/{event.event_id}", json={"name": "Renamed Here"})
+        deadline = time.monotonic() + 5
+        published = None
+        while published is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+            db.rollback()
+            published = (
+                db.query(Invalidation)
+                .filter_by(key=event_key(event.event_id), origin=PROCESS_ID)
+                .first()
+            )
+        assert published is not None